@@ -0,0 +1,360 @@
+import os
+import time
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify, Response, current_app
+from flask_login import login_required, current_user
+from werkzeug.http import parse_content_range_header
+from werkzeug.utils import secure_filename
+from blobstore import store
+from cbz import chapter_exists
+from config import MANGAS_DIR
+from models import db, Manga, Chapter, Comment
+from catalog import get_source, is_valid_name, ajouter_chapitre, admin_required, invalidate_catalog
+from comments import invalidate_comments
+from feed import invalidate_manga_feed
+from events import event_hub, publish
+from ratelimit import rate_limiter
+from metrics import metrics
+from profiler import profiler
+from notifications import notifications
+from readmarks import next_ordinal, invalidate_chapters
+from uploads import uploads, UploadError, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_CHUNK
+
+bp = Blueprint('admin', __name__)
+
+
+def _chapter_added(manga_id, chapter_name):
+    """Nouveau chapitre validé en base : caches du manga, notifications des abonnés."""
+    invalidate_chapters(manga_id)
+    invalidate_manga_feed(manga_id)
+    notifications.notify(manga_id, chapter_name)
+
+
+@bp.route('/ajouter_chapitre/<manga_name>', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def ajouter_chapitre_db(manga_name):
+    source = get_source()
+    if source == "db":
+        manga = Manga.query.filter_by(name=manga_name).first_or_404()
+        if request.method == 'POST':
+            chapter_name = request.form['chapter_name'].strip()
+            if not is_valid_name(chapter_name):
+                flash("Nom de chapitre invalide.", "danger")
+                return redirect(url_for('admin.ajouter_chapitre_db', manga_name=manga_name, source=source))
+            date_added = int(time.time())
+            chapter = Chapter(name=chapter_name, manga_id=manga.id, date_added=date_added,
+                              ordinal=next_ordinal(manga.id))
+            db.session.add(chapter)
+            db.session.flush()  # Pour obtenir l'ID si besoin
+
+            # Crée le dossier physique pour le chapitre
+            chapter_dir = os.path.join(MANGAS_DIR, manga.name, chapter_name)
+            os.makedirs(chapter_dir, exist_ok=True)
+            # Crée le fichier date_added.txt
+            with open(os.path.join(chapter_dir, "date_added.txt"), "w") as f:
+                f.write(str(date_added))
+            # Ajoute les images au dossier du chapitre
+            images = request.files.getlist('images')
+            image_filenames = []
+            for image in images:
+                if image and image.filename:
+                    filename = secure_filename(image.filename)
+                    # Image identique déjà présente (crédits, ré-envoi) : partagée, pas recopiée
+                    store(image.stream, os.path.join(chapter_dir, filename))
+                    image_filenames.append(filename)
+            # Enregistre la liste des images dans le champ
+            chapter.images = ";".join(image_filenames)  # ou json.dumps(image_filenames) si champ JSON
+            publish(["chapters", f"manga:{manga.id}"], "chapter", {
+                "manga": manga.name,
+                "chapter": chapter_name,
+                "date_added": date_added,
+            })
+            db.session.commit()
+            _chapter_added(manga.id, chapter_name)
+            flash("Chapitre ajouté à la base de données avec images et dossier créé !", "success")
+            return redirect(url_for('site.manga', manga_name=manga_name, source='db'))
+        return render_template('ajouter_chapitre.html', manga=manga)
+    else:
+        if request.method == 'POST':
+            chapter_name = request.form['chapter_name']
+            ajouter_chapitre(manga_name, chapter_name)
+            # Ajoute les images au dossier du chapitre
+            chapter_dir = os.path.join(MANGAS_DIR, manga_name, chapter_name)
+            images = request.files.getlist('images')
+            for image in images:
+                if image and image.filename:
+                    filename = secure_filename(image.filename)
+                    store(image.stream, os.path.join(chapter_dir, filename))
+            flash("Chapitre ajouté dans les fichiers avec images !", "success")
+            return redirect(url_for('site.manga', manga_name=manga_name, source='fs'))
+        return render_template(
+            'ajouter_chapitre.html', 
+            manga_name=manga_name
+        )
+
+@bp.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify(e.data), e.status
+
+@bp.route('/api/uploads', methods=['POST'])
+@login_required
+@admin_required
+def api_upload_create():
+    """Ouvre un envoi de chapitre par morceaux (voir uploads.py)."""
+    data = request.get_json(force=True, silent=True) or {}
+    manga_name = str(data.get("manga") or "").strip()
+    chapter_name = str(data.get("chapter") or "").strip()
+    if not is_valid_name(manga_name) or not is_valid_name(chapter_name):
+        raise UploadError("Nom de manga ou de chapitre invalide.")
+    manga_id = None
+    if get_source() == "db":
+        manga = Manga.query.filter_by(name=manga_name).first()
+        if manga is None:
+            raise UploadError("Manga introuvable", 404)
+        manga_id = manga.id
+    elif not os.path.isdir(os.path.join(MANGAS_DIR, manga_name)):
+        raise UploadError("Manga introuvable", 404)
+    if chapter_exists(os.path.join(MANGAS_DIR, manga_name, chapter_name)):
+        raise UploadError("Ce chapitre existe déjà", 409)
+    upload_id = uploads.create(manga_name, chapter_name, manga_id, current_user.id)
+    return jsonify({
+        "id": upload_id,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "max_chunk": UPLOAD_MAX_CHUNK,
+        "url": url_for('admin.api_upload_status', upload_id=upload_id),
+    }), 201
+
+@bp.route('/api/uploads/<upload_id>', methods=['GET', 'DELETE'])
+@login_required
+@admin_required
+def api_upload_status(upload_id):
+    if request.method == 'DELETE':
+        uploads.discard(upload_id)
+        return "", 204
+    return jsonify(uploads.status(upload_id))
+
+@bp.route('/api/uploads/<upload_id>/files/<filename>', methods=['GET', 'PUT', 'DELETE'])
+@login_required
+@admin_required
+def api_upload_file(upload_id, filename):
+    """
+    PUT : un morceau du fichier (corps brut, Content-Range: bytes début-fin/total) ;
+    GET : position à laquelle reprendre après une coupure ; DELETE : retire le fichier.
+    """
+    if request.method == 'GET':
+        return jsonify(uploads.offset(upload_id, filename))
+    if request.method == 'DELETE':
+        uploads.discard_file(upload_id, filename)
+        return "", 204
+    content_range = parse_content_range_header(request.headers.get("Content-Range"))
+    if content_range is None or content_range.units != "bytes" or content_range.length is None:
+        raise UploadError("En-tête Content-Range attendu : bytes début-fin/total", 416)
+    if request.content_length is None or request.content_length != content_range.stop - content_range.start:
+        raise UploadError("Longueur du morceau différente de Content-Range", 400)
+    if request.content_length > UPLOAD_MAX_CHUNK:
+        raise UploadError("Morceau trop volumineux", 413, max_chunk=UPLOAD_MAX_CHUNK)
+    return jsonify(uploads.append(upload_id, filename, content_range.start, content_range.length, request.stream))
+
+@bp.route('/api/uploads/<upload_id>/commit', methods=['POST'])
+@login_required
+@admin_required
+def api_upload_commit(upload_id):
+    """Crée le chapitre une fois toutes les pages traitées (409 tant qu'il en reste en cours)."""
+    info = uploads.get(upload_id)
+    result = uploads.commit(upload_id)
+    if result["chapter"] is not None:
+        _chapter_added(info["manga_id"], info["chapter"])
+    return jsonify({
+        "manga": info["manga"],
+        "chapter": info["chapter"],
+        "pages": len(result["pages"]),
+        "url": url_for('site.reader', manga_name=info["manga"], chapter_name=info["chapter"]),
+    }), 201
+
+@bp.route('/ajouter_manga', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def ajouter_manga():
+    source = get_source()
+    if request.method == 'POST':
+        name = request.form['name'].strip()
+        if not is_valid_name(name):
+            flash("Nom de manga invalide.", "danger")
+            return redirect(url_for('admin.ajouter_manga', source=source))
+        author = request.form.get('author', '')
+        year = request.form.get('year', '')
+        category = request.form.get('category', '')
+        syllabus = request.form.get('syllabus', '')
+        rating = request.form.get('rating', '')
+        date_added = int(time.time())
+
+        # Gestion du fichier cover
+        cover_file = request.files.get('cover')
+        cover_filename = ''
+        if cover_file and cover_file.filename:
+            cover_filename = secure_filename(cover_file.filename)
+
+        if source == "db":
+            if Manga.query.filter_by(name=name).first():
+                flash("Ce manga existe déjà.", "warning")
+                return redirect(url_for('admin.ajouter_manga', source=source))
+            manga = Manga(
+                name=name,
+                author=author,
+                year=year,
+                category=category,
+                syllabus=syllabus,
+                cover_filename=cover_filename,
+                date_added=date_added
+            )
+            db.session.add(manga)
+            db.session.commit()
+            # Crée le dossier physique du manga
+            manga_dir = os.path.join(MANGAS_DIR, name)
+            os.makedirs(manga_dir, exist_ok=True)
+            # Sauvegarde la cover dans le dossier du manga
+            if cover_file and cover_file.filename:
+                cover_path = os.path.join(manga_dir, cover_filename)
+                store(cover_file.stream, cover_path)
+            # --- Ajoute les fichiers texte ---
+            with open(os.path.join(manga_dir, "author.txt"), "w", encoding="utf-8") as f:
+                f.write(author)
+            with open(os.path.join(manga_dir, "year.txt"), "w", encoding="utf-8") as f:
+                f.write(year)
+            with open(os.path.join(manga_dir, "category.txt"), "w", encoding="utf-8") as f:
+                f.write(category)
+            with open(os.path.join(manga_dir, "syllabus.txt"), "w", encoding="utf-8") as f:
+                f.write(syllabus)
+            with open(os.path.join(manga_dir, "cover.txt"), "w", encoding="utf-8") as f:
+                f.write(cover_filename)
+            invalidate_catalog(name)
+            with open(os.path.join(manga_dir, "rating.txt"), "w", encoding="utf-8") as f:
+                f.write(rating)
+            with open(os.path.join(manga_dir, "date_added.txt"), "w") as f:
+                f.write(str(date_added))
+        else:
+            manga_dir = os.path.join(MANGAS_DIR, name)
+            os.makedirs(manga_dir, exist_ok=True)
+            if cover_file and cover_file.filename:
+                cover_path = os.path.join(manga_dir, cover_filename)
+                store(cover_file.stream, cover_path)
+            with open(os.path.join(manga_dir, "author.txt"), "w", encoding="utf-8") as f:
+                f.write(author)
+            with open(os.path.join(manga_dir, "year.txt"), "w", encoding="utf-8") as f:
+                f.write(year)
+            with open(os.path.join(manga_dir, "category.txt"), "w", encoding="utf-8") as f:
+                f.write(category)
+            with open(os.path.join(manga_dir, "syllabus.txt"), "w", encoding="utf-8") as f:
+                f.write(syllabus)
+            with open(os.path.join(manga_dir, "cover.txt"), "w", encoding="utf-8") as f:
+                f.write(cover_filename)
+            with open(os.path.join(manga_dir, "rating.txt"), "w", encoding="utf-8") as f:
+                f.write(rating)
+            with open(os.path.join(manga_dir, "date_added.txt"), "w") as f:
+                f.write(str(date_added))
+
+        flash("Manga ajouté avec succès !", "success")
+        return redirect(url_for('site.index', source=source))
+    return render_template('ajouter_manga.html')
+
+@bp.route('/admin/manga_status/<manga_name>', methods=['GET', 'POST'])
+@login_required
+def admin_manga_status(manga_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    if request.method == 'POST':
+        # Mettre à jour l'état du manga
+        manga.status = request.form.get('status')
+
+        # Mettre à jour les badges
+        manga.is_hot = 'is_hot' in request.form
+        manga.is_new = 'is_new' in request.form
+        manga.is_top = 'is_top' in request.form
+
+        # Sauvegarder les modifications
+        db.session.commit()
+        flash("Statuts et état du manga mis à jour avec succès.", "success")
+        return redirect(url_for('site.manga', manga_name=manga.name))
+
+    return render_template('admin_manga_status.html', manga=manga)
+
+@bp.route('/manga/<manga_name>/toggle_hot', methods=['POST'])
+@login_required
+def toggle_hot(manga_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    manga.is_hot = not manga.is_hot  # Inverse le statut Hot
+    db.session.commit()
+    if manga.is_hot:
+        flash(f"Le manga '{manga_name}' est maintenant marqué comme Hot.", "success")
+    else:
+        flash(f"Le manga '{manga_name}' n'est plus marqué comme Hot.", "success")
+    return redirect(url_for('site.manga', manga_name=manga_name))
+
+@bp.route('/admin/ratelimit')
+@login_required
+@admin_required
+def ratelimit_stats():
+    """Compteurs de la limitation de débit (worker courant), pour la supervision."""
+    return jsonify(rate_limiter.stats())
+
+@bp.route('/metrics')
+@login_required
+@admin_required
+def metrics_endpoint():
+    """Métriques du worker courant au format Prometheus (METRICS_ENABLED=1)."""
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def component_metrics():
+    lines = ["# TYPE ratelimit_requests_total counter"]
+    for endpoint, counts in sorted(rate_limiter.stats().items()):
+        for result, count in counts.items():
+            lines.append(f'ratelimit_requests_total{{endpoint="{endpoint}",result="{result}"}} {count}')
+    lines.append("# TYPE sse_connections gauge")
+    lines.append(f"sse_connections {event_hub.connection_count()}")
+    return lines
+
+@bp.route('/admin/profiles')
+@login_required
+@admin_required
+def slow_requests():
+    return render_template('admin_profiles.html', traces=profiler.list_traces(), enabled=profiler.enabled,
+                           threshold=current_app.config['PROFILE_THRESHOLD'], sample_rate=current_app.config['PROFILE_SAMPLE_RATE'])
+
+@bp.route('/admin/profiles/<trace_id>')
+@login_required
+@admin_required
+def slow_request_detail(trace_id):
+    trace = profiler.get_trace(trace_id)
+    if trace is None:
+        abort(404)
+    return render_template('admin_profile.html', trace=trace)
+
+@bp.route('/admin/moderation')
+@login_required
+@admin_required
+def moderation():
+    reported_comments = Comment.query.filter_by(reported=True).order_by(Comment.created_at.desc()).all()
+    flash("Section de modération - Gérez les commentaires signalés.", "info")
+    return render_template('moderation.html', comments=reported_comments)
+
+@bp.route('/comment/<int:comment_id>/delete', methods=['POST'])
+@login_required
+def delete_comment(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    manga_id = comment.manga_id
+    db.session.delete(comment)
+    db.session.commit()
+    invalidate_comments(manga_id)
+    flash("Commentaire supprimé.", "success")
+    return redirect(url_for('admin.moderation'))
+
+@bp.route('/comment/<int:comment_id>/ignore', methods=['POST'])
+@login_required
+def ignore_report(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    comment.reported = False
+    db.session.commit()
+    flash("Signalement ignoré.", "info")
+    invalidate_comments(comment.manga_id)
+    return redirect(url_for('admin.moderation'))
@@ -0,0 +1,244 @@
+import time
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask_login import login_user, logout_user, login_required, current_user
+from flask_mail import Message
+from itsdangerous import URLSafeTimedSerializer
+from extensions import mail
+from models import db, User
+from forms import RegisterForm, LoginForm, ResetPasswordForm, ForgotPasswordForm, DeleteAccountForm
+from progress import progress_tracker
+from library import get_history_page, get_favorites_page
+from user_cache import user_cache
+from ratelimit import rate_limiter
+
+bp = Blueprint('auth', __name__)
+
+
+# Helpers pour token / mails
+def _get_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+
+def generate_reset_token(email):
+    s = _get_serializer()
+    return s.dumps(email, salt='password-reset-salt')
+
+def verify_reset_token(token, max_age=1800):
+    s = _get_serializer()
+    try:
+        email = s.loads(token, salt='password-reset-salt', max_age=max_age)
+        return email
+    except Exception:
+        return None
+
+def send_reset_email(user):
+    token = generate_reset_token(user.email)
+    created_at = int(time.time())  # Timestamp actuel
+    reset_url = url_for('auth.reset_password', token=token, created_at=created_at, _external=True)
+    body = render_template('emails/reset_password.txt', user=user, site_name=current_app.config['SITE_NAME'], reset_url=reset_url)
+    sender = f"{current_app.config['SITE_NAME']} <{current_app.config.get('MAIL_USERNAME')}>"
+    msg = Message('Réinitialisation du mot de passe - Yomi-Scan',
+                  sender=sender,
+                  recipients=[user.email])
+    msg.body = body
+    try:
+        mail.send(msg)
+    except Exception as e:
+        current_app.logger.error(f"Erreur envoi email reset à {user.email}: {e}")
+
+def send_welcome_email(user):
+    body = render_template('emails/welcome.txt', user=user, site_name=current_app.config['SITE_NAME'])
+    sender = f"{current_app.config['SITE_NAME']} <{current_app.config.get('MAIL_USERNAME')}>"
+    msg = Message('Bienvenue sur Yomi-Scan',
+                  sender=sender,
+                  recipients=[user.email])
+    msg.body = body
+    try:
+        mail.send(msg)
+    except Exception as e:
+        current_app.logger.error(f"Erreur envoi email bienvenue à {user.email}: {e}")
+
+@bp.route('/register', methods=['GET', 'POST'])
+@rate_limiter.limit("5/hour", methods=("POST",))
+def register():
+    if current_user.is_authenticated:
+        flash("Vous êtes déjà connecté. Veuillez vous déconnecter avant de créer un nouveau compte.", "info")
+        return redirect(url_for('auth.profile'))
+
+    form = RegisterForm()
+    if form.validate_on_submit():
+        username = form.username.data
+        email = form.email.data
+        password = form.password.data
+
+        # Vérifie si l'utilisateur existe déjà
+        if User.query.filter_by(username=username).first():
+            flash("Nom d'utilisateur déjà pris.", 'danger')
+            return render_template('register.html', form=form)
+        if User.query.filter_by(email=email).first():
+            flash("Email déjà utilisé.", 'danger')
+            return render_template('register.html', form=form)
+
+        user = User(username=username, email=email)
+        user.set_password(password)
+        db.session.add(user)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            flash("Nom d'utilisateur ou email déjà utilisé.", "danger")
+            return render_template('register.html', form=form)
+        # envoi email de bienvenue (silencieux en cas d'erreur)
+        send_welcome_email(user)
+        flash("Inscription réussie, un email de bienvenue a été envoyé.", "success")
+        return redirect(url_for('auth.login'))
+    return render_template('register.html', form=form)
+
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limiter.limit("10/minute", methods=("POST",))
+def login():
+    login_form = LoginForm()
+    register_form = RegisterForm()
+
+    form_type = request.form.get('form_type')
+
+    if form_type == 'login' and login_form.validate_on_submit():
+        # Vérifie si l'utilisateur se connecte avec un email ou un nom d'utilisateur
+        user = User.query.filter(
+            (User.username == login_form.username.data) | (User.email == login_form.username.data)
+        ).first()
+
+        if user and user.check_password(login_form.password.data):
+            login_user(user)
+            return redirect(url_for('site.index'))
+        else:
+            flash('Nom d\'utilisateur, email ou mot de passe incorrect.', 'danger')
+
+    elif form_type == 'register' and register_form.validate_on_submit():
+        username = register_form.username.data
+        email = register_form.email.data
+        password = register_form.password.data
+
+        # Vérifie si l'utilisateur existe déjà
+        if User.query.filter_by(username=username).first():
+            flash("Nom d'utilisateur déjà pris.", 'danger')
+        elif User.query.filter_by(email=email).first():
+            flash("Email déjà utilisé.", 'danger')
+        else:
+            user = User(username=username, email=email)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            flash("Inscription réussie, connectez-vous !", 'success')
+            return redirect(url_for('auth.login'))
+
+    return render_template('login.html', login_form=login_form, register_form=register_form)
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash("Déconnexion réussie. Connectez-vous pour commencer à profiter de vos mangas préférés.", "success")
+    return redirect(url_for('auth.login'))
+
+@bp.route('/profile')
+@login_required
+def profile():
+    if progress_tracker.has_pending(current_user.id):
+        progress_tracker.flush()
+    # Première page de chaque liste, la suite est chargée par /profile/history et /profile/favorites
+    favorites = get_favorites_page(current_user.id)
+    history = get_history_page(current_user.id)
+    return render_template('profile.html', favorites=favorites, history=history)
+
+@bp.route('/profile/history')
+@login_required
+def profile_history():
+    page = get_history_page(current_user.id, cursor=request.args.get("cursor"))
+    return jsonify({
+        "items": [dict(entry,
+                       last_read_at=entry["last_read_at"].strftime('%d/%m/%Y %H:%M') if entry["last_read_at"] else None,
+                       manga_url=url_for('site.manga', manga_name=entry["manga"]),
+                       chapter_url=url_for('site.reader', manga_name=entry["manga"], chapter_name=entry["chapter"], page=entry["page"]))
+                  for entry in page["items"]],
+        "next_cursor": page["next_cursor"]
+    })
+
+@bp.route('/profile/favorites')
+@login_required
+def profile_favorites():
+    page = get_favorites_page(current_user.id, cursor=request.args.get("cursor"))
+    return jsonify({
+        "items": [{"manga": entry["manga"], "manga_url": url_for('site.manga', manga_name=entry["manga"])}
+                  for entry in page["items"]],
+        "next_cursor": page["next_cursor"]
+    })
+
+@bp.route('/profile/digest', methods=['POST'])
+@login_required
+def toggle_email_digest():
+    user = current_user.get_model()
+    user.email_digest = not user.email_digest
+    db.session.commit()
+    user_cache.invalidate(user.id)
+    flash("Résumé quotidien par email activé." if user.email_digest
+          else "Résumé quotidien par email désactivé.", "success")
+    return redirect(url_for('auth.profile'))
+
+@bp.route('/reset_password/<token>', methods=['GET', 'POST'])
+def reset_password(token):
+    max_age = current_app.config.get('RESET_TOKEN_MAX_AGE', 1800)  # Durée de validité du token en secondes
+    created_at = request.args.get('created_at', type=int)
+    seconds_left = max_age 
+    email = verify_reset_token(token, max_age=max_age)
+    if not email:
+        flash("Le lien de réinitialisation est invalide ou a expiré.", "danger")
+        return redirect(url_for('auth.forgot_password'))
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        flash("Utilisateur introuvable.", "danger")
+        return redirect(url_for('auth.forgot_password'))
+
+    form = ResetPasswordForm()
+    if form.validate_on_submit():
+        user.set_password(form.password.data)
+        user.reset_token_used = True  # Marque le token comme utilisé
+        db.session.commit()
+        user_cache.invalidate(user.id)
+        flash("Mot de passe mis à jour !", "success")
+        return redirect(url_for('auth.login'))
+
+    # Passe seconds_left au template
+    return render_template('reset_password.html', form=form, token=token, created_at=created_at, max_age=max_age, seconds_left=seconds_left)
+
+@bp.route('/forgot_password', methods=['GET', 'POST'])
+@rate_limiter.limit("5/hour", methods=("POST",))
+def forgot_password():
+    form = ForgotPasswordForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+        if user:
+            user.reset_token_used = False  # Réinitialise l'état du token
+            db.session.commit()
+            send_reset_email(user)
+        # Réponse non révélatrice pour sécurité
+        flash("Si un compte existe pour cet email, un lien de réinitialisation a été envoyé.", "info")
+        return redirect(url_for('auth.login'))
+    return render_template('forgot_password.html', form=form)
+
+@bp.route('/delete_account', methods=['GET', 'POST'])
+@login_required
+def delete_account():
+    form = DeleteAccountForm()
+    if form.validate_on_submit():
+        user = current_user.get_model()
+        if not user or not user.check_password(form.password.data):
+            flash("Mot de passe incorrect.", "danger")
+            return redirect(url_for('auth.delete_account'))
+        user_id = user.id
+        logout_user()
+        db.session.delete(user)
+        db.session.commit()
+        user_cache.invalidate(user_id)
+        flash("Votre compte a bien été supprimé.", "success")
+        return redirect(url_for('auth.login'))
+    return render_template('delete_account.html', form=form)
@@ -0,0 +1,376 @@
+"""
+Benchmark de charge des pages publiques sur un catalogue synthétique (base
+SQLite et dossier mangas générés dans un répertoire temporaire).
+
+Deux passes :
+  - client de test Flask, séquentiel : latences et nombre de requêtes SQL par page ;
+  - serveur HTTP local + clients concurrents : débit et latences sous charge, avec le
+    serveur de développement (--server werkzeug) ou gunicorn.conf.py (--server gunicorn).
+
+Résultats en JSON (avec le commit courant) pour comparer deux versions. Un
+catalogue réutilisé (--workdir) garde les tailles de sa génération (catalog.json).
+
+Usage : python benchmarks/bench_load.py [--mangas 1000] [--chapters 100] [--pages 2] [--users 200]
+                                        [--requests 30] [--concurrency 8] [--duration 10]
+                                        [--server werkzeug|gunicorn] [--workers N]
+                                        [--workdir DIR] [--output results.json]
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ["Action", "Aventure", "Comédie", "Drame", "Fantasy", "Horreur", "Romance", "Sport"]
+GENERATION = ("mangas", "chapters", "pages", "users")  # Paramètres figés dans <workdir>/catalog.json
+ROUTES = ["index", "annuaire", "manga", "reader", "autocomplete", "download_chapter", "derniers_chapitres", "profile"]
+
+
+def placeholder_image():
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new("RGB", (64, 96), (200, 200, 200)).save(out, "JPEG", quality=50)
+    return out.getvalue()
+
+
+def manga_name(i):
+    return f"Manga {i:05d}"
+
+
+def chapter_name(j):
+    return f"Chapitre {j:03d}"
+
+
+def generate_files(mangas_dir, args):
+    """Arborescence mangas/<manga>/<chapitre>/NN.jpg ; les images sont des liens physiques d'un même fichier."""
+    os.makedirs(mangas_dir, exist_ok=True)
+    image_path = os.path.join(mangas_dir, ".placeholder.jpg")
+    with open(image_path, "wb") as f:
+        f.write(placeholder_image())
+    now = int(time.time())
+    for i in range(1, args.mangas + 1):
+        manga_dir = os.path.join(mangas_dir, manga_name(i))
+        os.makedirs(manga_dir)
+        for filename, content in (("author.txt", f"Auteur {i % 97}"), ("category.txt", CATEGORIES[i % len(CATEGORIES)]),
+                                  ("year.txt", str(1990 + i % 35)), ("syllabus.txt", f"Résumé du manga {i}."),
+                                  ("date_added.txt", str(now - i * 60))):
+            with open(os.path.join(manga_dir, filename), "w", encoding="utf-8") as f:
+                f.write(content)
+        os.link(image_path, os.path.join(manga_dir, "cover.jpg"))
+        for j in range(1, args.chapters + 1):
+            chapter_dir = os.path.join(manga_dir, chapter_name(j))
+            os.makedirs(chapter_dir)
+            with open(os.path.join(chapter_dir, "date_added.txt"), "w") as f:
+                f.write(str(now - i * 60 - (args.chapters - j) * 3600))
+            for p in range(1, args.pages + 1):
+                os.link(image_path, os.path.join(chapter_dir, f"{p:02d}.jpg"))
+
+
+def generate_database(args):
+    from models import (db, Manga, Chapter, User, Favorite, Rating, Comment, ReadingHistory,
+                        ReadingPosition, ReadBitmap)
+    from readmarks import encode, range_mask
+
+    rng = random.Random(42)
+    now = int(time.time())
+    db.create_all()
+    db.session.execute(db.insert(Manga), [{
+        "id": i, "name": manga_name(i), "author": f"Auteur {i % 97}", "year": str(1990 + i % 35),
+        "category": CATEGORIES[i % len(CATEGORIES)], "syllabus": f"Résumé du manga {i}.",
+        "cover_filename": "cover.jpg", "date_added": now - i * 60, "chapter_seq": args.chapters,
+        "views": rng.randint(0, 10000), "is_hot": i % 50 == 0, "status": "En cours",
+    } for i in range(1, args.mangas + 1)])
+    images = json.dumps([f"{p:02d}.jpg" for p in range(1, args.pages + 1)])
+    for i in range(1, args.mangas + 1):
+        db.session.execute(db.insert(Chapter), [{
+            "manga_id": i, "name": chapter_name(j), "ordinal": j - 1, "images": images,
+            "date_added": now - i * 60 - (args.chapters - j) * 3600,
+        } for j in range(1, args.chapters + 1)])
+    db.session.execute(db.insert(User), [{
+        "id": u, "username": f"lecteur{u}", "email": f"lecteur{u}@bench.test",
+    } for u in range(1, args.users + 1)])
+
+    favorites, ratings, positions, bitmaps, histories = [], [], [], [], []
+    started = datetime.utcnow()
+    for u in range(1, args.users + 1):
+        followed = rng.sample(range(1, args.mangas + 1), min(20, args.mangas))
+        for k, m in enumerate(followed):
+            moment = started - timedelta(minutes=u * 100 + k)
+            favorites.append({"user_id": u, "manga_id": m, "created_at": moment})
+            read = rng.randint(1, args.chapters)
+            bitmaps.append({"user_id": u, "manga_id": m, "bits": encode(range_mask(0, read - 1)),
+                            "read_count": read, "updated_at": moment})
+            positions.append({"user_id": u, "manga_id": m, "chapter_name": chapter_name(read), "page": 0,
+                              "updated_at": moment})
+            histories.append({"user_id": u, "manga_id": m, "chapter_name": chapter_name(read),
+                              "last_read_at": moment})
+        for m in rng.sample(range(1, args.mangas + 1), min(10, args.mangas)):
+            ratings.append({"user_id": u, "manga_id": m, "value": rng.randint(1, 5)})
+    for table, rows in ((Favorite, favorites), (Rating, ratings), (ReadBitmap, bitmaps),
+                        (ReadingPosition, positions), (ReadingHistory, histories)):
+        db.session.execute(db.insert(table), rows)
+    db.session.execute(db.insert(Comment), [{
+        "user_id": rng.randint(1, args.users), "manga_id": m, "content": f"Commentaire {k} sur le manga {m}",
+        "created_at": started - timedelta(minutes=k),
+    } for m in range(1, args.mangas + 1) for k in range(5)])
+    db.session.execute(db.text(
+        "UPDATE manga SET rating_sum = (SELECT COALESCE(SUM(value), 0) FROM rating WHERE rating.manga_id = manga.id),"
+        " rating_count = (SELECT COUNT(*) FROM rating WHERE rating.manga_id = manga.id)"
+    ))
+    db.session.commit()
+
+
+def load_catalog(workdir, args):
+    """
+    Reprend les paramètres de génération d'un catalogue existant : les chemins
+    testés doivent exister. Retourne False si le catalogue reste à générer.
+    """
+    catalog_path = os.path.join(workdir, "catalog.json")
+    if not os.path.exists(os.path.join(workdir, "site.db")):
+        return False
+    if not os.path.exists(catalog_path):
+        sys.exit(f"{workdir} : catalogue sans catalog.json (paramètres inconnus), le supprimer pour le régénérer")
+    with open(catalog_path, encoding="utf-8") as f:
+        saved = json.load(f)
+    for name in GENERATION:
+        if getattr(args, name) != saved[name]:
+            print(f"--{name} {getattr(args, name)} ignoré : catalogue généré avec {saved[name]}", file=sys.stderr)
+        setattr(args, name, saved[name])
+    return True
+
+
+def save_catalog(workdir, args):
+    with open(os.path.join(workdir, "catalog.json"), "w", encoding="utf-8") as f:
+        json.dump({name: getattr(args, name) for name in GENERATION}, f)
+
+
+def route_paths(args, count):
+    """Chemins tirés au hasard pour chaque route (mêmes tirages d'une version à l'autre)."""
+    rng = random.Random(7)
+    paths = {}
+    for route in ROUTES:
+        items = []
+        for _ in range(count):
+            m = manga_name(rng.randint(1, args.mangas))
+            c = chapter_name(rng.randint(1, args.chapters))
+            items.append({
+                "index": "/",
+                "annuaire": f"/annuaire?lettre={m[0]}" if rng.random() < 0.5 else "/annuaire",
+                "manga": f"/manga/{quote(m)}",
+                "reader": f"/manga/{quote(m)}/{quote(c)}",
+                "autocomplete": f"/autocomplete?q={rng.randint(1, args.mangas) % 1000:03d}",
+                "download_chapter": f"/manga/{quote(m)}/{quote(c)}/download",
+                "derniers_chapitres": "/derniers-chapitres",
+                "profile": "/profile",
+            }[route])
+        paths[route] = items
+    return paths
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2)}
+
+
+def run_test_client(app, db, paths, session_cookie):
+    from sqlalchemy import event
+    queries = [0]
+
+    def count(*_):
+        queries[0] += 1
+    event.listen(db.engine, "before_cursor_execute", count)
+
+    client = app.test_client()
+    client.set_cookie(app.config.get("SESSION_COOKIE_NAME", "session"), session_cookie)
+    results = {}
+    for route, items in paths.items():
+        for path in items[:3]:  # Échauffement (caches, pages du système de fichiers)
+            client.get(path).close()
+        latencies, counts, errors = [], [], 0
+        for path in items:
+            queries[0] = 0
+            start = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            latencies.append(time.perf_counter() - start)
+            counts.append(queries[0])
+            errors += response.status_code >= 400
+            response.close()
+        results[route] = {"requests": len(items), "errors": errors, **percentiles(latencies),
+                          "queries_mean": round(sum(counts) / len(counts), 1), "queries_max": max(counts)}
+    event.remove(db.engine, "before_cursor_execute", count)
+    return results
+
+
+def start_werkzeug(app):
+    """Serveur de développement (python app.py), multithreadé. Retourne (port, arrêt)."""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def start_gunicorn(workers):
+    """gunicorn avec gunicorn.conf.py (préchargement, préchauffage des workers). Retourne (port, arrêt)."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, RATELIMIT_ENABLED="0")
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--access-logfile", os.devnull],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while True:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            break
+        except OSError:
+            if process.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError("gunicorn n'a pas démarré")
+            time.sleep(0.2)
+
+    def stop():
+        process.terminate()
+        process.wait(30)
+    return port, stop
+
+
+def run_http_load(port, paths, session_cookie, concurrency, duration):
+    headers = {"Cookie": f"session={session_cookie}"}
+    deadline = time.perf_counter() + duration
+    mix = [(route, path) for route, items in paths.items() for path in items]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        samples, errors = [], 0
+        while time.perf_counter() < deadline:
+            route, path = rng.choice(mix)
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                errors += response.status >= 400
+            except OSError:
+                errors += 1
+                continue
+            samples.append((route, time.perf_counter() - start))
+        return samples, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    by_route, errors = {}, 0
+    for samples, worker_errors in outcomes:
+        errors += worker_errors
+        for route, latency in samples:
+            by_route.setdefault(route, []).append(latency)
+    total = sum(len(v) for v in by_route.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "overall": percentiles([lat for v in by_route.values() for lat in v]),
+        "routes": {route: {"requests": len(v), **percentiles(v)} for route, v in sorted(by_route.items())},
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mangas", type=int, default=1000)
+    parser.add_argument("--chapters", type=int, default=100, help="Chapitres par manga")
+    parser.add_argument("--pages", type=int, default=2, help="Images par chapitre")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=30, help="Requêtes par route (client de test)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="Durée de la passe HTTP (secondes)")
+    parser.add_argument("--server", choices=["werkzeug", "gunicorn"], default="werkzeug",
+                        help="Serveur de la passe HTTP : développement ou production (gunicorn.conf.py)")
+    parser.add_argument("--workers", type=int, help="Workers gunicorn (défaut : celui de gunicorn.conf.py)")
+    parser.add_argument("--workdir", help="Catalogue réutilisé d'une exécution à l'autre (généré s'il est vide)")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_load_")
+    os.makedirs(workdir, exist_ok=True)
+    generated = load_catalog(workdir, args)
+    db_path = os.path.join(workdir, "site.db")
+    mangas_dir = os.path.join(workdir, "mangas")
+    # Lus par config.py à l'import : le site tourne entièrement sur le catalogue synthétique
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+    os.environ["MANGAS_DIR"] = mangas_dir
+    os.environ["NPLUSONE_ENABLED"] = "0"
+
+    from app import create_app
+    from models import db
+    app = create_app({"RATELIMIT_ENABLED": False})
+
+    results = {"commit": current_commit(), "catalog": {
+        "mangas": args.mangas, "chapters": args.mangas * args.chapters, "pages_per_chapter": args.pages,
+        "users": args.users,
+    }}
+    with app.app_context():
+        if not generated:
+            start = time.perf_counter()
+            generate_files(mangas_dir, args)
+            generate_database(args)
+            save_catalog(workdir, args)
+            results["generation_s"] = round(time.perf_counter() - start, 1)
+
+        session_cookie = app.session_interface.get_signing_serializer(app).dumps({"_user_id": "1", "_fresh": True})
+        paths = route_paths(args, args.requests)
+        results["test_client"] = run_test_client(app, db, paths, session_cookie)
+    port, stop = start_gunicorn(args.workers) if args.server == "gunicorn" else start_werkzeug(app)
+    try:
+        results["http"] = {"server": args.server,
+                           **run_http_load(port, paths, session_cookie, args.concurrency, args.duration)}
+    finally:
+        stop()
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    if not args.workdir:
+        print(f"Catalogue généré dans {workdir} (réutilisable avec --workdir)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de la diffusion des notifications pour un manga très suivi, sur une
+base SQLite temporaire.
+
+Usage : python benchmarks/bench_notifications.py [--followers 100000] [--batch 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import notifications  # noqa: E402
+from models import db, Manga, Notification  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--followers", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=notifications.FANOUT_BATCH)
+    args = parser.parse_args()
+    notifications.FANOUT_BATCH = args.batch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(Manga(id=1, name="Bench"))
+            db.session.commit()
+            db.session.execute(
+                db.text("INSERT INTO user (id, username, email) VALUES (:id, :name, :email)"),
+                [{"id": i, "name": f"u{i}", "email": f"u{i}@bench.test"} for i in range(1, args.followers + 1)]
+            )
+            db.session.execute(
+                db.text("INSERT INTO favorite (user_id, manga_id) VALUES (:id, 1)"),
+                [{"id": i} for i in range(1, args.followers + 1)]
+            )
+            db.session.commit()
+
+            results = {"followers": args.followers, "batch": args.batch}
+            start = time.perf_counter()
+            results["notified"] = notifications.fan_out(1, ["Chapitre 1"])
+            results["first_fanout_s"] = round(time.perf_counter() - start, 3)
+
+            # Deux chapitres de plus : regroupés dans les notifications non lues existantes
+            start = time.perf_counter()
+            notifications.fan_out(1, ["Chapitre 2", "Chapitre 3"])
+            results["coalesced_fanout_s"] = round(time.perf_counter() - start, 3)
+            results["notification_rows"] = Notification.query.count()
+            results["chapter_count_sample"] = db.session.get(Notification, 1).chapter_count
+
+            start = time.perf_counter()
+            for user_id in range(1, 1001):
+                notifications.get_inbox_page(user_id)
+                notifications.unread_count(user_id)
+            results["inbox_ms_per_user"] = round((time.perf_counter() - start) * 1000 / 1000, 4)
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
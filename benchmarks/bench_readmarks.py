@@ -0,0 +1,126 @@
+"""
+Benchmark du stockage des chapitres lus : une ligne par chapitre (ReadingProgress)
+contre une bitmap compressée par (utilisateur, manga) (ReadBitmap).
+
+Mesure la taille des tables SQLite et le temps d'affichage d'une page manga
+(chapitres lus, nombre de non lus, premier non lu).
+
+Usage : python benchmarks/bench_readmarks.py [--users 2000] [--mangas-per-user 10] [--chapters 300] [--lookups 5000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readmarks import encode, decode, is_read, unread_count, first_unread, range_mask  # noqa: E402
+
+
+def synthetic_reads(n_users, mangas_per_user, n_chapters, seed=42):
+    """Chaque lecteur a lu un préfixe de la série, plus quelques chapitres isolés."""
+    rng = random.Random(seed)
+    reads = {}
+    for user_id in range(n_users):
+        for manga_id in rng.sample(range(n_users), mangas_per_user):
+            prefix = rng.randint(1, n_chapters)
+            extra = {rng.randrange(n_chapters) for _ in range(rng.randint(0, 3))}
+            reads[(user_id, manga_id)] = sorted(set(range(prefix)) | extra)
+    return reads
+
+
+def table_size(conn, table):
+    """Octets occupés par une table et ses index (dbstat)."""
+    row = conn.execute(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name IN "
+        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)", (table, table)
+    ).fetchone()
+    return row[0] or 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--mangas-per-user", type=int, default=10)
+    parser.add_argument("--chapters", type=int, default=300)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    reads = synthetic_reads(args.users, args.mangas_per_user, args.chapters)
+    chapter_names = [f"Chapitre {i + 1}" for i in range(args.chapters)]
+    chapters_mask = range_mask(0, args.chapters - 1)
+    results = {"pairs": len(reads), "chapter_rows": sum(len(v) for v in reads.values())}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.executescript("""
+            CREATE TABLE reading_progress (id INTEGER PRIMARY KEY, user_id INTEGER, manga_id INTEGER,
+                                           chapter_name VARCHAR(120), last_read_at DATETIME);
+            CREATE UNIQUE INDEX ix_rp ON reading_progress (user_id, manga_id, chapter_name);
+            CREATE TABLE read_bitmap (user_id INTEGER, manga_id INTEGER, bits BLOB, read_count INTEGER,
+                                      updated_at DATETIME, PRIMARY KEY (user_id, manga_id));
+        """)
+
+        start = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO reading_progress (user_id, manga_id, chapter_name, last_read_at) "
+            "VALUES (?, ?, ?, '2026-01-01 00:00:00')",
+            ((u, m, chapter_names[o]) for (u, m), ordinals in reads.items() for o in ordinals)
+        )
+        conn.commit()
+        results["rows_insert_s"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        rows = []
+        for (u, m), ordinals in reads.items():
+            bits = 0
+            for o in ordinals:
+                bits |= 1 << o
+            rows.append((u, m, encode(bits), len(ordinals)))
+        conn.executemany(
+            "INSERT INTO read_bitmap (user_id, manga_id, bits, read_count, updated_at) "
+            "VALUES (?, ?, ?, ?, '2026-01-01 00:00:00')", rows
+        )
+        conn.commit()
+        results["bitmap_insert_s"] = round(time.perf_counter() - start, 3)
+
+        results["rows_bytes"] = table_size(conn, "reading_progress")
+        results["bitmap_bytes"] = table_size(conn, "read_bitmap")
+
+        keys = random.Random(1).choices(list(reads), k=args.lookups)
+
+        rows_answers = []
+        start = time.perf_counter()
+        for u, m in keys:
+            read = {name for (name,) in conn.execute(
+                "SELECT chapter_name FROM reading_progress WHERE user_id = ? AND manga_id = ?", (u, m))}
+            flags = [name in read for name in chapter_names]
+            unread = flags.count(False)
+            first = next((name for name, flag in zip(chapter_names, flags) if not flag), None)
+            rows_answers.append((unread, first))
+        results["rows_lookup_ms"] = round((time.perf_counter() - start) * 1000 / args.lookups, 4)
+
+        bitmap_answers = []
+        start = time.perf_counter()
+        for u, m in keys:
+            data = conn.execute(
+                "SELECT bits FROM read_bitmap WHERE user_id = ? AND manga_id = ?", (u, m)).fetchone()
+            bits = decode(data[0]) if data else 0
+            flags = [is_read(bits, o) for o in range(args.chapters)]
+            unread = unread_count(bits, chapters_mask)
+            first = first_unread(bits, chapters_mask)
+            bitmap_answers.append((unread, None if first is None else chapter_names[first]))
+        results["bitmap_lookup_ms"] = round((time.perf_counter() - start) * 1000 / args.lookups, 4)
+        conn.close()
+
+    # Les deux stockages doivent donner le même affichage (non lus, premier non lu)
+    assert rows_answers == bitmap_answers, "la bitmap ne donne pas les mêmes réponses que les lignes"
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
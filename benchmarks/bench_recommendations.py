@@ -0,0 +1,61 @@
+"""
+Benchmark du recommandeur sur des données synthétiques (sans base de données).
+
+Usage : python benchmarks/bench_recommendations.py [--users 100000] [--mangas 5000] [--per-user 15]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recommendations import build_matrix, compute_item_neighbours, compute_user_recommendations  # noqa: E402
+
+
+def synthetic_interactions(n_users, n_mangas, per_user, seed=42):
+    """Popularité des mangas en loi de Zipf, nombre de lectures par utilisateur géométrique."""
+    rng = np.random.default_rng(seed)
+    counts = np.minimum(rng.geometric(1 / per_user, size=n_users), n_mangas)
+    popularity = 1 / np.arange(1, n_mangas + 1) ** 0.9
+    popularity /= popularity.sum()
+    users = np.repeat(np.arange(n_users), counts)
+    mangas = rng.choice(n_mangas, size=len(users), p=popularity)
+    weights = np.where(rng.random(len(users)) < 0.1, 2.0, 1.0)  # ~10 % de favoris
+    return users, mangas, weights
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--mangas", type=int, default=5_000)
+    parser.add_argument("--per-user", type=int, default=15)
+    args = parser.parse_args()
+
+    users, mangas, weights = synthetic_interactions(args.users, args.mangas, args.per_user)
+    timings = {}
+
+    start = time.perf_counter()
+    matrix = build_matrix(users, mangas, weights)
+    timings["build_matrix_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    neighbours, scores = compute_item_neighbours(matrix)
+    timings["item_neighbours_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rec_users, _, _, _ = compute_user_recommendations(matrix, neighbours, scores)
+    timings["user_recommendations_s"] = time.perf_counter() - start
+
+    print(json.dumps({
+        "users": len(matrix["users"]),
+        "mangas": len(matrix["items"]),
+        "interactions": len(matrix["values"]),
+        "recommendations": int(len(rec_users)),
+        **{k: round(v, 3) for k, v in timings.items()},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Temps de démarrage à froid (nouveau processus Python à chaque mesure) :
+  - application web complète : create_app() ;
+  - application des commandes : create_cli_app() et « flask --app cli:create_cli_app --help ».
+
+Objectif : une commande d'administration démarre en moins de --target secondes
+(meilleur des --runs démarrages, peu sensible à la charge de la machine) ;
+code de sortie 1 sinon (utilisable en CI).
+
+Usage : python benchmarks/bench_startup.py [--runs 7] [--target 0.75] [--output results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "web_create_app": [sys.executable, "-c", "from app import create_app; create_app()"],
+    "cli_create_app": [sys.executable, "-c", "from cli import create_cli_app; create_cli_app()"],
+    "flask_cli_help": [sys.executable, "-m", "flask", "--app", "cli:create_cli_app", "--help"],
+}
+CLI_CASES = ("cli_create_app", "flask_cli_help")
+
+
+def measure(command, runs, env):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return {"median": round(statistics.median(timings), 3), "min": round(min(timings), 3)}
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--target", type=float, default=0.75, help="Secondes, meilleur démarrage CLI")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    # Base vide : seul le démarrage est mesuré, pas le contenu du site
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(workdir, "site.db"),
+               MANGAS_DIR=os.path.join(workdir, "mangas"))
+    # Premier passage : compilation des .pyc, hors mesure
+    for command in CASES.values():
+        subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    results = {"commit": current_commit(), "runs": args.runs, "target": args.target}
+    for name, command in CASES.items():
+        results[name] = measure(command, args.runs, env)
+    results["ok"] = all(results[name]["min"] <= args.target for name in CLI_CASES)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(0 if results["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
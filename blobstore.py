@@ -0,0 +1,211 @@
+"""
+Stockage des images par contenu : chaque image n'est rangée qu'une fois, dans
+blobs/<2 premiers caractères>/<sha256><extension>, et les fichiers de mangas/
+(pages, couvertures) en sont des liens physiques. Le nombre de liens d'un blob
+sert de compteur de références : une page de crédits présente dans cent
+chapitres, ou un chapitre renvoyé deux fois, n'occupe la place qu'une fois.
+collect_garbage() supprime les blobs qui ne sont plus liés nulle part.
+
+Les blobs sont en lecture seule : un fichier partagé ne doit jamais être
+réécrit sur place (il l'est pour tous ses chapitres), seulement remplacé.
+Si mangas/ et blobs/ ne sont pas sur le même système de fichiers, les fichiers
+sont copiés : rien n'est dédupliqué, mais tout fonctionne.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import BLOBS_DIR, MANGAS_DIR
+from cbz import IMAGE_EXTENSIONS
+
+HASH_CHUNK = 1024 * 1024   # Lecture par blocs de 1 Mo pour le hachage
+SCAN_WORKERS = 8           # Fichiers hachés en parallèle par dedup_tree (hashlib libère le GIL)
+INDEX_REFRESH = 60         # Relecture au plus une fois par minute de l'index inode -> blob
+TMP_MAX_AGE = 3600         # Fichiers temporaires abandonnés, supprimés par collect_garbage
+
+BLOB_NAME_RE = re.compile(r"[0-9a-f]{64}(\.[a-z0-9]{1,5})?")
+
+# (st_dev, st_ino) -> nom du blob : retrouve le blob d'une page sans la relire
+_inodes = {}
+_inodes_loaded = 0.0
+_inodes_lock = threading.Lock()
+
+
+def blob_path(name):
+    return os.path.join(BLOBS_DIR, name[:2], name)
+
+
+def blob_name(digest, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return digest + (".jpg" if ext == ".jpeg" else ext)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link(src, dest):
+    """Remplace dest par un lien vers src, de façon atomique (dest n'est jamais absent ni incomplet)."""
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)  # Autre système de fichiers
+    os.replace(tmp, dest)
+
+
+def _publish(path, name):
+    """Range le fichier path comme blob name s'il n'existe pas encore ; retourne le chemin du blob."""
+    target = blob_path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(path, target)
+    except FileExistsError:
+        return target  # Même contenu déjà rangé (éventuellement par un autre worker)
+    os.chmod(target, 0o444)
+    st = os.stat(target)
+    _inodes[(st.st_dev, st.st_ino)] = name
+    return target
+
+
+def store(fileobj, dest):
+    """
+    Enregistre le flux fileobj (fichier envoyé, fichier ouvert) comme contenu de
+    dest : haché pendant l'écriture, rangé une seule fois, dest devient un lien
+    vers le blob. Retourne le nom du blob.
+    """
+    tmp_dir = os.path.join(BLOBS_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp = os.path.join(tmp_dir, uuid.uuid4().hex)
+    h = hashlib.sha256()
+    try:
+        with open(tmp, "wb") as out:
+            while chunk := fileobj.read(HASH_CHUNK):
+                h.update(chunk)
+                out.write(chunk)
+        name = blob_name(h.hexdigest(), dest)
+        _link(_publish(tmp, name), dest)
+    finally:
+        os.remove(tmp)
+    return name
+
+
+def store_file(src, dest):
+    """Copie src vers dest via le stockage par contenu (dest partage le blob s'il existe déjà)."""
+    with open(src, "rb") as f:
+        return store(f, dest)
+
+
+def dedup_file(path, digest=None):
+    """
+    Remplace path par un lien vers le blob de même contenu (créé à partir de
+    path s'il n'existe pas encore). Retourne les octets libérés.
+    """
+    name = blob_name(digest or file_digest(path), path)
+    st = os.stat(path)
+    target = blob_path(name)
+    try:
+        blob = os.stat(target)
+    except FileNotFoundError:
+        try:
+            _publish(path, name)
+        except OSError:
+            pass  # Autre système de fichiers : rien à partager
+        return 0
+    if (blob.st_dev, blob.st_ino) == (st.st_dev, st.st_ino) or blob.st_dev != st.st_dev:
+        return 0
+    _link(target, path)
+    return st.st_size if st.st_nlink == 1 else 0
+
+
+def _scan_images(root):
+    """Images de mangas/ : couvertures (mangas/<manga>/) et pages des chapitres en dossier."""
+    for manga in os.scandir(root):
+        if not manga.is_dir():
+            continue
+        for entry in os.scandir(manga.path):
+            if entry.is_dir():
+                for page in os.scandir(entry.path):
+                    if page.is_file() and page.name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield page
+            elif entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry
+
+
+def dedup_tree(root=MANGAS_DIR, workers=SCAN_WORKERS):
+    """
+    Déduplique les images existantes : hachage en parallèle (threads), puis
+    liens posés un par un. Les fichiers déjà liés à un blob ne sont pas relus,
+    un nouveau passage ne coûte que le parcours des dossiers.
+    """
+    _load_index()
+    return dedup_paths([entry.path for entry in _scan_images(root) if blob_name_for(entry.stat()) is None], workers)
+
+
+def dedup_paths(paths, workers=SCAN_WORKERS):
+    """Déduplique une liste de fichiers (hachage en parallèle, liens dans l'ordre)."""
+    stats = {"files": len(paths), "linked": 0, "bytes_saved": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, digest in zip(paths, pool.map(file_digest, paths)):
+            saved = dedup_file(path, digest)
+            if saved:
+                stats["linked"] += 1
+                stats["bytes_saved"] += saved
+    return stats
+
+
+def collect_garbage():
+    """Supprime les blobs qui ne sont plus liés à aucun fichier et les temporaires abandonnés."""
+    removed = freed = 0
+    if not os.path.isdir(BLOBS_DIR):
+        return removed, freed
+    now = time.time()
+    for shard in os.scandir(BLOBS_DIR):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            st = entry.stat()
+            if shard.name == "tmp":
+                if now - st.st_mtime > TMP_MAX_AGE:
+                    os.remove(entry.path)
+            elif st.st_nlink == 1:
+                os.remove(entry.path)
+                _inodes.pop((st.st_dev, st.st_ino), None)
+                removed += 1
+                freed += st.st_size
+    return removed, freed
+
+
+def _load_index():
+    global _inodes, _inodes_loaded
+    inodes = {}
+    if os.path.isdir(BLOBS_DIR):
+        dev = os.stat(BLOBS_DIR).st_dev
+        for shard in os.scandir(BLOBS_DIR):
+            if shard.is_dir() and shard.name != "tmp":
+                # inode() vient de la lecture du dossier : aucun stat par blob
+                inodes.update(((dev, entry.inode()), entry.name) for entry in os.scandir(shard.path))
+    _inodes = inodes
+    _inodes_loaded = time.monotonic()
+
+
+def blob_name_for(st):
+    """Nom du blob dont le fichier de stat st est un lien, ou None."""
+    if st.st_nlink < 2:
+        return None
+    key = (st.st_dev, st.st_ino)
+    name = _inodes.get(key)
+    if name is None and time.monotonic() - _inodes_loaded > INDEX_REFRESH:
+        with _inodes_lock:
+            if time.monotonic() - _inodes_loaded > INDEX_REFRESH:
+                _load_index()
+        name = _inodes.get(key)
+    return name
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from metrics import count_fs
+
+IMMUTABLE_MAX_AGE = 365 * 86400   # Fichiers servis avec une empreinte (?v=) : jamais revalidés
+
+_stat = count_fs(os.stat)  # Compté dans les métriques par requête
+
+
+class TTLCache:
+    """
+    Petit cache mémoire (par processus) avec durée de vie et éviction LRU.
+    Les valeurs stockées doivent être des données simples (dict, list...),
+    jamais des objets SQLAlchemy attachés à une session.
+    """
+
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def file_fingerprint(path):
+    """
+    Empreinte d'un fichier pour ses URLs (?v=) : date de modification et
+    taille. Change dès que le fichier est remplacé, ce qui permet de le mettre
+    en cache indéfiniment côté navigateur. None si le fichier n'existe pas.
+    """
+    try:
+        st = _stat(path)
+    except OSError:
+        return None
+    return stat_fingerprint(st)
+
+
+def stat_fingerprint(st):
+    return f"{int(st.st_mtime):x}{st.st_size:x}"
@@ -0,0 +1,374 @@
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from flask import request, url_for, abort, current_app
+from flask_login import current_user
+from blobstore import blob_name_for
+from cache import TTLCache, file_fingerprint, stat_fingerprint
+from cbz import chapter_names, read_chapter_file
+from config import MANGAS_DIR
+from metrics import count_fs
+from models import db, Manga, Chapter
+from ratings import get_top_rated
+from readmarks import manga_chapters
+from trending import trending, HOT_THRESHOLD
+from notifications import unread_count as unread_notifications_count
+
+USE_DATABASE = True # Passe à True pour utiliser la base de données ou False pour le système de fichiers
+POSSIBLE_COVER_FILENAMES = ["cover.webp", "cover.jpg", "cover.jpeg", "cover.png"]
+WARM_UP_MANGAS = 1000   # Mangas (les plus récents) dont les caches sont préremplis au démarrage d'un worker
+
+# Couvertures trouvées sur disque (nom de fichier ou None) et liste des catégories, par worker
+_catalog_cache = TTLCache(ttl=300, maxsize=8192)
+
+# Accès disque du catalogue, comptés dans les métriques par requête
+_open = count_fs(open)
+_stat = count_fs(os.stat)
+_listdir = count_fs(os.listdir)
+_exists = count_fs(os.path.exists)
+_isdir = count_fs(os.path.isdir)
+
+
+@lru_cache(maxsize=128)
+def get_manga_details_cached(manga_name_fs):
+    return _get_manga_details_from_fs(manga_name_fs)
+
+def is_valid_name(name):
+    # Autorise lettres, chiffres, espaces, tirets, underscores, pas vide
+    return bool(re.match(r'^[\w\s\-]+$', name)) and name.strip() != ""
+
+def ajouter_chapitre(manga_name_fs, chapter_name_fs):
+    chapter_dir = os.path.join(MANGAS_DIR, manga_name_fs, chapter_name_fs)
+    os.makedirs(chapter_dir, exist_ok=True)
+    with _open(os.path.join(chapter_dir, "date_added.txt"), "w") as f:
+        f.write(str(int(time.time())))
+
+def parse_rating(rating):
+    if not rating:
+        return 0.0
+    if isinstance(rating, (int, float)):
+        return float(rating)
+    if "/" in str(rating):
+        return float(str(rating).split("/")[0].replace(",", "."))
+    try:
+        return float(str(rating).replace(",", "."))
+    except Exception:
+        return 0.0
+
+def find_cover(manga_name):
+    """
+    (fichier de couverture du manga, empreinte, blob partagé ou None) ou None ;
+    évite jusqu'à 4 stat par couverture affichée.
+    """
+    key = ("cover", manga_name)
+    cover = _catalog_cache.get(key, False)
+    if cover is False:
+        cover = None
+        for filename in POSSIBLE_COVER_FILENAMES:
+            try:
+                st = _stat(os.path.join(MANGAS_DIR, manga_name, filename))
+            except OSError:
+                continue
+            cover = (filename, stat_fingerprint(st), blob_name_for(st))
+            break
+        _catalog_cache.set(key, cover)
+    return cover
+
+def media_url(endpoint, path=None, **values):
+    """
+    URL d'une image ou d'une archive de mangas/ : avec l'empreinte du fichier
+    path (?v=, cache navigateur permanent) et, si IMAGE_GATEWAY_URL est défini,
+    sur la passerelle d'images, qui reprend les mêmes chemins que le site.
+    """
+    if path is not None:
+        fingerprint = file_fingerprint(path)
+        if fingerprint:
+            values["v"] = fingerprint
+    url = url_for(endpoint, **values)
+    gateway = current_app.config.get('IMAGE_GATEWAY_URL')
+    return gateway.rstrip("/") + url if gateway else url
+
+def page_url(manga_name, chapter_name, filename):
+    """
+    URL d'une page de chapitre en dossier. Une page dédupliquée (lien vers un
+    blob) a l'URL de son blob : les pages identiques de tous les chapitres
+    (crédits, annonces) ne sont téléchargées qu'une fois par le navigateur.
+    """
+    try:
+        st = _stat(os.path.join(MANGAS_DIR, manga_name, chapter_name, filename))
+    except OSError:
+        return media_url('site.manga_image', manga_name=manga_name, chapter_name=chapter_name, filename=filename)
+    blob = blob_name_for(st)
+    if blob:
+        return media_url('site.serve_blob', name=blob)
+    return media_url('site.manga_image', manga_name=manga_name, chapter_name=chapter_name, filename=filename,
+                     v=stat_fingerprint(st))
+
+def get_cover_url(manga_name):
+    cover = find_cover(manga_name)
+    if cover:
+        filename, fingerprint, blob = cover
+        if blob:
+            return media_url('site.serve_blob', name=blob)
+        return media_url('site.serve_manga_file', manga=manga_name, filename=filename, v=fingerprint)
+    # Ensure a default cover is returned if no cover file exists
+    return url_for('static', filename='default-cover.jpg')
+
+def get_categories():
+    categories = _catalog_cache.get("categories")
+    if categories is None:
+        categories = sorted({category or "Autre" for category, in db.session.query(Manga.category).distinct()})
+        _catalog_cache.set("categories", categories)
+    return categories
+
+def invalidate_catalog(manga_name=None):
+    """Après ajout d'un manga : catégories et couverture relues (les autres workers attendent le TTL)."""
+    _catalog_cache.delete("categories")
+    if manga_name is not None:
+        _catalog_cache.delete(("cover", manga_name))
+
+def warm_up(limit=WARM_UP_MANGAS):
+    """
+    Préremplit les caches du worker avant sa première requête : catégories,
+    couvertures et chapitres des mangas les plus récents, top des notes et
+    tendances. Appelé par gunicorn (post_worker_init), dans un contexte d'application.
+    """
+    get_categories()
+    mangas = Manga.query.with_entities(Manga.id, Manga.name).order_by(Manga.date_added.desc()).limit(limit).all()
+    for manga_id, name in mangas:
+        find_cover(name)
+        manga_chapters(manga_id)
+    get_top_rated()
+    trending_mangas()
+    db.session.remove()
+    return len(mangas)
+
+def compute_badges(manga):
+    # NEW : moins de 7 jours
+    is_new = False
+    if manga.get("date_added"):
+        try:
+            is_new = (datetime.utcnow() - datetime.fromtimestamp(int(manga["date_added"]))) < timedelta(days=7)
+        except Exception:
+            is_new = False
+
+    # HOT : plus de 100 lectures récentes (pondérées par ancienneté, moteur de tendances)
+    is_hot = manga.get("nb_lectures_recent")
+    if is_hot is None:
+        is_hot = trending.recent_reads(manga.get("name"))
+    try:
+        is_hot = float(is_hot) > HOT_THRESHOLD
+    except Exception:
+        is_hot = False
+
+    # TOP : score bayésien précalculé (mode BDD), sinon note moyenne >= 4.5 (mode fichiers)
+    if "rating_count" in manga:
+        is_top = manga.get("name") in get_top_rated()["top_names"]
+    else:
+        rating = manga.get("avg_rating") or manga.get("rating") or 0
+        try:
+            rating_float = float(str(rating).replace(",", ".").split("/")[0])
+            is_top = rating_float >= 4.5
+        except Exception:
+            is_top = False
+
+    manga["is_new"] = is_new
+    manga["is_hot"] = is_hot
+    manga["is_top"] = is_top
+    return manga
+
+def unread_notifications():
+    """Nombre de notifications non lues (compté seulement si le gabarit l'affiche)."""
+    if not current_user.is_authenticated:
+        return 0
+    return unread_notifications_count(current_user.id)
+
+def trending_mangas(limit=10, kind="trending"):
+    """Top N des mangas tendance (kind="trending") ou les plus lus sur 7 jours (kind="popular")."""
+    return trending.top(kind, limit)
+
+def utility_processor():
+    return dict(get_cover_url=get_cover_url, trending_mangas=trending_mangas,
+                unread_notifications=unread_notifications, media_url=media_url)
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not getattr(current_user, "is_admin", False):
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _get_manga_details_from_fs(manga_name_fs):
+    """
+    Récupère les détails d'un manga depuis le système de fichiers.
+    Retourne un dictionnaire avec les détails, ou None si le manga n'est pas trouvé/valide.
+    """
+    manga_dir_path = os.path.join(MANGAS_DIR, manga_name_fs)
+    if not _isdir(manga_dir_path):
+        current_app.logger.warning(f"Le chemin du manga n'est pas un dossier valide : {manga_dir_path}")
+        return None
+
+    cover_url = next((media_url('site.serve_manga_file', os.path.join(manga_dir_path, cover_file),
+                                manga=manga_name_fs, filename=cover_file)
+                      for cover_file in POSSIBLE_COVER_FILENAMES
+                      if _exists(os.path.join(manga_dir_path, cover_file))), None)
+
+    syllabus_content = ""
+    syllabus_path = os.path.join(manga_dir_path, "syllabus.txt")
+    if _exists(syllabus_path):
+        try:
+            with _open(syllabus_path, 'r', encoding='utf-8') as f:
+                syllabus_content = f.read().strip()
+        except Exception as e:
+            current_app.logger.error(f"Erreur lors de la lecture du syllabus {syllabus_path} pour {manga_name_fs}: {e}")
+
+    date_added_path = os.path.join(manga_dir_path, "date_added.txt")
+    date_added = 0
+    if _exists(date_added_path):
+        try:
+            with _open(date_added_path, "r") as f:
+                date_added = int(f.read().strip())
+        except Exception:
+            date_added = 0
+
+    first_chapter = None
+    try:
+        chapter_dirs = sorted(chapter_names(manga_dir_path))
+        if chapter_dirs:
+            first_chapter = chapter_dirs[0]
+    except Exception as e:
+        current_app.logger.error(f"Erreur lors de la récupération des chapitres pour {manga_name_fs}: {e}")
+
+    category = "Autre"
+    category_path = os.path.join(manga_dir_path, "category.txt")
+    if _exists(category_path):
+        try:
+            with _open(category_path, 'r', encoding='utf-8') as f:
+                category = f.read().strip()
+        except Exception:
+            category = "Autre"
+
+    author = ""
+    author_path = os.path.join(manga_dir_path, "author.txt")
+    if _exists(author_path):
+        try:
+            with _open(author_path, 'r', encoding='utf-8') as f:
+                author = f.read().strip()
+        except Exception:
+            author = ""
+
+    year = ""
+    year_path = os.path.join(manga_dir_path, "year.txt")
+    if _exists(year_path):
+        try:
+            with _open(year_path, 'r', encoding='utf-8') as f:
+                year = f.read().strip()
+        except Exception:
+            year = ""
+
+    rating = ""
+    rating_path = os.path.join(manga_dir_path, "rating.txt")
+    if _exists(rating_path):
+        try:
+            with _open(rating_path, 'r', encoding='utf-8') as f:
+                rating = f.read().strip()
+        except Exception:
+            rating = ""
+
+    nb_chapitres = len(chapter_names(manga_dir_path))
+
+    return {
+        "name": manga_name_fs,
+        "cover": cover_url,
+        "syllabus": syllabus_content,
+        "first_chapter": first_chapter,
+        "date_added": date_added,
+        "nb_chapitres": nb_chapitres,
+        "category": category,
+        "author": author,
+        "year": year,
+        "rating": rating
+    }
+
+def datetimeformat(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).strftime('%d/%m/%Y')
+    return value
+
+def get_recent_chapters(limit=8):
+    recent_chapters = []
+
+    # 1. Récupération depuis la BDD
+    now = datetime.utcnow()
+    # 1. Récupération depuis la BDD (on prend plus large pour filtrer ensuite)
+    for chapter in Chapter.query.order_by(Chapter.date_added.desc()).limit(limit * 4):
+        if chapter.date_added and (now - datetime.fromtimestamp(chapter.date_added)).days < 7:
+            manga = chapter.manga  # relation SQLAlchemy
+            cover_url = url_for('site.serve_manga_file', manga=manga.name, filename=manga.cover_filename) if manga.cover_filename else url_for('static', filename='default-cover.jpg')
+            recent_chapters.append({
+                "manga_name": manga.name,
+                "chapter_folder": chapter.name,
+                "date_added": chapter.date_added,
+                "cover": cover_url
+            })
+
+    seen = set((c["manga_name"], c["chapter_folder"]) for c in recent_chapters)
+    for manga_name_fs in _listdir(MANGAS_DIR):
+        manga_dir = os.path.join(MANGAS_DIR, manga_name_fs)
+        if not _isdir(manga_dir):
+            continue
+        # Cherche la cover
+        cover_url = next(
+            (url_for('site.serve_manga_file', manga=manga_name_fs, filename=cover_file)
+             for cover_file in POSSIBLE_COVER_FILENAMES
+             if _exists(os.path.join(manga_dir, cover_file))),
+            url_for('static', filename='default-cover.jpg')
+        )
+        # Ajoute chaque chapitre
+        for chapter_folder in chapter_names(manga_dir):
+            if (manga_name_fs, chapter_folder) in seen:
+                continue
+            try:
+                date_added = int(read_chapter_file(os.path.join(manga_dir, chapter_folder), "date_added.txt", "0").strip())
+            except Exception:
+                date_added = 0
+            if date_added and (now - datetime.fromtimestamp(date_added)).days < 7:
+                recent_chapters.append({
+                    "manga_name": manga_name_fs,
+                    "chapter_folder": chapter_folder,
+                    "date_added": date_added,
+                    "cover": cover_url
+                })
+
+    # Trie et limite la liste finale
+    recent_chapters = sorted(recent_chapters, key=lambda c: c["date_added"], reverse=True)[:limit]
+    return recent_chapters
+
+def safe_name(name):
+    # Autorise seulement lettres, chiffres, tirets, underscores
+    return re.sub(r'[^a-zA-Z0-9_\-]', '', name)
+
+def inject_categories():
+    source = get_source()
+    if source == "db":
+        categories = get_categories()
+    else:
+        all_mangas_data = [
+            _get_manga_details_from_fs(manga_name_fs)
+            for manga_name_fs in _listdir(MANGAS_DIR)
+            if _isdir(os.path.join(MANGAS_DIR, manga_name_fs))
+        ]
+        all_mangas_data = [m for m in all_mangas_data if m is not None]
+        categories = sorted({m.get('category', 'Autre') for m in all_mangas_data})
+    return dict(categories=categories)
+
+def get_source():
+    source = request.args.get("source")
+    if source == "db":
+        return "db"
+    elif source == "fs":
+        return "fs"
+    return "db" if USE_DATABASE else "fs"
@@ -0,0 +1,255 @@
+"""
+Chapitres sur disque, sous deux formes :
+  - dossier mangas/<manga>/<chapitre>/ (une image par page, fichiers annexes) ;
+  - archive mangas/<manga>/<chapitre>.cbz, zip sans compression (les images le
+    sont déjà) : un seul fichier par chapitre, pages lues directement dans
+    l'archive à partir de son index (position et taille de chaque page).
+Le dossier est prioritaire si les deux existent (conversion en cours).
+"""
+import io
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zipfile
+from flask import send_file, send_from_directory
+from cache import TTLCache, stat_fingerprint
+from metrics import count_fs
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+ARCHIVE_EXTENSION = ".cbz"
+
+# En-tête local d'une entrée zip (30 octets) : longueurs du nom et du champ extra aux octets 26 à 29
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+
+# Index des archives ouvertes, par chemin (relus si l'archive est remplacée)
+_index_cache = TTLCache(ttl=3600, maxsize=256)
+
+# Accès disque des lectures de chapitres, comptés dans les métriques par requête
+_open = count_fs(open)
+_stat = count_fs(os.stat)
+_listdir = count_fs(os.listdir)
+_scandir = count_fs(os.scandir)
+_isdir = count_fs(os.path.isdir)
+_isfile = count_fs(os.path.isfile)
+_send_file = count_fs(send_file)
+_send_from_directory = count_fs(send_from_directory)
+
+
+def chapter_images(chapter_dir):
+    return [f for f in sorted(_listdir(chapter_dir)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def archive_path(chapter_dir):
+    return chapter_dir + ARCHIVE_EXTENSION
+
+
+def is_chapter_dir(chapter_dir):
+    return _isdir(chapter_dir)
+
+
+def is_archived(chapter_dir):
+    return _isfile(archive_path(chapter_dir))
+
+
+def chapter_exists(chapter_dir):
+    return is_chapter_dir(chapter_dir) or is_archived(chapter_dir)
+
+
+def send_media_file(directory, filename, **kwargs):
+    """send_from_directory sur un fichier de mangas/, compté dans les accès disque."""
+    return _send_from_directory(directory, filename, **kwargs)
+
+
+def send_archive(chapter_dir, download_name):
+    """Archive .cbz du chapitre envoyée telle quelle (sendfile)."""
+    return _send_file(archive_path(chapter_dir), mimetype="application/cbz", as_attachment=True,
+                      download_name=download_name)
+
+
+def chapter_names(manga_dir):
+    """Noms des chapitres d'un manga (non triés), qu'ils soient en dossier ou en archive (noms cachés exclus)."""
+    names = set()
+    for entry in _scandir(manga_dir):
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir():
+            names.add(entry.name)
+        elif entry.name.endswith(ARCHIVE_EXTENSION) and entry.is_file():
+            names.add(entry.name[:-len(ARCHIVE_EXTENSION)])
+    return list(names)
+
+
+class ArchivePage:
+    """
+    Page ouverte dans l'archive : lecture bornée à la page. fileno() et la
+    position courante permettent à gunicorn de l'envoyer par sendfile, sans
+    copie, pour Content-Length octets.
+    """
+
+    def __init__(self, file, size):
+        self._file = file
+        self.size = size
+        self._left = size
+
+    def read(self, n=-1):
+        if n is None or n < 0 or n > self._left:
+            n = self._left
+        data = self._file.read(n)
+        self._left -= len(data)
+        return data
+
+    def seek(self, position):
+        return self._file.seek(position)
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+class ArchiveIndex:
+    """
+    Index d'une archive de chapitre : nom -> (position des données, taille),
+    lu une fois dans le répertoire central et les en-têtes locaux (via mmap).
+    Seules les entrées non compressées sont servies.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._map = None
+        self._lock = threading.Lock()
+        with _open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.stamp = (st.st_mtime_ns, st.st_size)
+            self.fingerprint = stat_fingerprint(st)
+            self.mtime = st.st_mtime
+            with zipfile.ZipFile(f) as zf, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for info in zf.infolist():
+                    if info.is_dir() or info.compress_type != zipfile.ZIP_STORED:
+                        continue
+                    header = _LOCAL_HEADER.unpack_from(mm, info.header_offset)
+                    offset = info.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+                    self.entries[info.filename] = (offset, info.file_size)
+        self.pages = sorted(name for name in self.entries if "/" not in name and name.lower().endswith(IMAGE_EXTENSIONS))
+
+    def open(self, name):
+        """ArchivePage positionnée sur l'entrée, ou None (absente, ou archive remplacée entre-temps)."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        f = _open(self.path, "rb")
+        st = os.fstat(f.fileno())
+        if (st.st_mtime_ns, st.st_size) != self.stamp:
+            f.close()
+            return None
+        f.seek(entry[0])
+        return ArchivePage(f, entry[1])
+
+    def view(self, name):
+        """Octets de l'entrée, en memoryview sur l'archive projetée en mémoire (sans copie), ou None."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        with self._lock:
+            if self._map is None:
+                with _open(self.path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size != self.stamp[1]:
+                        return None
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, size = entry
+        return memoryview(self._map)[offset:offset + size]
+
+    def read_text(self, name):
+        page = self.open(name)
+        if page is None:
+            return None
+        try:
+            return page.read().decode("utf-8", errors="replace")
+        finally:
+            page.close()
+
+
+def archive_index(path):
+    """Index de l'archive, relu si elle a changé ; None si elle est absente ou illisible."""
+    try:
+        st = _stat(path)
+    except OSError:
+        return None
+    index = _index_cache.get(path)
+    if index is None or index.stamp != (st.st_mtime_ns, st.st_size):
+        try:
+            index = ArchiveIndex(path)
+        except (OSError, ValueError, struct.error, zipfile.BadZipFile):
+            return None
+        _index_cache.set(path, index)
+    return index
+
+
+def chapter_pages(chapter_dir):
+    """Pages (images triées) d'un chapitre, dossier ou archive ; None si le chapitre n'existe pas."""
+    if _isdir(chapter_dir):
+        return chapter_images(chapter_dir)
+    index = archive_index(archive_path(chapter_dir))
+    return index.pages if index else None
+
+
+def read_chapter_file(chapter_dir, name, default=None):
+    """Fichier annexe d'un chapitre (ex. date_added.txt), dans le dossier ou l'archive."""
+    if _isdir(chapter_dir):
+        try:
+            with _open(os.path.join(chapter_dir, name), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return default
+    index = archive_index(archive_path(chapter_dir))
+    text = index.read_text(name) if index else None
+    return default if text is None else text
+
+
+def build_cbz(chapter_dir):
+    """Archive CBZ (zip des pages, sans compression) d'un chapitre en dossier ; None s'il n'a aucune image."""
+    images = chapter_images(chapter_dir)
+    if not images:
+        return None
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_STORED) as zip_file:
+        for img in images:
+            zip_file.write(os.path.join(chapter_dir, img), arcname=img)
+    return zip_buffer.getvalue()
+
+
+def pack_chapter(chapter_dir, keep=False):
+    """
+    Convertit un dossier de chapitre en <chapitre>.cbz (pages et fichiers annexes,
+    sans compression), vérifie l'archive puis supprime le dossier (sauf keep).
+    Retourne le nombre de pages, ou None si le dossier contient des sous-dossiers.
+    """
+    entries = sorted(os.scandir(chapter_dir), key=lambda entry: entry.name)
+    if any(entry.is_dir() for entry in entries):
+        return None
+    target = archive_path(chapter_dir)
+    tmp = target + ".tmp"
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as zf:
+            for entry in entries:
+                zf.write(entry.path, arcname=entry.name)
+        with zipfile.ZipFile(tmp) as zf:
+            if zf.testzip() is not None:
+                raise zipfile.BadZipFile(f"archive corrompue : {tmp}")
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        index = ArchiveIndex(tmp)
+        if len(index.entries) != len(entries):
+            raise zipfile.BadZipFile(f"entrées manquantes : {tmp}")
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if not keep:
+        shutil.rmtree(chapter_dir)
+    return len(index.pages)
@@ -0,0 +1,59 @@
+# Parcourt toutes les routes GET du site avec le détecteur de N+1 actif.
+# Code de sortie 1 si une requête SQL est répétée au-delà du seuil (utilisable en CI).
+import os
+import sys
+from app import create_app
+from config import MANGAS_DIR
+from models import User, Manga, Chapter, Comment
+from nplusone import nplusone
+
+SKIPPED = {'static', 'site.events_stream', 'auth.reset_password', 'auth.logout'}  # Flux sans fin / jeton à usage unique / fin de session
+
+
+def sample_values():
+    chapter = Chapter.query.order_by(Chapter.id).first()
+    manga = chapter.manga if chapter else Manga.query.first()
+    chapter_dir = os.path.join(MANGAS_DIR, manga.name, chapter.name) if chapter else None
+    images = sorted(os.listdir(chapter_dir)) if chapter_dir and os.path.isdir(chapter_dir) else []
+    comment = Comment.query.first()
+    return {
+        "manga_name": manga.name if manga else "",
+        "manga": manga.name if manga else "",
+        "chapter_name": chapter.name if chapter else "",
+        "filename": images[0] if images else "cover.jpg",
+        "comment_id": comment.id if comment else 1,
+    }
+
+
+def main():
+    app = create_app({'NPLUSONE_ENABLED': True, 'RATELIMIT_STORAGE': 'memory', 'RATELIMIT_ENABLED': False})
+    client = app.test_client()
+    with app.app_context():
+        values = sample_values()
+        user = User.query.filter_by(is_admin=True).first() or User.query.first()
+        user_id = user.id if user else None
+    if user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if 'GET' not in rule.methods or rule.endpoint in SKIPPED:
+            continue
+        path = rule.rule
+        for arg in rule.arguments:
+            path = path.replace(f"<{arg}>", str(values.get(arg, ""))).replace(f"<int:{arg}>", str(values.get(arg, 1)))
+        response = client.get(path)
+        response.close()
+        print(f"{response.status_code} {path}")
+
+    if nplusone.violations:
+        print(f"\n{len(nplusone.violations)} N+1 probable(s) :")
+        for endpoint, count, shape, site in nplusone.violations:
+            print(f"- {endpoint} : {count} × {shape[:160]}\n  {site}")
+        sys.exit(1)
+    print("\nAucun N+1 détecté.")
+
+
+if __name__ == "__main__":
+    main()
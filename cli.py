@@ -0,0 +1,26 @@
+from flask import Flask
+from config import Config
+from models import db
+
+
+def create_cli_app(config=None):
+    """
+    Application réduite pour les commandes et scripts : configuration, base et
+    migrations seulement (ni vues, ni gabarits compilés, ni threads de fond).
+    Usage : flask --app cli:create_cli_app <commande> (sync, promote-admin, ...).
+    """
+    from flask_migrate import Migrate
+    from commands import register_commands
+    from user_cache import user_cache
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    db.init_app(app)
+    Migrate(app, db)
+    user_cache.init_app(app)
+    register_commands(app)
+    return app
@@ -0,0 +1,162 @@
+import os
+import time
+import click
+from flask import current_app
+from models import db
+
+# Commandes d'administration (flask --app cli <commande>).
+# Les modules métier sont importés dans chaque commande : « flask --help »
+# et les commandes simples ne chargent que ce dont elles ont besoin.
+
+
+@click.command("sync")
+def sync_command():
+    """Synchronise la base avec le dossier des mangas (nouveaux chapitres, notifications)."""
+    from synchro import synchronize_db_and_fs
+    synchronize_db_and_fs()
+
+
+@click.command("import-fs")
+def import_fs_command():
+    """Importe le dossier des mangas dans la base (après sauvegarde de site.db)."""
+    from import_to_db import backup_db, import_mangas_from_fs
+    backup_db()
+    import_mangas_from_fs()
+    click.echo("Import terminé !")
+
+
+@click.command("export-fs")
+@click.option("--overwrite", is_flag=True, help="Réécrit les fichiers déjà présents.")
+@click.option("--no-chapters", is_flag=True, help="N'exporte pas les dossiers de chapitres.")
+def export_fs_command(overwrite, no_chapters):
+    """Recrée le dossier des mangas à partir de la base."""
+    from export_db_to_fs import export_db_entries_to_fs
+    default_cover = os.path.join(current_app.root_path, "static", "default-cover.jpg")
+    export_db_entries_to_fs(default_cover_src=default_cover, overwrite=overwrite, create_chapters=not no_chapters)
+    click.echo("Export DB -> FS terminé.")
+
+
+@click.command("promote-admin")
+@click.argument("username", default="ykalipo")
+def promote_admin_command(username):
+    """Donne les droits admin à USERNAME et les retire à tous les autres."""
+    from models import User
+    from user_cache import user_cache
+    for user in User.query.all():
+        user.is_admin = user.username == username
+    db.session.commit()
+    # Les workers du site rechargent les droits à leur prochaine requête
+    user_cache.invalidate()
+    click.echo("Mise à jour des droits admin terminée.")
+
+
+@click.command("promote-manga-status")
+@click.argument("name", default="Solo Leveling")
+def promote_manga_status_command(name):
+    """Marque le manga NAME comme HOT (et retire NEW et TOP)."""
+    from models import Manga
+    manga = Manga.query.filter_by(name=name).first()
+    if not manga:
+        click.echo("Manga non trouvé.")
+        return
+    manga.is_hot = True      # Pour HOT
+    manga.is_new = False      # Pour NEW
+    manga.is_top = False      # Pour TOP
+    db.session.commit()
+    click.echo("Statuts mis à jour !")
+    click.echo(f"is_hot: {manga.is_hot} is_new: {manga.is_new} is_top: {manga.is_top}")
+
+
+@click.command("refresh-ratings")
+def refresh_ratings_command():
+    """Recalcule les agrégats et scores bayésiens des notes."""
+    from ratings import refresh_rating_aggregates
+    refresh_rating_aggregates()
+    click.echo("Agrégats et scores bayésiens des notes recalculés.")
+
+
+@click.command("build-recommendations")
+@click.option("--full", is_flag=True, help="Reconstruit tout au lieu des seuls utilisateurs actifs.")
+def build_recommendations_command(full):
+    """Met à jour les recommandations des utilisateurs actifs depuis le dernier calcul."""
+    from recommendations import rebuild_recommendations, refresh_recommendations
+    start = time.perf_counter()
+    stats = rebuild_recommendations() if full else refresh_recommendations()
+    click.echo(f"Recommandations {'reconstruites' if full else 'rafraîchies'} en {time.perf_counter() - start:.1f}s : {stats}")
+
+
+@click.command("reconcile-reactions")
+def reconcile_reactions_command():
+    """Recalcule les compteurs likes/dislikes des commentaires."""
+    from comments import first_page_cache
+    from reactions import reconcile_comment_counters
+    fixed = reconcile_comment_counters()
+    first_page_cache.clear()
+    click.echo(f"Compteurs likes/dislikes recalculés : {fixed} commentaire(s) corrigé(s).")
+
+
+@click.command("send-digests")
+def send_digests_command():
+    """Envoie le résumé quotidien des nouveaux chapitres par email (à lancer par cron)."""
+    from extensions import mail
+    from notifications import send_daily_digest
+    if 'mail' not in current_app.extensions:
+        mail.init_app(current_app)
+    sent = send_daily_digest(mail, current_app.config['SITE_NAME'])
+    click.echo(f"{sent} résumé(s) envoyé(s).")
+
+
+@click.command("pack-chapters")
+@click.option("--manga", "manga_name", help="Ne convertit que ce manga.")
+@click.option("--keep", is_flag=True, help="Conserve les dossiers après conversion.")
+def pack_chapters_command(manga_name, keep):
+    """Convertit les dossiers de chapitres en archives .cbz (une par chapitre, pages servies sans copie)."""
+    from cbz import pack_chapter
+    from config import MANGAS_DIR
+    mangas = [manga_name] if manga_name else sorted(os.listdir(MANGAS_DIR))
+    packed = pages = 0
+    for name in mangas:
+        manga_dir = os.path.join(MANGAS_DIR, name)
+        if not os.path.isdir(manga_dir):
+            continue
+        for entry in sorted(os.scandir(manga_dir), key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            count = pack_chapter(entry.path, keep=keep)
+            if count is None:
+                click.echo(f"Ignoré (sous-dossiers) : {name}/{entry.name}")
+                continue
+            packed += 1
+            pages += count
+    click.echo(f"{packed} chapitre(s) converti(s), {pages} page(s).")
+
+
+@click.command("dedup-images")
+@click.option("--workers", type=int, default=None, help="Fichiers hachés en parallèle.")
+def dedup_images_command(workers):
+    """Range les images existantes dans le stockage par contenu : les doublons deviennent des liens vers un seul fichier."""
+    from blobstore import dedup_tree, SCAN_WORKERS
+    start = time.perf_counter()
+    stats = dedup_tree(workers=workers or SCAN_WORKERS)
+    click.echo(f"{stats['files']} image(s) examinée(s), {stats['linked']} doublon(s) partagé(s), "
+               f"{stats['bytes_saved'] / 1024 / 1024:.1f} Mo libérés en {time.perf_counter() - start:.1f}s.")
+
+
+@click.command("gc-blobs")
+def gc_blobs_command():
+    """Supprime les images du stockage par contenu qui ne sont plus utilisées par aucun chapitre."""
+    from blobstore import collect_garbage
+    removed, freed = collect_garbage()
+    click.echo(f"{removed} image(s) supprimée(s), {freed / 1024 / 1024:.1f} Mo libérés.")
+
+
+COMMANDS = (
+    sync_command, import_fs_command, export_fs_command, promote_admin_command, promote_manga_status_command,
+    refresh_ratings_command, build_recommendations_command, reconcile_reactions_command, send_digests_command,
+    pack_chapters_command, dedup_images_command, gc_blobs_command,
+)
+
+
+def register_commands(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
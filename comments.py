@@ -0,0 +1,98 @@
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from models import db, Comment, CommentLike
+from cache import TTLCache
+
+COMMENTS_PER_PAGE = 20
+
+# Première page des commentaires de chaque manga (clé : manga_id)
+first_page_cache = TTLCache(ttl=300, maxsize=512)
+
+
+def encode_cursor(comment):
+    """Curseur de pagination : date de création + id du dernier commentaire affiché."""
+    return f"{comment['created_at'].isoformat()}_{comment['id']}"
+
+
+def decode_cursor(cursor):
+    """Retourne (created_at, id) ou None si le curseur est invalide."""
+    if not cursor:
+        return None
+    try:
+        created_at, comment_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _comment_to_dict(comment):
+    return {
+        "id": comment.id,
+        "content": comment.content,
+        "created_at": comment.created_at,
+        "likes": comment.likes or 0,
+        "dislikes": comment.dislikes or 0,
+        "reported": bool(comment.reported),
+        "username": comment.user.username if comment.user else None,
+    }
+
+
+def _query_comments_page(manga_id, after, limit):
+    query = Comment.query.options(joinedload(Comment.user))\
+        .filter(Comment.manga_id == manga_id)
+    if after:
+        created_at, comment_id = after
+        query = query.filter(or_(
+            Comment.created_at < created_at,
+            and_(Comment.created_at == created_at, Comment.id < comment_id)
+        ))
+    # Une ligne de plus pour savoir s'il reste une page suivante
+    rows = query.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(limit + 1).all()
+    comments = [_comment_to_dict(c) for c in rows[:limit]]
+    next_cursor = encode_cursor(comments[-1]) if len(rows) > limit else None
+    return {"comments": comments, "next_cursor": next_cursor}
+
+
+def get_comments_page(manga_id, cursor=None, limit=COMMENTS_PER_PAGE):
+    """
+    Page de commentaires (du plus récent au plus ancien) avec l'auteur chargé
+    dans la même requête. La première page est mise en cache par manga.
+    """
+    after = decode_cursor(cursor)
+    if after is None and limit == COMMENTS_PER_PAGE:
+        page = first_page_cache.get(manga_id)
+        if page is None:
+            page = _query_comments_page(manga_id, None, limit)
+            first_page_cache.set(manga_id, page)
+        return page
+    return _query_comments_page(manga_id, after, limit)
+
+
+def get_user_votes(user_id, comment_ids):
+    """Retourne {comment_id: True (like) / False (dislike)} en une seule requête."""
+    if not user_id or not comment_ids:
+        return {}
+    rows = db.session.query(CommentLike.comment_id, CommentLike.is_like).filter(
+        CommentLike.user_id == user_id,
+        CommentLike.comment_id.in_(comment_ids)
+    ).all()
+    return {comment_id: is_like for comment_id, is_like in rows}
+
+
+def invalidate_comments(manga_id):
+    first_page_cache.delete(manga_id)
+
+
+def comment_to_json(comment, vote=None):
+    return {
+        "id": comment["id"],
+        "content": comment["content"],
+        "created_at": comment["created_at"].isoformat(),
+        "date": comment["created_at"].strftime('%d/%m/%Y'),
+        "likes": comment["likes"],
+        "dislikes": comment["dislikes"],
+        "reported": comment["reported"],
+        "username": comment["username"],
+        "vote": None if vote is None else ("like" if vote else "dislike"),
+    }
@@ -0,0 +1,39 @@
+import os
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Chargement des variables d'environnement depuis .env
+load_dotenv()
+
+MANGAS_DIR = os.getenv("MANGAS_DIR", os.path.join(BASE_DIR, "mangas"))
+# Images stockées par contenu (voir blobstore.py) : même système de fichiers que MANGAS_DIR (liens physiques)
+BLOBS_DIR = os.getenv("BLOBS_DIR", os.path.join(os.path.dirname(os.path.abspath(MANGAS_DIR)), "blobs"))
+
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY', 'une_clé_par_défaut_super_secure')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'site.db'))
+    SQLALCHEMY_ECHO = False
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    MAIL_SERVER = 'smtp.gmail.com'
+    MAIL_PORT = 587
+    MAIL_USE_TLS = True
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_MAX_EMAILS = 100  # Emails envoyés par connexion SMTP (résumés quotidiens)
+    BABEL_DEFAULT_LOCALE = 'fr'
+    BABEL_TRANSLATION_DIRECTORIES = 'translations'
+    RECAPTCHA_PUBLIC_KEY = '6LekNZcrAAAAAOB4HoGwzg0Fdx3DysnW2EJDXEuY'
+    RECAPTCHA_PRIVATE_KEY = '6LekNZcrAAAAAGJP2jvAad_UevJomx-SRriLUWak'
+    SITE_NAME = os.getenv('SITE_NAME', 'Yomi-Scan')
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '1') == '1'
+    RATELIMIT_STORAGE = os.getenv('RATELIMIT_STORAGE', 'memory')  # « sqlite » avec plusieurs workers
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))  # Proxies de confiance devant l'app (1 derrière Nginx ou Heroku)
+    SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', 200))  # Flux /events par worker (gunicorn : moitié des threads)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED') == '1'
+    NPLUSONE_ENABLED = os.getenv('NPLUSONE_ENABLED', os.getenv('FLASK_DEBUG', '0')) == '1'
+    IMAGE_GATEWAY_URL = os.getenv('IMAGE_GATEWAY_URL')  # Passerelle d'images (image_gateway.py), ex. https://img.exemple.fr
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED') == '1'
+    PROFILE_THRESHOLD = float(os.getenv('PROFILE_THRESHOLD', 0.5))        # Secondes
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))
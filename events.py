@@ -0,0 +1,169 @@
+import json
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, or_
+from models import db, EventLog
+
+MAX_QUEUE = 100          # Événements en attente par client avant déconnexion (client trop lent)
+HEARTBEAT = 15           # Secondes entre deux commentaires « ping » (garde la connexion ouverte)
+POLL_INTERVAL = 1.0      # Secondes entre deux lectures du journal partagé
+RETENTION = timedelta(hours=1)
+REPLAY_LIMIT = 100       # Événements rejoués au plus après une reconnexion (Last-Event-ID)
+RETRY_MS = 5000          # Délai de reconnexion conseillé au navigateur
+
+TOPIC_RE = re.compile(r'^(chapters|manga:\d+)$')
+
+
+class HubFull(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, topics):
+        self.topics = frozenset(topics)
+        self.queue = queue.Queue(maxsize=MAX_QUEUE)
+        self.overflowed = False
+
+
+def publish(topics, event, data):
+    """
+    Enregistre un événement dans le journal partagé (dans la transaction
+    courante, à valider par l'appelant). Chaque worker le lit au prochain
+    passage de son thread de relève, y compris depuis les scripts hors serveur.
+    """
+    db.session.execute(insert(EventLog).values(
+        topics=" ".join(topics), event=event, data=json.dumps(data), created_at=datetime.utcnow()
+    ))
+
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class EventHub:
+    """
+    Abonnements SSE d'un worker, par sujet (« chapters », « manga:<id> »).
+    Un seul thread par worker lit le journal EventLog et distribue les
+    nouveaux événements aux files des clients abonnés.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_id = None
+
+    def init_app(self, app):
+        self.app = app
+        # Flux SSE ouverts simultanément par worker : chacun occupe un thread (gthread)
+        app.config.setdefault('SSE_MAX_CONNECTIONS', 200)
+
+    def subscribe(self, topics):
+        with self._lock:
+            if len(self._subscriptions) >= current_app.config['SSE_MAX_CONNECTIONS']:
+                raise HubFull()
+            if self._last_id is None:
+                # Premier abonné : la relève part des événements publiés à partir de maintenant
+                self._last_id = db.session.query(func.coalesce(func.max(EventLog.id), 0)).scalar()
+            subscription = Subscription(topics)
+            self._subscriptions.add(subscription)
+        self._ensure_worker()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def connection_count(self):
+        return len(self._subscriptions)
+
+    def replay(self, topics, last_event_id):
+        """Événements manqués depuis last_event_id (reconnexion du navigateur) : [(id, message)]."""
+        matches = [(" " + EventLog.topics + " ").contains(f" {topic} ") for topic in topics]
+        rows = EventLog.query.filter(EventLog.id > last_event_id, or_(*matches))\
+            .order_by(EventLog.id).limit(REPLAY_LIMIT).all()
+        return [(row.id, format_event(row.id, row.event, row.data)) for row in rows]
+
+    def stream(self, subscription, backlog=()):
+        """Générateur du corps de la réponse text/event-stream."""
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            replayed = 0
+            for event_id, message in backlog:
+                replayed = event_id
+                yield message
+            while not subscription.overflowed:
+                try:
+                    event_id, message = subscription.queue.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if event_id > replayed:  # Déjà envoyé par le rejeu
+                    yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def dispatch(self, rows):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for event_id, topics, event, data in rows:
+            topics = set(topics.split())
+            message = format_event(event_id, event, data)
+            for subscription in subscriptions:
+                if subscription.overflowed or subscription.topics.isdisjoint(topics):
+                    continue
+                try:
+                    subscription.queue.put_nowait((event_id, message))
+                except queue.Full:
+                    # Client trop lent : on coupe le flux, il se reconnectera avec Last-Event-ID
+                    subscription.overflowed = True
+                    self.unsubscribe(subscription)
+
+    def poll(self):
+        with self._lock:
+            if not self._subscriptions:
+                self._last_id = None
+                return 0
+            last_id = self._last_id
+        rows = db.session.query(EventLog.id, EventLog.topics, EventLog.event, EventLog.data)\
+            .filter(EventLog.id > last_id).order_by(EventLog.id).all()
+        db.session.rollback()  # Ne garde pas de transaction de lecture ouverte entre deux passages
+        if rows:
+            self._last_id = rows[-1][0]
+            self.dispatch(rows)
+        return len(rows)
+
+    def prune(self):
+        EventLog.query.filter(EventLog.created_at < datetime.utcnow() - RETENTION).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _ensure_worker(self):
+        if self.app is None or (self._worker and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="event-bridge", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            with self.app.app_context():
+                try:
+                    self.poll()
+                    if time.monotonic() - last_prune >= RETENTION.total_seconds():
+                        self.prune()
+                        last_prune = time.monotonic()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Erreur de relève des événements : {e}")
+
+
+event_hub = EventHub()
@@ -1,11 +1,12 @@
 import os
-import shutil
 from datetime import datetime
 
-from app import app, db
-from models import Manga, Chapter
+from flask import current_app as app
+from blobstore import store_file
+from cbz import chapter_exists
+from config import MANGAS_DIR
+from models import db, Manga, Chapter
 
-MANGAS_DIR = os.path.join(app.root_path, "mangas")
 
 
 def safe_write(path, content, overwrite=False):
@@ -134,7 +135,7 @@ def export_db_entries_to_fs(default_cover_src=None, overwrite=False, create_chap
                     _, ext = os.path.splitext(cover_src)
                     dest = os.path.join(manga_dir, f"cover{ext.lower()}")
                     if overwrite or not os.path.exists(dest):
-                        shutil.copyfile(cover_src, dest)
+                        store_file(cover_src, dest)  # Couverture par défaut : un seul fichier partagé
             except Exception as e:
                 print(f"Erreur gestion cover pour {name}: {e}")
 
@@ -144,7 +145,7 @@ def export_db_entries_to_fs(default_cover_src=None, overwrite=False, create_chap
                     chapters_db = Chapter.query.filter_by(manga_id=manga.id).all()
                     for chap in chapters_db:
                         chap_dir = os.path.join(manga_dir, chap.name)
-                        if not os.path.exists(chap_dir):
+                        if not chapter_exists(chap_dir):  # ni dossier ni archive .cbz
                             try:
                                 os.makedirs(chap_dir, exist_ok=True)
                                 created_chapters.append(f"{name}/{chap.name}")
@@ -169,6 +170,8 @@ def export_db_entries_to_fs(default_cover_src=None, overwrite=False, create_chap
 
 
 if __name__ == "__main__":
-    default_cover = os.path.join(app.root_path, "static", "default-cover.jpg")
-    export_db_entries_to_fs(default_cover_src=default_cover, overwrite=False, create_chapters=True)
+    from cli import create_cli_app
+    with create_cli_app().app_context():
+        default_cover = os.path.join(app.root_path, "static", "default-cover.jpg")
+        export_db_entries_to_fs(default_cover_src=default_cover, overwrite=False, create_chapters=True)
     print("Export DB -> FS terminé.")
@@ -0,0 +1,11 @@
+from flask_babel import Babel
+from flask_login import LoginManager
+from flask_mail import Mail
+from flask_migrate import Migrate
+
+# Extensions créées sans application, liées dans create_app()
+mail = Mail()
+babel = Babel()
+migrate = Migrate()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
@@ -0,0 +1,57 @@
+import time
+from models import db, Manga, Chapter, Favorite
+from readmarks import load_bits_many, is_read
+from cache import TTLCache
+
+FEED_WINDOW_DAYS = 30   # Chapitres ajoutés depuis moins de 30 jours
+FEED_CANDIDATES = 100   # Chapitres récents gardés en cache par utilisateur
+FEED_SIZE = 20
+
+# Chapitres récents des favoris de chaque utilisateur (clé : user_id).
+# L'état « lu » n'est pas mis en cache : il est appliqué à chaque appel depuis
+# les bitmaps, pour qu'une lecture ne demande aucune invalidation.
+_feed_cache = TTLCache(ttl=300, maxsize=4096)
+
+
+def _recent_favorite_chapters(user_id):
+    cutoff = int(time.time()) - FEED_WINDOW_DAYS * 86400
+    rows = db.session.query(Chapter.manga_id, Chapter.name, Chapter.ordinal, Chapter.date_added, Manga.name)\
+        .join(Favorite, Favorite.manga_id == Chapter.manga_id)\
+        .join(Manga, Manga.id == Chapter.manga_id)\
+        .filter(Favorite.user_id == user_id, Chapter.date_added >= cutoff)\
+        .order_by(Chapter.date_added.desc(), Chapter.id.desc())\
+        .limit(FEED_CANDIDATES).all()
+    return [{
+        "manga_id": manga_id,
+        "manga": manga_name,
+        "chapter": name,
+        "ordinal": ordinal,
+        "date_added": date_added,
+    } for manga_id, name, ordinal, date_added, manga_name in rows]
+
+
+def get_new_chapters_feed(user_id, limit=FEED_SIZE):
+    """
+    Nouveaux chapitres non lus des mangas favoris, du plus récent au plus ancien.
+    Une requête sur les bitmaps de lecture quand la liste est en cache.
+    """
+    candidates = _feed_cache.get(user_id)
+    if candidates is None:
+        candidates = _recent_favorite_chapters(user_id)
+        _feed_cache.set(user_id, candidates)
+    if not candidates:
+        return []
+    read_bits = load_bits_many(user_id, list({c["manga_id"] for c in candidates}))
+    feed = [c for c in candidates if not is_read(read_bits.get(c["manga_id"], 0), c["ordinal"])]
+    return feed[:limit]
+
+
+def invalidate_user_feed(user_id):
+    """À appeler quand l'utilisateur ajoute ou retire un favori."""
+    _feed_cache.delete(user_id)
+
+
+def invalidate_manga_feed(manga_id):
+    """À appeler quand un manga reçoit un chapitre : vide le flux de ceux qui le suivent."""
+    for (user_id,) in db.session.query(Favorite.user_id).filter(Favorite.manga_id == manga_id):
+        _feed_cache.delete(user_id)
@@ -0,0 +1,60 @@
+# Configuration de production (gunicorn la lit automatiquement depuis le dossier courant).
+# Lancement : gunicorn    (voir Procfile) ; variables : PORT, WEB_CONCURRENCY, GUNICORN_THREADS,
+# PROXY_FIX_X_FOR (derrière un proxy : nombre de proxies de confiance, sinon toutes les IP se confondent).
+#
+# Rechargement sans coupure :
+#   kill -HUP <maître>   nouveaux workers, configuration relue (le code préchargé reste le même) ;
+#   kill -USR2 <maître>  puis kill -QUIT <ancien maître> une fois le nouveau prêt : nouveau code.
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app()"
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Application chargée une fois dans le maître puis partagée par fork (mémoire commune,
+# démarrage des workers immédiat). Rien n'ouvre la base ni ne lance de thread avant le fork.
+preload_app = True
+
+# Workers à threads : un flux SSE (/events) occupe un thread pendant toute la connexion,
+# les images sont envoyées par sendfile sans bloquer le GIL.
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 9)))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# Au plus la moitié des threads pour les flux SSE : au-delà, /events répond 503 (Retry-After)
+# et les pages restent servies au lieu d'attendre un thread libre.
+os.environ.setdefault("SSE_MAX_CONNECTIONS", str(max(1, threads // 2)))
+
+# Images et archives de chapitres volumineuses sur des connexions lentes : le délai
+# s'applique au worker (battement de cœur), pas à la durée d'une réponse en gthread.
+timeout = 60
+graceful_timeout = 30
+keepalive = 5           # Un lecteur charge les pages d'un chapitre à la suite sur la même connexion
+backlog = 2048
+
+# Journal d'accès avec la durée de la requête (microsecondes)
+accesslog = "-"
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)sus'
+
+# Plusieurs processus : la limitation de débit doit être partagée entre workers
+if workers > 1:
+    os.environ.setdefault("RATELIMIT_STORAGE", "sqlite")
+
+
+def post_fork(server, worker):
+    # Les connexions SQLite ouvertes dans le maître ne doivent pas être réutilisées par un fils
+    from models import db
+    with worker.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from catalog import warm_up
+    app = worker.app.wsgi()
+    with app.app_context():
+        try:
+            count = warm_up()
+        except Exception as e:
+            app.logger.error(f"Échec du préchauffage des caches : {e}")
+            return
+    worker.log.info(f"Worker {worker.pid} : caches préchauffés ({count} mangas)")
@@ -0,0 +1,222 @@
+"""
+Passerelle d'images asynchrone (optionnelle) : sert les pages, couvertures et
+archives CBZ de mangas/ sans occuper les workers du site. Mêmes chemins que le
+site (/mangas/..., /manga/<manga>/<chapitre>/download) : avec
+IMAGE_GATEWAY_URL=https://<hôte de la passerelle>, media_url() y fait pointer
+les gabarits.
+
+  - fichiers envoyés par sendfile, requêtes partielles (Range) et conditionnelles ;
+  - pages des chapitres archivés (.cbz) écrites depuis l'archive projetée en
+    mémoire (mmap), sans copie ;
+  - URL avec empreinte à jour (?v=) et images partagées (/blobs/<sha256>) : cache
+    navigateur permanent (immutable) ;
+  - débit limité par client (IP, lue dans X-Forwarded-For si PROXY_FIX_X_FOR
+    est défini), toutes connexions confondues, sur les octets réellement envoyés ;
+  - téléchargements limités comme sur le site (même seau si RATELIMIT_STORAGE=sqlite).
+
+Usage : python image_gateway.py [--host 0.0.0.0] [--port 8081] [--client-rate 2097152]
+"""
+import argparse
+import asyncio
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from aiohttp import web
+from werkzeug.security import safe_join
+from blobstore import BLOB_NAME_RE, blob_path
+from cache import file_fingerprint, IMMUTABLE_MAX_AGE
+from cbz import build_cbz, archive_path, archive_index
+from config import BASE_DIR, MANGAS_DIR, Config
+from ratelimit import MemoryStore, SQLiteStore, parse_rate
+
+CLIENT_RATE = 2 * 1024 * 1024    # Octets par seconde et par client (0 : illimité)
+CLIENT_BURST = 8 * 1024 * 1024   # Crédit d'un client inactif : quelques pages partent sans attente
+MAX_CLIENTS = 10000              # Clients suivis (éviction LRU)
+CHUNK_SIZE = 256 * 1024          # Morceaux des archives envoyées en flux
+SHORT_MAX_AGE = 300              # Cache des URL sans empreinte (ou périmée)
+DOWNLOAD_RATE = "10/minute"      # Comme site.download_chapter (limite par IP)
+
+
+class ClientBandwidth:
+    """
+    Seau à jetons en octets par adresse IP. Un envoi est autorisé à découvert ;
+    le client attend ensuite que son crédit redevienne positif, ce qui borne
+    son débit moyen à rate quel que soit le nombre de ses connexions.
+    """
+
+    def __init__(self, rate=CLIENT_RATE, burst=CLIENT_BURST, maxsize=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._clients = OrderedDict()   # IP -> (crédit en octets, date)
+
+    async def throttle(self, client, size):
+        if not self.rate or not size:
+            return
+        now = time.monotonic()
+        credit, updated = self._clients.get(client, (self.burst, now))
+        credit = min(self.burst, credit + (now - updated) * self.rate) - size
+        self._clients[client] = (credit, now)
+        self._clients.move_to_end(client)
+        while len(self._clients) > self.maxsize:
+            self._clients.popitem(last=False)
+        if credit < 0:
+            await asyncio.sleep(-credit / self.rate)
+
+
+bandwidth_key = web.AppKey("bandwidth", ClientBandwidth)
+downloads_key = web.AppKey("downloads", object)
+
+
+def client_address(request):
+    """IP du client ; derrière PROXY_FIX_X_FOR proxies de confiance, lue dans X-Forwarded-For (comme ProxyFix)."""
+    hops = Config.PROXY_FIX_X_FOR
+    if hops:
+        forwarded = [ip.strip() for ip in ",".join(request.headers.getall("X-Forwarded-For", [])).split(",")]
+        if len(forwarded) >= hops and forwarded[-hops]:
+            return forwarded[-hops]
+    return request.remote
+
+
+class ThrottledFileResponse(web.FileResponse):
+    """
+    FileResponse décomptée au moment de l'envoi, pour les octets réellement
+    envoyés (plage Range comprise) : une réponse 304, 412 ou 416 ne coûte rien.
+    """
+
+    def __init__(self, path, client, **kwargs):
+        super().__init__(path, chunk_size=CHUNK_SIZE, **kwargs)
+        self._client = client
+
+    async def _sendfile(self, request, fobj, offset, count):
+        await request.app[bandwidth_key].throttle(self._client, count)
+        return await super()._sendfile(request, fobj, offset, count)
+
+
+async def _send_file(request, *parts):
+    path = safe_join(MANGAS_DIR, *parts)
+    fingerprint = file_fingerprint(path) if path else None
+    if fingerprint is None or not os.path.isfile(path):
+        raise web.HTTPNotFound(text="Fichier introuvable")
+    response = ThrottledFileResponse(path, client_address(request))
+    response.headers["Cache-Control"] = _cache_control(request, fingerprint)
+    return response
+
+
+def _cache_control(request, fingerprint):
+    if request.query.get("v") == fingerprint:
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={SHORT_MAX_AGE}"
+
+
+async def _send_archive_page(request, path, filename):
+    index = archive_index(path)
+    view = index.view(filename) if index else None
+    if view is None:
+        raise web.HTTPNotFound(text="Fichier introuvable")
+    etag = f'"{index.fingerprint}-{filename}"'
+    headers = {"ETag": etag, "Cache-Control": _cache_control(request, index.fingerprint)}
+    if etag in request.headers.get("If-None-Match", ""):
+        raise web.HTTPNotModified(headers=headers)
+    response = web.StreamResponse(headers=headers)
+    response.content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response.content_length = len(view)
+    await request.app[bandwidth_key].throttle(client_address(request), len(view))
+    await response.prepare(request)
+    await response.write(view)
+    await response.write_eof()
+    return response
+
+
+async def serve_blob(request):
+    name = request.match_info["name"]
+    path = blob_path(name)
+    if not BLOB_NAME_RE.fullmatch(name) or not os.path.isfile(path):
+        raise web.HTTPNotFound(text="Fichier introuvable")
+    response = ThrottledFileResponse(path, client_address(request))
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return response
+
+
+async def manga_file(request):
+    return await _send_file(request, request.match_info["manga"], request.match_info["filename"])
+
+
+async def manga_image(request):
+    info = request.match_info
+    chapter_dir = safe_join(MANGAS_DIR, info["manga"], info["chapter"])
+    if chapter_dir is not None and not os.path.isdir(chapter_dir) and os.path.isfile(archive_path(chapter_dir)):
+        return await _send_archive_page(request, archive_path(chapter_dir), info["filename"])
+    return await _send_file(request, info["manga"], info["chapter"], info["filename"])
+
+
+async def download_chapter(request):
+    manga, chapter = request.match_info["manga"], request.match_info["chapter"]
+    chapter_dir = safe_join(MANGAS_DIR, manga, chapter)
+    archived = chapter_dir is not None and not os.path.isdir(chapter_dir) and os.path.isfile(archive_path(chapter_dir))
+    if chapter_dir is None or not (archived or os.path.isdir(chapter_dir)):
+        raise web.HTTPNotFound(text="Chapitre introuvable")
+    loop = asyncio.get_running_loop()
+    client = client_address(request)
+    if Config.RATELIMIT_ENABLED:
+        capacity, refill_rate = parse_rate(DOWNLOAD_RATE)
+        allowed, retry_after = await loop.run_in_executor(
+            None, request.app[downloads_key].consume, f"site.download_chapter:ip:{client}", capacity, refill_rate
+        )
+        if not allowed:
+            raise web.HTTPTooManyRequests(headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+    if archived:
+        # Chapitre déjà archivé : envoyé tel quel (sendfile)
+        return ThrottledFileResponse(archive_path(chapter_dir), client, headers={
+            "Content-Type": "application/cbz",
+            "Content-Disposition": f"attachment; filename={chapter}.cbz",
+        })
+    # Archive construite hors de la boucle d'événements : les autres clients continuent d'être servis
+    data = await loop.run_in_executor(None, build_cbz, chapter_dir)
+    if data is None:
+        raise web.HTTPNotFound(text="Aucune image à télécharger")
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/cbz",
+        "Content-Disposition": f"attachment; filename={chapter}.cbz",
+    })
+    response.content_length = len(data)
+    await response.prepare(request)
+    view = memoryview(data)
+    for offset in range(0, len(data), CHUNK_SIZE):
+        chunk = view[offset:offset + CHUNK_SIZE]
+        await request.app[bandwidth_key].throttle(client, len(chunk))
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+def create_gateway(client_rate=CLIENT_RATE):
+    app = web.Application()
+    app[bandwidth_key] = ClientBandwidth(rate=client_rate)
+    if Config.RATELIMIT_STORAGE == 'sqlite':
+        # Même fichier que le site (instance/ratelimit.db) : un seul seau par IP
+        path = os.path.join(BASE_DIR, "instance", "ratelimit.db")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        app[downloads_key] = SQLiteStore(path)
+    else:
+        app[downloads_key] = MemoryStore()
+    app.router.add_get("/mangas/{manga}/{filename}", manga_file)
+    app.router.add_get("/mangas/{manga}/{chapter}/{filename}", manga_image)
+    app.router.add_get("/manga/{manga}/{chapter}/download", download_chapter)
+    app.router.add_get("/blobs/{name}", serve_blob)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8081)))
+    parser.add_argument("--client-rate", type=int, default=CLIENT_RATE, help="Octets/s par client (0 : illimité)")
+    args = parser.parse_args()
+    web.run_app(create_gateway(args.client_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Traitement des images envoyées (exécuté dans les processus de uploads.py) :
+vérification, suppression des métadonnées (EXIF, XMP, commentaires) et
+recompression optionnelle. Chaque tâche écrit son résultat sur disque (page
+traitée ou fichier d'erreur) : l'état d'un envoi ne dépend d'aucun processus.
+Module volontairement léger : importé par chaque processus du pool.
+"""
+import os
+import zipfile
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+
+IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+MAX_PIXELS = 40_000_000          # Pages très hautes des webtoons comprises
+COPY_CHUNK = 1024 * 1024
+METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment", "Comment")
+ORIENTATION_TAG = 0x0112
+
+
+def _fail(error_path, message):
+    with open(error_path, "w", encoding="utf-8") as f:
+        f.write(message)
+    return False
+
+
+def _reason(error, *paths):
+    """Texte de l'erreur montré à l'envoyeur, sans les chemins du serveur (noms de fichiers seuls)."""
+    message = str(error)
+    for path in paths:
+        message = message.replace(path, os.path.basename(path))
+    return message
+
+
+def process_page(src, dest, error_path, quality=None):
+    """
+    Vérifie l'image src et écrit dans dest une copie sans métadonnées, pivotée
+    selon son orientation EXIF, recompressée si quality est donné. Sans
+    métadonnées ni recompression, les octets d'origine sont gardés.
+    Retourne True, ou False après avoir écrit le motif du refus dans error_path ;
+    src est supprimé dans les deux cas.
+    """
+    if not os.path.exists(src):
+        return os.path.exists(dest)  # Déjà traitée (tâche relancée entre-temps)
+    tmp = dest + ".tmp"
+    try:
+        with Image.open(src) as img:
+            if img.format not in IMAGE_FORMATS:
+                return _fail(error_path, f"Format non accepté : {img.format}")
+            if img.width * img.height > MAX_PIXELS:
+                return _fail(error_path, f"Image trop grande : {img.width}x{img.height}")
+            img.verify()
+        with Image.open(src) as img:
+            img.load()
+            fmt = img.format
+            stripped = any(key in img.info for key in METADATA_KEYS) or bool(getattr(img, "text", None))
+            if quality is None and not stripped:
+                with open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+                    while chunk := f_in.read(COPY_CHUNK):
+                        f_out.write(chunk)
+            else:
+                # Les encodeurs n'écrivent EXIF et XMP que s'ils leur sont passés : ils disparaissent ici
+                upright = img.getexif().get(ORIENTATION_TAG, 1) == 1
+                rotated = img if upright else ImageOps.exif_transpose(img)
+                options = {"icc_profile": img.info.get("icc_profile")}
+                if fmt == "JPEG":
+                    # Sans recompression demandée : mêmes tables de quantification (perte minimale)
+                    options["quality"] = quality or ("keep" if upright else 95)
+                elif fmt == "WEBP":
+                    options["quality"] = quality or 90
+                else:
+                    options["optimize"] = True
+                rotated.save(tmp, format=fmt, **options)
+        os.replace(tmp, dest)
+        return True
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return _fail(error_path, f"Image illisible : {_reason(e, src, tmp)}")
+    finally:
+        if os.path.exists(src):
+            os.remove(src)
+
+
+def extract_archive(src, upload_dir, image_extensions, max_pages, max_bytes):
+    """
+    Extrait les images d'une archive zip/CBZ reçue (upload_dir/received/),
+    membre par membre et par blocs (mémoire bornée, taille réelle contrôlée),
+    puis supprime l'archive. Un membre dont le nom est déjà pris (autre dossier
+    de l'archive, page envoyée à part) est préfixé par son dossier, sinon
+    écarté et signalé dans errors/<archive>. Retourne les noms des pages extraites.
+    """
+    name = os.path.basename(src)
+    received_dir = os.path.join(upload_dir, "received")
+    errors_dir = os.path.join(upload_dir, "errors")
+
+    def taken(page):
+        return (page in names or os.path.exists(os.path.join(received_dir, page))
+                or os.path.exists(os.path.join(upload_dir, "pages", page))
+                or os.path.exists(os.path.join(upload_dir, "complete", page))
+                or os.path.exists(os.path.join(upload_dir, "incoming", page + ".part")))
+
+    names = []
+    skipped = []
+    dest = src
+    try:
+        with zipfile.ZipFile(src) as zf:
+            members = [info for info in zf.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith(image_extensions)]
+            if len(members) > max_pages:
+                _fail(os.path.join(errors_dir, name), f"Trop de pages dans l'archive ({len(members)})")
+                os.remove(src)
+                return names
+            for info in members:
+                folder, base = os.path.split(info.filename)
+                page = secure_filename(base)
+                if page and taken(page) and folder:
+                    page = secure_filename(f"{folder.replace('/', '-')}-{base}")
+                if not page or taken(page):
+                    skipped.append(info.filename)
+                    continue
+                dest = os.path.join(received_dir, page)
+                copied = 0
+                with zf.open(info) as member, open(dest + ".tmp", "wb") as out:
+                    while chunk := member.read(COPY_CHUNK):
+                        copied += len(chunk)
+                        if copied > max_bytes:
+                            break
+                        out.write(chunk)
+                if copied > max_bytes:
+                    os.remove(dest + ".tmp")
+                    _fail(os.path.join(errors_dir, page), "Page trop volumineuse")
+                    continue
+                os.replace(dest + ".tmp", dest)
+                names.append(page)
+        if skipped:
+            _fail(os.path.join(errors_dir, name), "Pages écartées, nom déjà pris : " + ", ".join(skipped))
+    except (OSError, zipfile.BadZipFile, RuntimeError) as e:
+        _fail(os.path.join(errors_dir, name), f"Archive illisible : {_reason(e, src, dest + '.tmp', dest)}")
+    os.remove(src)
+    return names
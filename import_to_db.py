@@ -1,10 +1,13 @@
 import os
 import time
 import json
-import shutil
 import datetime
-from app import app, db, MANGAS_DIR
-from models import Manga, Chapter, Rating, Favorite, Comment, ReadingHistory, User
+from flask import current_app as app
+from blobstore import store_file, dedup_paths
+from cbz import chapter_images, chapter_names, read_chapter_file
+from config import MANGAS_DIR
+from models import db, Manga, Chapter, Rating, Favorite, Comment, ReadingHistory, User
+from readmarks import chapter_sort_key, next_ordinal
 
 def safe_read(path, default=""):
     try:
@@ -77,7 +80,7 @@ def import_mangas_from_fs():
                 ext = os.path.splitext(cover_filename)[1]
                 new_cover_filename = f"{manga_name}{ext}"
                 cover_dest = os.path.join(STATIC_COVERS_DIR, new_cover_filename)
-                shutil.copy(cover_src, cover_dest)
+                store_file(cover_src, cover_dest)
                 manga.cover_filename = new_cover_filename
                 db.session.commit()
             else:
@@ -85,24 +88,29 @@ def import_mangas_from_fs():
                 db.session.commit()
 
             # Import des chapitres
-            for chapter_name in os.listdir(manga_dir):
+            # Chapitres en dossier ou en archive .cbz (date lue dans l'archive)
+            new_pages = []
+            for chapter_name in sorted(chapter_names(manga_dir), key=chapter_sort_key):
                 chapter_path = os.path.join(manga_dir, chapter_name)
-                if os.path.isdir(chapter_path):
-                    date_added_path = os.path.join(chapter_path, "date_added.txt")
-                    date_added_chap = safe_read(date_added_path)
-                    try:
-                        date_added_chap = int(date_added_chap)
-                    except Exception:
-                        date_added_chap = int(time.time())
-                    chapter = Chapter.query.filter_by(name=chapter_name, manga_id=manga.id).first()
-                    if not chapter:
-                        chapter = Chapter(
-                            name=chapter_name,
-                            manga_id=manga.id,
-                            date_added=date_added_chap
-                        )
-                        db.session.add(chapter)
+                date_added_chap = read_chapter_file(chapter_path, "date_added.txt", "").strip()
+                try:
+                    date_added_chap = int(date_added_chap)
+                except Exception:
+                    date_added_chap = int(time.time())
+                chapter = Chapter.query.filter_by(name=chapter_name, manga_id=manga.id).first()
+                if not chapter:
+                    chapter = Chapter(
+                        name=chapter_name,
+                        manga_id=manga.id,
+                        date_added=date_added_chap,
+                        ordinal=next_ordinal(manga.id)
+                    )
+                    db.session.add(chapter)
+                    if os.path.isdir(chapter_path):
+                        new_pages += [os.path.join(chapter_path, f) for f in chapter_images(chapter_path)]
             db.session.commit()
+            # Pages identiques à celles déjà importées (crédits, doublons) : partagées
+            dedup_paths(new_pages)
 
             # Import des ratings (notes)
             ratings_path = os.path.join(manga_dir, "ratings.json")
@@ -166,6 +174,8 @@ def backup_db():
         print(f"Sauvegarde de la base effectuée : {backup_path}")
 
 if __name__ == "__main__":
-    backup_db()
-    import_mangas_from_fs()
-    print("Import terminé !")
\ No newline at end of file
+    from cli import create_cli_app
+    with create_cli_app().app_context():
+        backup_db()
+        import_mangas_from_fs()
+    print("Import terminé !")
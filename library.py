@@ -0,0 +1,56 @@
+from sqlalchemy import and_, or_
+from models import db, Manga, Favorite, ReadingPosition, ReadBitmap
+from comments import decode_cursor
+
+PROFILE_PAGE_SIZE = 20
+
+
+def _encode_cursor(moment, key):
+    return f"{moment.isoformat()}_{key}"
+
+
+def keyset_page(query, date_column, key_column, cursor, limit, to_dict):
+    """Page du plus récent au plus ancien sur (date, clé), une ligne de plus pour savoir s'il en reste."""
+    after = decode_cursor(cursor)
+    if after:
+        moment, key = after
+        query = query.filter(or_(date_column < moment, and_(date_column == moment, key_column < key)))
+    rows = query.order_by(date_column.desc(), key_column.desc()).limit(limit + 1).all()
+    items = [to_dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        next_cursor = _encode_cursor(last[date_column], last[key_column])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_history_page(user_id, cursor=None, limit=PROFILE_PAGE_SIZE):
+    """
+    Historique regroupé par manga : dernier chapitre ouvert, date et nombre de
+    chapitres lus, en une requête sur l'index (user_id, updated_at) de
+    ReadingPosition, avec le manga et la bitmap de lecture en jointure.
+    """
+    query = db.session.query(Manga.name, ReadingPosition.manga_id, ReadingPosition.updated_at,
+                             ReadingPosition.chapter_name, ReadingPosition.page, ReadBitmap.read_count)\
+        .join(Manga, Manga.id == ReadingPosition.manga_id)\
+        .outerjoin(ReadBitmap, and_(ReadBitmap.user_id == ReadingPosition.user_id,
+                                    ReadBitmap.manga_id == ReadingPosition.manga_id))\
+        .filter(ReadingPosition.user_id == user_id)
+    return keyset_page(query, ReadingPosition.updated_at, ReadingPosition.manga_id, cursor, limit, lambda r: {
+        "manga": r.name,
+        "chapter": r.chapter_name,
+        "page": r.page,
+        "last_read_at": r.updated_at,
+        "chapters_read": r.read_count or 0,
+    })
+
+
+def get_favorites_page(user_id, cursor=None, limit=PROFILE_PAGE_SIZE):
+    """Favoris du plus récent au plus ancien, nom du manga chargé dans la même requête."""
+    query = db.session.query(Manga.name, Favorite.id, Favorite.created_at)\
+        .join(Manga, Manga.id == Favorite.manga_id)\
+        .filter(Favorite.user_id == user_id)
+    return keyset_page(query, Favorite.created_at, Favorite.id, cursor, limit, lambda r: {
+        "manga": r.name,
+        "added_at": r.created_at,
+    })
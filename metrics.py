@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import defaultdict
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+SQL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Compteurs de la requête en cours dans ce thread (None hors requête instrumentée)
+_local = threading.local()
+
+
+class RequestStats:
+    __slots__ = ("started", "sql_count", "sql_time", "fs_calls")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.fs_calls = 0
+
+
+def current_stats():
+    return getattr(_local, "stats", None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.sql = Histogram(SQL_BUCKETS)
+        self.sql_seconds = 0.0
+        self.fs_calls = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    if stats is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    if stats is not None and conn.info.get("query_start"):
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - conn.info["query_start"].pop()
+
+
+def count_fs(func):
+    """
+    func (os.stat, os.listdir, open...) dont chaque appel compte comme un accès
+    disque de la requête en cours. Les modules qui lisent mangas/ (cbz, cache,
+    catalog) passent par ces versions : rien n'est modifié hors de ces modules.
+    """
+    def wrapper(*args, **kwargs):
+        stats = current_stats()
+        if stats is not None:
+            stats.fs_calls += 1
+        return func(*args, **kwargs)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """
+    Métriques par endpoint (latence, requêtes SQL, appels au système de
+    fichiers de cbz, cache et catalog, taille des réponses), exposées au format
+    texte de Prometheus.
+    Désactivé par défaut (METRICS_ENABLED) : aucun hook n'est alors installé.
+    Les compteurs sont propres à chaque worker.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._endpoints = defaultdict(EndpointMetrics)
+        self._lock = threading.Lock()
+        self._collectors = []
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('METRICS_ENABLED', False)
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.teardown_request(self._stop)
+        if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            return  # Crochets globaux déjà posés par une autre application (create_app appelée deux fois)
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    def register_collector(self, collector):
+        """collector() -> lignes supplémentaires au format Prometheus (jauges d'autres modules)."""
+        if collector not in self._collectors:  # create_app appelée plusieurs fois : familles en double
+            self._collectors.append(collector)
+
+    def _start(self):
+        _local.stats = RequestStats()
+
+    def _record(self, response):
+        stats = current_stats()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "unknown"
+        size = response.content_length
+        with self._lock:
+            metrics = self._endpoints[endpoint]
+            metrics.statuses[response.status_code] += 1
+            metrics.latency.observe(elapsed)
+            metrics.sql.observe(stats.sql_count)
+            metrics.sql_seconds += stats.sql_time
+            metrics.fs_calls += stats.fs_calls
+            if size is not None:  # Inconnue pour les réponses en flux (SSE, fichiers)
+                metrics.size.observe(size)
+        return response
+
+    def _stop(self, exc=None):
+        _local.stats = None
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+            lines.append("# TYPE http_requests_total counter")
+            for endpoint, m in endpoints:
+                for status, count in sorted(m.statuses.items()):
+                    lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for endpoint, m in endpoints:
+                lines.extend(m.latency.lines("http_request_duration_seconds", f'endpoint="{_escape(endpoint)}"'))
+            lines.append("# TYPE http_response_size_bytes histogram")
+            for endpoint, m in endpoints:
+                lines.extend(m.size.lines("http_response_size_bytes", f'endpoint="{_escape(endpoint)}"'))
+            lines.append("# TYPE sql_queries_per_request histogram")
+            for endpoint, m in endpoints:
+                lines.extend(m.sql.lines("sql_queries_per_request", f'endpoint="{_escape(endpoint)}"'))
+            lines.append("# TYPE sql_query_seconds_total counter")
+            for endpoint, m in endpoints:
+                lines.append(f'sql_query_seconds_total{{endpoint="{_escape(endpoint)}"}} {m.sql_seconds}')
+            lines.append("# TYPE filesystem_calls_total counter")
+            for endpoint, m in endpoints:
+                lines.append(f'filesystem_calls_total{{endpoint="{_escape(endpoint)}"}} {m.fs_calls}')
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,25 @@
+"""Index de pagination des favoris
+
+Revision ID: 0b5d7e3a9c12
+Revises: 6f1c8b2d4e70
+Create Date: 2026-10-19 17:41:09.228415
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5d7e3a9c12'
+down_revision = '6f1c8b2d4e70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_user_created', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_user_created')
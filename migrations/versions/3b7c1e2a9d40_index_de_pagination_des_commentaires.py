@@ -0,0 +1,25 @@
+"""Index de pagination des commentaires
+
+Revision ID: 3b7c1e2a9d40
+Revises: 890c12cebc00
+Create Date: 2026-10-19 09:12:41.204117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c1e2a9d40'
+down_revision = '890c12cebc00'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_manga_created', ['manga_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_manga_created')
@@ -0,0 +1,46 @@
+"""Dates obligatoires des favoris et des positions de lecture
+
+Revision ID: 4c8e1b7d2f63
+Revises: b8f3d6a1e925
+Create Date: 2026-10-19 21:12:44.503917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e1b7d2f63'
+down_revision = 'b8f3d6a1e925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Les pages du profil paginent sur ces dates : une ligne sans date ne serait jamais atteinte.
+    # Même format que SQLAlchemy (microsecondes), sinon les comparaisons de curseur échouent
+    op.execute("UPDATE favorite SET created_at = strftime('%Y-%m-%d %H:%M:%S.000000', 'now') WHERE created_at IS NULL")
+    op.execute(
+        "UPDATE reading_position SET updated_at = COALESCE("
+        "(SELECT MAX(last_read_at) FROM reading_history WHERE reading_history.user_id = reading_position.user_id"
+        " AND reading_history.manga_id = reading_position.manga_id), strftime('%Y-%m-%d %H:%M:%S.000000', 'now')) WHERE updated_at IS NULL"
+    )
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               nullable=False)
+    with op.batch_alter_table('reading_position', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=sa.DateTime(),
+               nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reading_position', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=sa.DateTime(),
+               nullable=True)
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               nullable=True)
@@ -0,0 +1,44 @@
+"""Ajout du modèle ReadingPosition
+
+Revision ID: 6f1c8b2d4e70
+Revises: d92b6e1f4a58
+Create Date: 2026-10-19 17:03:21.540118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c8b2d4e70'
+down_revision = 'd92b6e1f4a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reading_position',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('manga_id', sa.Integer(), nullable=False),
+    sa.Column('chapter_name', sa.String(length=128), nullable=False),
+    sa.Column('page', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['manga_id'], ['manga.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'manga_id')
+    )
+    with op.batch_alter_table('reading_position', schema=None) as batch_op:
+        batch_op.create_index('ix_reading_position_user_updated', ['user_id', 'updated_at'], unique=False)
+
+    # Point de départ : le dernier chapitre de l'historique de chaque série
+    op.execute(
+        "INSERT INTO reading_position (user_id, manga_id, chapter_name, page, updated_at) "
+        "SELECT user_id, manga_id, chapter_name, 0, MAX(last_read_at) FROM reading_history "
+        "GROUP BY user_id, manga_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('reading_position', schema=None) as batch_op:
+        batch_op.drop_index('ix_reading_position_user_updated')
+    op.drop_table('reading_position')
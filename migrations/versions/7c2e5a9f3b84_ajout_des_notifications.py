@@ -0,0 +1,51 @@
+"""Ajout des notifications de nouveaux chapitres
+
+Revision ID: 7c2e5a9f3b84
+Revises: e4a9c1f7b352
+Create Date: 2026-10-19 19:05:12.804533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5a9f3b84'
+down_revision = 'e4a9c1f7b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('manga_id', sa.Integer(), nullable=False),
+    sa.Column('first_chapter', sa.String(length=128), nullable=False),
+    sa.Column('last_chapter', sa.String(length=128), nullable=False),
+    sa.Column('chapter_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.Column('emailed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['manga_id'], ['manga.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_user_updated', ['user_id', 'updated_at', 'id'], unique=False)
+        batch_op.create_index('ix_notification_unread', ['user_id', 'manga_id'], unique=True,
+                              sqlite_where=sa.text('read_at IS NULL'))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_digest', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('email_digest')
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_unread')
+        batch_op.drop_index('ix_notification_user_updated')
+    op.drop_table('notification')
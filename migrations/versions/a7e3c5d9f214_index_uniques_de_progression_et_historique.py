@@ -0,0 +1,39 @@
+"""Index uniques (user, manga, chapitre) sur ReadingProgress et ReadingHistory
+
+Revision ID: a7e3c5d9f214
+Revises: 8d4a2f6b1c93
+Create Date: 2026-10-19 15:06:33.902751
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3c5d9f214'
+down_revision = '8d4a2f6b1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Supprime les doublons en gardant la lecture la plus récente
+    op.execute(
+        "DELETE FROM reading_progress WHERE id NOT IN "
+        "(SELECT MAX(id) FROM reading_progress GROUP BY user_id, manga_id, chapter_name)"
+    )
+    # f864b2beb72c a supprimé la colonne id sans recréer la clé primaire composite
+    op.execute(
+        "DELETE FROM reading_history WHERE rowid NOT IN "
+        "(SELECT MAX(rowid) FROM reading_history GROUP BY user_id, manga_id, chapter_name)"
+    )
+    with op.batch_alter_table('reading_progress', schema=None) as batch_op:
+        batch_op.create_index('ix_reading_progress_user_manga_chapter', ['user_id', 'manga_id', 'chapter_name'], unique=True)
+    with op.batch_alter_table('reading_history', schema=None) as batch_op:
+        batch_op.create_index('ix_reading_history_user_manga_chapter', ['user_id', 'manga_id', 'chapter_name'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('reading_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_reading_history_user_manga_chapter')
+    with op.batch_alter_table('reading_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_reading_progress_user_manga_chapter')
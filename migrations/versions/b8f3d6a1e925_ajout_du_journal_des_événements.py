@@ -0,0 +1,35 @@
+"""Ajout du journal des événements temps réel
+
+Revision ID: b8f3d6a1e925
+Revises: 7c2e5a9f3b84
+Create Date: 2026-10-19 19:48:37.115862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f3d6a1e925'
+down_revision = '7c2e5a9f3b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topics', sa.String(length=256), nullable=False),
+    sa.Column('event', sa.String(length=32), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_event_log_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_event_log_created_at'))
+    op.drop_table('event_log')
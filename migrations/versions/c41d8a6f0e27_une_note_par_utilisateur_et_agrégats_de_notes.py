@@ -0,0 +1,58 @@
+"""Une note par utilisateur et agrégats de notes sur Manga
+
+Revision ID: c41d8a6f0e27
+Revises: 3b7c1e2a9d40
+Create Date: 2026-10-19 10:03:17.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8a6f0e27'
+down_revision = '3b7c1e2a9d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Garde uniquement la dernière note de chaque utilisateur par manga
+    op.execute(
+        "DELETE FROM rating WHERE user_id IS NOT NULL AND id NOT IN "
+        "(SELECT MAX(id) FROM rating WHERE user_id IS NOT NULL GROUP BY manga_id, user_id)"
+    )
+    with op.batch_alter_table('rating', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=32), nullable=True))
+        batch_op.create_unique_constraint('_manga_user_rating_uc', ['manga_id', 'user_id'])
+        batch_op.create_unique_constraint('_manga_fingerprint_rating_uc', ['manga_id', 'fingerprint'])
+
+    with op.batch_alter_table('manga', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('bayesian_score', sa.Float(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_manga_bayesian_score'), ['bayesian_score'], unique=False)
+
+    op.execute(
+        "UPDATE manga SET "
+        "rating_sum = COALESCE((SELECT SUM(value) FROM rating WHERE rating.manga_id = manga.id), 0), "
+        "rating_count = (SELECT COUNT(*) FROM rating WHERE rating.manga_id = manga.id)"
+    )
+    # Score bayésien initial (poids 5, moyenne globale du site ou 3.0)
+    op.execute(
+        "UPDATE manga SET bayesian_score = "
+        "(5 * COALESCE((SELECT AVG(value) FROM rating), 3.0) + rating_sum) / (5 + rating_count)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('manga', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_manga_bayesian_score'))
+        batch_op.drop_column('bayesian_score')
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
+
+    with op.batch_alter_table('rating', schema=None) as batch_op:
+        batch_op.drop_constraint('_manga_fingerprint_rating_uc', type_='unique')
+        batch_op.drop_constraint('_manga_user_rating_uc', type_='unique')
+        batch_op.drop_column('fingerprint')
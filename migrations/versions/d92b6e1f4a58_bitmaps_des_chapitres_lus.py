@@ -0,0 +1,102 @@
+"""Bitmaps des chapitres lus et ordinaux stables des chapitres
+
+Revision ID: d92b6e1f4a58
+Revises: a7e3c5d9f214
+Create Date: 2026-10-19 16:12:47.418305
+
+"""
+import re
+import zlib
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92b6e1f4a58'
+down_revision = 'a7e3c5d9f214'
+branch_labels = None
+depends_on = None
+
+
+# Copies figées de readmarks.chapter_sort_key / readmarks.encode
+def _chapter_sort_key(name):
+    numbers = re.findall(r'\d+', name)
+    return (0, int(numbers[0]), name.lower()) if numbers else (1, 0, name.lower())
+
+
+def _encode(bits):
+    if not bits:
+        return b""
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    if len(raw) >= 32:
+        packed = zlib.compress(raw, 9)
+        if len(packed) < len(raw):
+            return b"\x01" + packed
+    return b"\x00" + raw
+
+
+def upgrade():
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ordinal', sa.Integer(), nullable=True))
+    with op.batch_alter_table('manga', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('chapter_seq', sa.Integer(), nullable=True))
+
+    op.create_table('read_bitmap',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('manga_id', sa.Integer(), nullable=False),
+    sa.Column('bits', sa.LargeBinary(), nullable=False),
+    sa.Column('read_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['manga_id'], ['manga.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'manga_id')
+    )
+
+    conn = op.get_bind()
+
+    # Ordinaux initiaux : ordre de lecture actuel de chaque manga
+    chapters = defaultdict(list)
+    for chapter_id, manga_id, name in conn.execute(sa.text("SELECT id, manga_id, name FROM chapter")):
+        chapters[manga_id].append((chapter_id, name))
+    updates = []
+    for rows in chapters.values():
+        rows.sort(key=lambda row: _chapter_sort_key(row[1]))
+        updates.extend({"id": chapter_id, "ordinal": i} for i, (chapter_id, _) in enumerate(rows))
+    if updates:
+        conn.execute(sa.text("UPDATE chapter SET ordinal = :ordinal WHERE id = :id"), updates)
+    conn.execute(sa.text(
+        "UPDATE manga SET chapter_seq = (SELECT COALESCE(MAX(ordinal) + 1, 0) FROM chapter WHERE chapter.manga_id = manga.id)"
+    ))
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index('ix_chapter_manga_ordinal', ['manga_id', 'ordinal'], unique=True)
+
+    # Conversion des lignes ReadingProgress existantes en bitmaps
+    bitmaps = defaultdict(int)
+    last_read = {}
+    rows = conn.execute(sa.text(
+        "SELECT rp.user_id, rp.manga_id, c.ordinal, rp.last_read_at FROM reading_progress rp "
+        "JOIN chapter c ON c.manga_id = rp.manga_id AND c.name = rp.chapter_name"
+    ))
+    for user_id, manga_id, ordinal, read_at in rows:
+        bitmaps[(user_id, manga_id)] |= 1 << ordinal
+        if read_at and (last_read.get((user_id, manga_id)) or "") < str(read_at):
+            last_read[(user_id, manga_id)] = str(read_at)
+    if bitmaps:
+        conn.execute(
+            sa.text("INSERT INTO read_bitmap (user_id, manga_id, bits, read_count, updated_at) "
+                    "VALUES (:user_id, :manga_id, :bits, :read_count, :updated_at)"),
+            [{"user_id": user_id, "manga_id": manga_id, "bits": _encode(bits),
+              "read_count": bin(bits).count("1"), "updated_at": last_read.get((user_id, manga_id))}
+             for (user_id, manga_id), bits in bitmaps.items()]
+        )
+
+
+def downgrade():
+    op.drop_table('read_bitmap')
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index('ix_chapter_manga_ordinal')
+        batch_op.drop_column('ordinal')
+    with op.batch_alter_table('manga', schema=None) as batch_op:
+        batch_op.drop_column('chapter_seq')
@@ -0,0 +1,29 @@
+"""Index du flux des nouveaux chapitres des favoris
+
+Revision ID: e4a9c1f7b352
+Revises: 0b5d7e3a9c12
+Create Date: 2026-10-19 18:20:44.671093
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c1f7b352'
+down_revision = '0b5d7e3a9c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index('ix_chapter_manga_date', ['manga_id', 'date_added'], unique=False)
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_manga_user', ['manga_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_manga_user')
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index('ix_chapter_manga_date')
@@ -22,7 +22,11 @@ class Manga(db.Model):
     is_new = db.Column(db.Boolean, default=False)
     is_top = db.Column(db.Boolean, default=False)
     views = db.Column(db.Integer, default=0)
+    rating_sum = db.Column(db.Float, default=0)      # Somme des notes (maintenue à chaque vote)
+    rating_count = db.Column(db.Integer, default=0)  # Nombre de notes
+    bayesian_score = db.Column(db.Float, default=0, index=True)  # Score pondéré pour le classement
     status = db.Column(db.String(20), default="En cours")
+    chapter_seq = db.Column(db.Integer, default=0)  # Prochain ordinal de chapitre (jamais réutilisé)
     chapters = db.relationship('Chapter', backref='manga', lazy=True)
     ratings = db.relationship('Rating', backref='manga', lazy=True)
     comments = db.relationship('Comment', backref='manga', lazy=True)
@@ -35,6 +39,12 @@ class Chapter(db.Model):
     name = db.Column(db.String(128), nullable=False)
     date_added = db.Column(db.Integer)  # timestamp
     images = db.Column(db.Text)  # JSON list of image filenames
+    ordinal = db.Column(db.Integer)  # Position stable dans le manga (bit de ReadBitmap)
+
+    __table_args__ = (
+        db.Index('ix_chapter_manga_ordinal', 'manga_id', 'ordinal', unique=True),
+        db.Index('ix_chapter_manga_date', 'manga_id', 'date_added'),
+    )
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -44,6 +54,7 @@ class User(db.Model, UserMixin):
     reset_token_used = db.Column(db.Boolean, default=False)  # Nouveau champ
     role = db.Column(db.String(16), default="user")  # "admin" ou "user"
     is_admin = db.Column(db.Boolean, default=False)
+    email_digest = db.Column(db.Boolean, default=False)  # Résumé quotidien des notifications par email
     
 
     def set_password(self, password):
@@ -67,7 +78,12 @@ class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_favorite_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_favorite_manga_user', 'manga_id', 'user_id'),
+    )
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -80,13 +96,50 @@ class Comment(db.Model):
     reported = db.Column(db.Boolean, default=False)
     user = db.relationship('User', backref='comments')
 
+    __table_args__ = (db.Index('ix_comment_manga_created', 'manga_id', 'created_at', 'id'),)
+
 class Rating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
     value = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Null pour visiteurs anonymes
+    fingerprint = db.Column(db.String(32), nullable=True)  # Empreinte des visiteurs anonymes
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.UniqueConstraint('manga_id', 'user_id', name='_manga_user_rating_uc'),
+        db.UniqueConstraint('manga_id', 'fingerprint', name='_manga_fingerprint_rating_uc'),
+    )
+
+class MangaActivity(db.Model):
+    """Lectures et vues agrégées par manga et par heure (moteur de tendances)."""
+    __tablename__ = 'manga_activity'
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, index=True)  # timestamp // 3600
+    reads = db.Column(db.Integer, nullable=False, default=0)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+class MangaSimilarity(db.Model):
+    """Voisins précalculés d'un manga (« les lecteurs ont aussi lu »)."""
+    __tablename__ = 'manga_similarity'
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    similar_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_manga_similarity_rank', 'manga_id', 'rank'),)
+
+class UserRecommendation(db.Model):
+    """Recommandations « pour vous » précalculées par utilisateur."""
+    __tablename__ = 'user_recommendation'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_user_recommendation_rank', 'user_id', 'rank'),)
+
 class ReadingHistory(db.Model):
     __tablename__ = 'reading_history'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
@@ -97,6 +150,8 @@ class ReadingHistory(db.Model):
     user = db.relationship('User', backref='reading_history')
     manga = db.relationship('Manga', backref='reading_histories')
 
+    __table_args__ = (db.Index('ix_reading_history_user_manga_chapter', 'user_id', 'manga_id', 'chapter_name', unique=True),)
+
 class CommentLike(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -113,4 +168,58 @@ class ReadingProgress(db.Model):
     last_read_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship('User', backref='reading_progress')
-    manga = db.relationship('Manga', backref='progress_entries')  # Renommé ici pour éviter les conflits
\ No newline at end of file
+    manga = db.relationship('Manga', backref='progress_entries')  # Renommé ici pour éviter les conflits
+
+    __table_args__ = (db.Index('ix_reading_progress_user_manga_chapter', 'user_id', 'manga_id', 'chapter_name', unique=True),)
+
+class ReadBitmap(db.Model):
+    """Chapitres lus par un utilisateur dans un manga : un bit par ordinal de chapitre."""
+    __tablename__ = 'read_bitmap'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    bits = db.Column(db.LargeBinary, nullable=False, default=b"")  # Voir readmarks.encode
+    read_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ReadingPosition(db.Model):
+    """Dernière position de lecture d'un utilisateur dans un manga (reprise de lecture)."""
+    __tablename__ = 'reading_position'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    chapter_name = db.Column(db.String(128), nullable=False)
+    page = db.Column(db.Integer, nullable=False, default=0)  # Index de l'image (à partir de 0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_reading_position_user_updated', 'user_id', 'updated_at'),)
+
+class Notification(db.Model):
+    """
+    Nouveaux chapitres d'un manga suivi. Tant qu'elle n'est pas lue, la
+    notification regroupe tous les chapitres suivants du même manga.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
+    first_chapter = db.Column(db.String(128), nullable=False)
+    last_chapter = db.Column(db.String(128), nullable=False)
+    chapter_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime)
+    emailed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_notification_user_updated', 'user_id', 'updated_at', 'id'),
+        # Une seule notification non lue par (utilisateur, manga) : cible du regroupement
+        db.Index('ix_notification_unread', 'user_id', 'manga_id', unique=True,
+                 sqlite_where=db.text('read_at IS NULL')),
+    )
+
+class EventLog(db.Model):
+    """Journal des événements temps réel, lu par chaque worker pour alimenter les flux SSE."""
+    __tablename__ = 'event_log'
+    id = db.Column(db.Integer, primary_key=True)
+    topics = db.Column(db.String(256), nullable=False)  # Sujets séparés par des espaces
+    event = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,203 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, Favorite, User, Notification
+from library import keyset_page
+
+FANOUT_BATCH = 1000      # Abonnés traités par transaction
+COALESCE_DELAY = 10      # Secondes d'attente pour regrouper les chapitres ajoutés à la suite
+INBOX_PAGE_SIZE = 20
+
+
+def fan_out(manga_id, chapter_names):
+    """
+    Notifie tous les utilisateurs qui suivent un manga, par lots de FANOUT_BATCH
+    abonnés (une transaction courte par lot). Un INSERT ... SELECT par lot ;
+    les notifications déjà non lues sont complétées au lieu d'être dupliquées.
+    Retourne le nombre d'abonnés traités.
+    """
+    if not chapter_names:
+        return 0
+    now = datetime.utcnow()
+    first, last, count = chapter_names[0], chapter_names[-1], len(chapter_names)
+    followers = select(Favorite.user_id).where(Favorite.manga_id == manga_id)
+    lower, total = 0, 0
+    while True:
+        # Borne haute du lot : le FANOUT_BATCH-ième abonné suivant (index manga_id, user_id)
+        upper = db.session.execute(
+            followers.where(Favorite.user_id > lower).order_by(Favorite.user_id)
+            .offset(FANOUT_BATCH - 1).limit(1)
+        ).scalar()
+        batch = followers.where(Favorite.user_id > lower)
+        if upper is not None:
+            batch = batch.where(Favorite.user_id <= upper)
+        stmt = insert(Notification).from_select(
+            ["user_id", "manga_id", "first_chapter", "last_chapter", "chapter_count", "created_at", "updated_at"],
+            select(batch.subquery().c.user_id, db.literal(manga_id), db.literal(first),
+                   db.literal(last), db.literal(count), db.literal(now), db.literal(now))
+            .distinct()
+            .where(db.true())  # Lève l'ambiguïté SQLite entre INSERT ... SELECT et ON CONFLICT
+        )
+        result = db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "manga_id"],
+            index_where=Notification.read_at.is_(None),
+            set_={
+                "chapter_count": Notification.chapter_count + stmt.excluded.chapter_count,
+                "last_chapter": stmt.excluded.last_chapter,
+                "updated_at": stmt.excluded.updated_at,
+                "emailed_at": None,
+            }
+        ))
+        db.session.commit()
+        total += result.rowcount
+        if upper is None:
+            return total
+        lower = upper
+
+
+class NotificationDispatcher:
+    """
+    Reçoit les ajouts de chapitres depuis les requêtes et fait la diffusion dans
+    un thread de fond. Les chapitres d'un même manga ajoutés à quelques
+    secondes d'intervalle sont regroupés en une seule diffusion.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pending = defaultdict(list)  # manga_id -> noms des nouveaux chapitres
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self._flush_at_exit)
+
+    def notify(self, manga_id, chapter_name):
+        with self._lock:
+            self._pending[manga_id].append(chapter_name)
+        self._wakeup.set()
+        self._ensure_worker()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+        total = 0
+        for manga_id, chapter_names in pending.items():
+            total += fan_out(manga_id, chapter_names)
+        return total
+
+    def _ensure_worker(self):
+        if self.app is None or (self._worker and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="notification-fanout", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Laisse le temps aux chapitres envoyés à la suite d'arriver
+            time.sleep(COALESCE_DELAY)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Erreur de diffusion des notifications : {e}")
+
+    def _flush_at_exit(self):
+        if self.app is None or not self._pending:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            pass
+
+
+notifications = NotificationDispatcher()
+
+
+# --- Boîte de réception --------------------------------------------------------
+
+def get_inbox_page(user_id, cursor=None, limit=INBOX_PAGE_SIZE):
+    query = db.session.query(Manga.name, Notification.id, Notification.updated_at, Notification.first_chapter,
+                             Notification.last_chapter, Notification.chapter_count, Notification.read_at)\
+        .join(Manga, Manga.id == Notification.manga_id)\
+        .filter(Notification.user_id == user_id)
+    return keyset_page(query, Notification.updated_at, Notification.id, cursor, limit, lambda r: {
+        "id": r.id,
+        "manga": r.name,
+        "first_chapter": r.first_chapter,
+        "last_chapter": r.last_chapter,
+        "chapter_count": r.chapter_count,
+        "updated_at": r.updated_at,
+        "unread": r.read_at is None,
+    })
+
+
+def unread_count(user_id):
+    return db.session.query(Notification.id)\
+        .filter(Notification.user_id == user_id, Notification.read_at.is_(None)).count()
+
+
+def mark_all_read(user_id):
+    db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.read_at.is_(None))
+        .values(read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+# --- Résumé quotidien par email ---------------------------------------------------
+
+def send_daily_digest(mail, site_name):
+    """
+    Envoie à chaque utilisateur abonné au résumé un seul email listant ses
+    notifications non lues et pas encore envoyées. Tous les emails passent
+    par la même connexion SMTP (renouvelée tous les MAIL_MAX_EMAILS envois).
+    Retourne le nombre d'emails envoyés.
+    """
+    rows = db.session.query(User.id, User.username, User.email, Notification.id, Manga.name,
+                            Notification.first_chapter, Notification.last_chapter, Notification.chapter_count)\
+        .join(Notification, Notification.user_id == User.id)\
+        .join(Manga, Manga.id == Notification.manga_id)\
+        .filter(User.email_digest.is_(True), Notification.read_at.is_(None), Notification.emailed_at.is_(None))\
+        .order_by(User.id, Notification.updated_at.desc())\
+        .all()
+    digests = {}
+    for user_id, username, email, notification_id, manga_name, first, last, count in rows:
+        digest = digests.setdefault(user_id, {"username": username, "email": email, "ids": [], "items": []})
+        digest["ids"].append(notification_id)
+        digest["items"].append({"manga": manga_name, "first_chapter": first, "last_chapter": last, "chapter_count": count})
+
+    # Gabarit rendu sans les context processors du site (pas de requête en cron)
+    template = current_app.jinja_env.get_template('emails/digest.txt')
+    sender = f"{site_name} <{current_app.config.get('MAIL_USERNAME')}>"
+    sent = 0
+    with mail.connect() as conn:
+        for digest in digests.values():
+            msg = Message(f"Nouveaux chapitres sur {site_name}", recipients=[digest["email"]], sender=sender)
+            msg.body = template.render(username=digest["username"], items=digest["items"], site_name=site_name)
+            conn.send(msg)
+            db.session.execute(
+                update(Notification).where(Notification.id.in_(digest["ids"]))
+                .values(emailed_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            sent += 1
+    return sent
@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+NPLUSONE_THRESHOLD = 5   # Même forme de requête répétée au moins N fois dans une requête HTTP
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_IGNORED_FILES = {os.path.abspath(__file__)}
+
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES_RE = re.compile(r"\s+")
+
+# Formes de requêtes de la requête HTTP en cours dans ce thread
+_local = threading.local()
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def normalize(statement):
+    """Forme d'une requête SQL : littéraux et listes IN (?, ?, ...) remplacés par « ? »."""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _SPACES_RE.sub(" ", shape).strip()
+
+
+def _call_site():
+    """Première ligne du code du site (hors bibliothèques) qui a déclenché la requête."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_ROOT) and filename not in _IGNORED_FILES and "site-packages" not in filename:
+            return f"{os.path.relpath(filename, _ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = getattr(_local, "state", None)
+    if state is None or executemany:
+        return
+    shape = normalize(statement)
+    state["shapes"][shape] += 1
+    if state["shapes"][shape] == state["threshold"]:
+        # La pile n'est relevée qu'une fois par forme, au franchissement du seuil
+        state["sites"][shape] = _call_site()
+
+
+class NPlusOneDetector:
+    """
+    Repère les requêtes SQL répétées à l'identique (même forme) dans une même
+    requête HTTP : symptôme d'un chargement paresseux dans une boucle.
+    Actif en mode debug ou test (NPLUSONE_ENABLED) sur toutes les routes ;
+    avec NPLUSONE_RAISE, lève NPlusOneError pour faire échouer un test.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.violations = []   # Dernières détections : (endpoint, nombre, forme, site d'appel)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('NPLUSONE_ENABLED', app.debug or app.testing)
+        app.config.setdefault('NPLUSONE_THRESHOLD', NPLUSONE_THRESHOLD)
+        app.config.setdefault('NPLUSONE_RAISE', False)
+        self.enabled = app.config['NPLUSONE_ENABLED']
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._check)
+        app.teardown_request(self._stop)
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+
+    def _start(self):
+        _local.state = {
+            "shapes": Counter(),
+            "sites": {},
+            "threshold": self.app.config['NPLUSONE_THRESHOLD'],
+        }
+
+    def _check(self, response):
+        state = getattr(_local, "state", None)
+        if state is None:
+            return response
+        found = [(request.endpoint, state["shapes"][shape], shape, site) for shape, site in state["sites"].items()]
+        _local.state = None
+        if not found:
+            return response
+        self.violations.extend(found)
+        del self.violations[:-100]
+        for endpoint, count, shape, site in found:
+            self.app.logger.warning(f"N+1 probable sur {endpoint} : {count} × « {shape[:200]} » ({site})")
+        if self.app.config['NPLUSONE_RAISE']:
+            endpoint, count, shape, site = found[0]
+            raise NPlusOneError(f"{endpoint} : {count} × « {shape[:200]} » ({site})")
+        return response
+
+    def _stop(self, exc=None):
+        _local.state = None
+
+
+nplusone = NPlusOneDetector()
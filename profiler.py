@@ -0,0 +1,162 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_THRESHOLD = 0.5   # Secondes : seules les requêtes plus lentes sont conservées
+PROFILE_SAMPLE_RATE = 0.1 # Part des requêtes profilées (cProfile ralentit la requête observée)
+PROFILE_KEEP = 50         # Traces gardées sur disque (les plus anciennes sont supprimées)
+PROFILE_TOP = 40          # Fonctions listées dans une trace, par temps cumulé
+SQL_KEEP = 200            # Requêtes SQL gardées par trace
+
+# Profil de la requête HTTP en cours dans ce thread (None si elle n'est pas échantillonnée)
+_local = threading.local()
+# Un seul profil actif par processus : depuis Python 3.12, cProfile occupe l'emplacement
+# sys.monitoring du processus (un second enable() lève ValueError) et observe tous les threads
+_active = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_local, "trace", None)
+    if trace is not None and trace.get("query_start") is not None:
+        trace["sql"].append((time.perf_counter() - trace.pop("query_start"), statement))
+
+
+class SlowRequestProfiler:
+    """
+    Profilage à la demande (PROFILER_ENABLED) : une part des requêtes est
+    exécutée sous cProfile avec relevé du SQL ; celles qui dépassent
+    PROFILE_THRESHOLD sont enregistrées dans instance/profiles (anneau des
+    PROFILE_KEEP dernières traces, partagé entre workers).
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.directory = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PROFILER_ENABLED', False)
+        app.config.setdefault('PROFILE_THRESHOLD', PROFILE_THRESHOLD)
+        app.config.setdefault('PROFILE_SAMPLE_RATE', PROFILE_SAMPLE_RATE)
+        app.config.setdefault('PROFILE_KEEP', PROFILE_KEEP)
+        self.directory = os.path.join(app.instance_path, 'profiles')
+        self.enabled = app.config['PROFILER_ENABLED']
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._stop)
+        app.teardown_request(self._discard)
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    def _start(self):
+        if random.random() >= self.app.config['PROFILE_SAMPLE_RATE']:
+            return
+        if not _active.acquire(blocking=False):
+            return  # Une autre requête est déjà profilée : celle-ci ne l'est pas
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            _active.release()  # Profileur déjà actif hors de ce module (débogueur, autre outil)
+            return
+        _local.trace = {"profile": profile, "sql": [], "started": time.perf_counter()}
+
+    def _finish(self):
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace["profile"].disable()
+            _local.trace = None
+            _active.release()
+        return trace
+
+    def _stop(self, response):
+        trace = self._finish()
+        if trace is None:
+            return response
+        duration = time.perf_counter() - trace["started"]
+        if duration >= self.app.config['PROFILE_THRESHOLD']:
+            try:
+                self._save(trace, duration, response.status_code)
+            except OSError as e:
+                self.app.logger.error(f"Erreur d'enregistrement du profil : {e}")
+        return response
+
+    def _discard(self, exc=None):
+        self._finish()
+
+    def _save(self, trace, duration, status):
+        out = io.StringIO()
+        pstats.Stats(trace["profile"], stream=out).strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP)
+        sql = trace["sql"]
+        trace_id = f"{time.time_ns()}-{os.getpid()}"
+        data = {
+            "id": trace_id,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": status,
+            "duration": duration,
+            "sql_count": len(sql),
+            "sql_time": sum(elapsed for elapsed, _ in sql),
+            "sql": [{"time": elapsed, "statement": statement} for elapsed, statement in sql[:SQL_KEEP]],
+            "profile": out.getvalue(),
+        }
+        path = os.path.join(self.directory, f"{trace_id}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+        for old in self._trace_files()[self.app.config['PROFILE_KEEP']:]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass  # Déjà supprimé par un autre worker
+
+    def _trace_files(self):
+        """Fichiers de traces, du plus récent au plus ancien (le nom commence par l'horodatage)."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except OSError:
+            return []
+        return sorted(names, key=lambda name: int(name.split("-", 1)[0]), reverse=True)
+
+    def list_traces(self):
+        traces = []
+        for name in self._trace_files():
+            trace = self.get_trace(name[:-len(".json")])
+            if trace:
+                trace.pop("profile")
+                trace.pop("sql")
+                traces.append(trace)
+        return traces
+
+    def get_trace(self, trace_id):
+        if not trace_id or "/" in trace_id or "\\" in trace_id or trace_id.startswith("."):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{trace_id}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+profiler = SlowRequestProfiler()
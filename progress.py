@@ -0,0 +1,178 @@
+import atexit
+import threading
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, Chapter, ReadingHistory, ReadingPosition
+from readmarks import update_bits
+
+FLUSH_INTERVAL = 5       # Secondes max avant écriture d'une lecture en base
+MAX_PENDING = 500        # Au-delà, le thread de fond est réveillé immédiatement
+
+
+class ProgressTracker:
+    """
+    Enregistre les chapitres ouverts par les utilisateurs connectés.
+
+    Les lectures sont gardées en mémoire puis écrites par lots dans une seule
+    transaction : un INSERT ... ON CONFLICT DO UPDATE sur ReadingHistory et
+    une mise à jour des bitmaps de chapitres lus (ReadBitmap), au lieu de
+    deux select + commit à chaque ouverture de chapitre. Les positions de
+    reprise (chapitre et page) suivent le même chemin, la dernière gagnant.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pending = {}  # (user_id, nom du manga, chapitre) -> date de lecture
+        self._positions = {}  # (user_id, nom du manga) -> (chapitre, page, date)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self._flush_at_exit)
+
+    def record(self, user_id, manga_name, chapter_name):
+        with self._lock:
+            self._pending[(user_id, manga_name, chapter_name)] = datetime.utcnow()
+            size = len(self._pending)
+        if size >= MAX_PENDING:
+            self._wakeup.set()
+        self._ensure_worker()
+
+    def record_position(self, user_id, manga_name, chapter_name, page):
+        with self._lock:
+            self._positions[(user_id, manga_name)] = (chapter_name, page, datetime.utcnow())
+        self._ensure_worker()
+
+    def pending_chapters(self, user_id, manga_name):
+        """Chapitres lus mais pas encore écrits en base (pour un affichage à jour)."""
+        with self._lock:
+            return {chapter for (uid, name, chapter) in self._pending if uid == user_id and name == manga_name}
+
+    def has_pending(self, user_id):
+        with self._lock:
+            return any(uid == user_id for (uid, _, _) in self._pending) or \
+                any(uid == user_id for (uid, _) in self._positions)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            positions, self._positions = self._positions, {}
+        if not pending and not positions:
+            return 0
+        names = {name for (_, name, _) in pending} | {name for (_, name) in positions}
+        ids = dict(db.session.query(Manga.name, Manga.id).filter(Manga.name.in_(names)).all())
+        rows = [
+            {"user_id": user_id, "manga_id": ids[name], "chapter_name": chapter, "last_read_at": read_at}
+            for (user_id, name, chapter), read_at in pending.items() if name in ids
+        ]
+        position_rows = [
+            {"user_id": user_id, "manga_id": ids[name], "chapter_name": chapter, "page": page, "updated_at": at}
+            for (user_id, name), (chapter, page, at) in positions.items() if name in ids
+        ]
+        try:
+            if rows:
+                stmt = insert(ReadingHistory)
+                db.session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=['user_id', 'manga_id', 'chapter_name'],
+                        set_={"last_read_at": stmt.excluded.last_read_at}
+                    ),
+                    rows
+                )
+                update_bits(self._bitmap_changes(rows))
+            if position_rows:
+                stmt = insert(ReadingPosition)
+                db.session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=['user_id', 'manga_id'],
+                        set_={"chapter_name": stmt.excluded.chapter_name, "page": stmt.excluded.page,
+                              "updated_at": stmt.excluded.updated_at},
+                        where=ReadingPosition.updated_at <= stmt.excluded.updated_at
+                    ),
+                    position_rows
+                )
+            db.session.commit()
+        except Exception:
+            # On remet les lectures dans le tampon pour le prochain essai
+            db.session.rollback()
+            with self._lock:
+                for key, read_at in pending.items():
+                    self._pending.setdefault(key, read_at)
+                for key, position in positions.items():
+                    self._positions.setdefault(key, position)
+            raise
+        return len(rows) + len(position_rows)
+
+    @staticmethod
+    def _bitmap_changes(rows):
+        """Bits à ajouter par (user_id, manga_id), d'après les ordinaux des chapitres lus."""
+        manga_ids = {row["manga_id"] for row in rows}
+        chapter_names = {row["chapter_name"] for row in rows}
+        ordinals = {
+            (manga_id, name): ordinal
+            for manga_id, name, ordinal in db.session.query(Chapter.manga_id, Chapter.name, Chapter.ordinal)
+            .filter(Chapter.manga_id.in_(manga_ids), Chapter.name.in_(chapter_names))
+            if ordinal is not None
+        }
+        changes = {}
+        for row in rows:
+            ordinal = ordinals.get((row["manga_id"], row["chapter_name"]))
+            if ordinal is None:
+                continue
+            key = (row["user_id"], row["manga_id"])
+            add, _ = changes.get(key, (0, 0))
+            changes[key] = (add | (1 << ordinal), 0)
+        return changes
+
+    def _ensure_worker(self):
+        if self.app is None or (self._worker and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Erreur d'écriture de la progression de lecture : {e}")
+
+    def _flush_at_exit(self):
+        if self.app is None or not (self._pending or self._positions):
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            pass
+
+
+def get_continue_reading(user_id, limit=8):
+    """
+    Séries à reprendre, de la plus récente à la plus ancienne : une requête
+    sur l'index (user_id, updated_at), avec le nom du manga par jointure.
+    """
+    rows = db.session.query(ReadingPosition.chapter_name, ReadingPosition.page,
+                            ReadingPosition.updated_at, Manga.name)\
+        .join(Manga, Manga.id == ReadingPosition.manga_id)\
+        .filter(ReadingPosition.user_id == user_id)\
+        .order_by(ReadingPosition.updated_at.desc())\
+        .limit(limit).all()
+    return [{
+        "manga": r.name,
+        "chapter": r.chapter_name,
+        "page": r.page,
+        "updated_at": r.updated_at,
+    } for r in rows]
+
+
+progress_tracker = ProgressTracker()
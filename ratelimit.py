@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from flask import request, current_app
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+MEMORY_MAXSIZE = 10000   # Seaux gardés en mémoire par worker (éviction LRU)
+PRUNE_EVERY = 1000       # Nettoyage des seaux pleins du stockage partagé, toutes les N consommations
+
+
+def parse_rate(rate):
+    """« 10/minute » -> (capacité, jetons rendus par seconde)."""
+    count, _, period = rate.partition("/")
+    count = int(count)
+    return count, count / PERIODS[period.strip()]
+
+
+def _refill(tokens, updated, now, capacity, refill_rate):
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+def _take(state, now, capacity, refill_rate):
+    """
+    Retire un jeton du seau. state = (jetons, date) ou None pour un seau neuf.
+    Retourne (autorisé, nouvel état, secondes avant le prochain jeton).
+    """
+    tokens = capacity if state is None else _refill(state[0], state[1], now, capacity, refill_rate)
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0
+    return False, (tokens, now), (1 - tokens) / refill_rate
+
+
+class MemoryStore:
+    """Seaux dans la mémoire du worker : suffisant avec un seul processus."""
+
+    def __init__(self, maxsize=MEMORY_MAXSIZE):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        with self._lock:
+            allowed, state, retry_after = _take(self._buckets.get(key), now, capacity, refill_rate)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore:
+    """
+    Seaux partagés entre workers dans un fichier SQLite à part (pas site.db,
+    pour ne pas prendre le verrou d'écriture du site). Chaque consommation est
+    une transaction IMMEDIATE courte ; les seaux redevenus pleins sont supprimés
+    de temps en temps.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, refill_rate):
+        conn = self._connection()
+        now = time.time()  # Horloge commune à tous les processus
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            allowed, (tokens, updated), retry_after = _take(row, now, capacity, refill_rate)
+            full_at = updated + (capacity - tokens) / refill_rate
+            conn.execute(
+                "INSERT INTO bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated,"
+                " full_at = excluded.full_at",
+                (key, tokens, updated, full_at)
+            )
+            self._calls += 1
+            if self._calls % PRUNE_EVERY == 0:
+                # Un seau plein équivaut à un seau absent
+                conn.execute("DELETE FROM bucket WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def clear(self):
+        self._connection().execute("DELETE FROM bucket")
+
+
+class RateLimiter:
+    """
+    Limitation de débit par seau à jetons, par IP ou par utilisateur connecté,
+    déclarée route par route avec @rate_limiter.limit("10/minute").
+    Les limites peuvent être remplacées sans toucher au code via
+    app.config['RATELIMITS'] = {"<endpoint>:<scope>": "5/minute"}, par exemple
+    {"site.download_chapter:ip": "5/minute"} : une route peut empiler une
+    limite par IP et une par utilisateur, chacune se remplace séparément.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.store = MemoryStore()
+        self._counters = defaultdict(lambda: {"allowed": 0, "limited": 0})
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE', 'memory')  # « memory » ou « sqlite » (plusieurs workers)
+        app.config.setdefault('RATELIMITS', {})
+        if app.config['RATELIMIT_STORAGE'] == 'sqlite':
+            path = app.config.get('RATELIMIT_SQLITE_PATH') or os.path.join(app.instance_path, 'ratelimit.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.store = SQLiteStore(path)
+        else:
+            self.store = MemoryStore()
+
+    def limit(self, rate, scope="ip", methods=None):
+        """
+        scope="ip" : un seau par adresse IP ; scope="user" : un seau par
+        utilisateur connecté (les visiteurs anonymes ne sont pas concernés).
+        methods : limiter seulement certaines méthodes (ex. ("POST",) pour un formulaire).
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if methods is None or request.method in methods:
+                    self.hit(request.endpoint, rate, scope)
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+    def _key(self, endpoint, scope):
+        if scope == "user":
+            if not current_user.is_authenticated:
+                return None
+            return f"{endpoint}:user:{current_user.id}"
+        return f"{endpoint}:ip:{request.remote_addr}"
+
+    def hit(self, endpoint, rate, scope="ip"):
+        """Consomme un jeton ou lève TooManyRequests (429, avec retry_after)."""
+        if not current_app.config['RATELIMIT_ENABLED']:
+            return
+        key = self._key(endpoint, scope)
+        if key is None:
+            return
+        rate = current_app.config['RATELIMITS'].get(f"{endpoint}:{scope}", rate)
+        capacity, refill_rate = parse_rate(rate)
+        allowed, retry_after = self.store.consume(key, capacity, refill_rate)
+        with self._lock:
+            self._counters[endpoint]["allowed" if allowed else "limited"] += 1
+        if not allowed:
+            raise TooManyRequests(retry_after=max(1, int(retry_after + 0.999)))
+
+    def stats(self):
+        """Compteurs du worker courant par endpoint : requêtes autorisées et refusées."""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._counters.items()}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,134 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy import case, exists, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, Rating
+from cache import TTLCache
+
+# Score bayésien : (PRIOR_WEIGHT * moyenne_globale + somme) / (PRIOR_WEIGHT + nombre)
+# Un manga avec peu de votes reste proche de la moyenne du site.
+PRIOR_WEIGHT = 5
+DEFAULT_PRIOR_MEAN = 3.0
+TOP_SCORE = 4.5      # Seuil du badge TOP
+TOP_LIST_SIZE = 12   # Taille de la liste « Mieux notés » de l'accueil
+
+_cache = TTLCache(ttl=600, maxsize=4)
+
+
+def anonymous_fingerprint(remote_addr, user_agent, secret):
+    """Empreinte d'un visiteur anonyme (IP + navigateur), sans stocker l'IP en clair."""
+    raw = f"{remote_addr}|{user_agent}|{secret}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def average_rating(manga):
+    """Moyenne arrondie à partir des agrégats du manga, ou None si aucun vote."""
+    if not manga.rating_count:
+        return None
+    return round((manga.rating_sum or 0) / manga.rating_count, 1)
+
+
+def get_prior_mean():
+    """Moyenne globale de toutes les notes du site (mise en cache)."""
+    prior = _cache.get("prior_mean")
+    if prior is None:
+        total, count = db.session.query(
+            func.coalesce(func.sum(Manga.rating_sum), 0),
+            func.coalesce(func.sum(Manga.rating_count), 0)
+        ).one()
+        prior = (total / count) if count else DEFAULT_PRIOR_MEAN
+        _cache.set("prior_mean", prior, ttl=3600)
+    return prior
+
+
+def _bayesian(rating_sum, rating_count, prior_mean):
+    return (PRIOR_WEIGHT * prior_mean + rating_sum) / (PRIOR_WEIGHT + rating_count)
+
+
+def submit_rating(manga_id, value, user_id=None, fingerprint=None):
+    """
+    Enregistre la note d'un utilisateur (ou d'un visiteur anonyme identifié par
+    son empreinte) : une seule note par personne et par manga, la dernière
+    remplaçant la précédente. Les agrégats du manga (somme, nombre, score
+    bayésien) sont mis à jour en SQL dans la même transaction.
+    """
+    if user_id is not None:
+        owner = Rating.user_id == user_id
+        conflict_on = ['manga_id', 'user_id']
+    else:
+        owner = Rating.fingerprint == fingerprint
+        conflict_on = ['manga_id', 'fingerprint']
+
+    previous = select(Rating.value).where(Rating.manga_id == manga_id, owner).scalar_subquery()
+    already_rated = exists().where(Rating.manga_id == manga_id, owner)
+    new_sum = func.coalesce(Manga.rating_sum, 0) - func.coalesce(previous, 0) + value
+    new_count = func.coalesce(Manga.rating_count, 0) + case((already_rated, 0), else_=1)
+
+    # La mise à jour du manga pose le verrou d'écriture avant l'upsert de la note
+    db.session.execute(
+        update(Manga)
+        .where(Manga.id == manga_id)
+        .values(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            bayesian_score=_bayesian(new_sum, new_count, get_prior_mean()),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    now = datetime.utcnow()
+    db.session.execute(
+        insert(Rating)
+        .values(manga_id=manga_id, value=value, user_id=user_id,
+                fingerprint=None if user_id is not None else fingerprint,
+                timestamp=now)
+        .on_conflict_do_update(index_elements=conflict_on,
+                               set_={"value": value, "timestamp": now})
+    )
+    db.session.commit()
+    _cache.delete("top_rated")
+
+
+def refresh_rating_aggregates():
+    """
+    Recalcule somme, nombre et score bayésien de tous les mangas depuis la
+    table Rating (réparation ou changement notable de la moyenne globale).
+    """
+    rating_sum = select(func.coalesce(func.sum(Rating.value), 0))\
+        .where(Rating.manga_id == Manga.id).scalar_subquery()
+    rating_count = select(func.count(Rating.id))\
+        .where(Rating.manga_id == Manga.id).scalar_subquery()
+    db.session.execute(
+        update(Manga).values(rating_sum=rating_sum, rating_count=rating_count)
+        .execution_options(synchronize_session=False)
+    )
+    _cache.clear()
+    prior = get_prior_mean()
+    db.session.execute(
+        update(Manga).values(bayesian_score=_bayesian(Manga.rating_sum, Manga.rating_count, prior))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def get_top_rated():
+    """
+    Liste précalculée des mangas les mieux notés, triés par score bayésien :
+    {"ranking": [{"id", "name", "avg_rating", "score"}...], "top_names": set(...)}.
+    """
+    top = _cache.get("top_rated")
+    if top is None:
+        rows = db.session.query(Manga.id, Manga.name, Manga.rating_sum, Manga.rating_count, Manga.bayesian_score)\
+            .filter(Manga.rating_count > 0)\
+            .order_by(Manga.bayesian_score.desc())\
+            .limit(TOP_LIST_SIZE).all()
+        ranking = [{
+            "id": r.id,
+            "name": r.name,
+            "avg_rating": round(r.rating_sum / r.rating_count, 1),
+            "score": r.bayesian_score,
+        } for r in rows]
+        top_names = {name for (name,) in db.session.query(Manga.name)
+                     .filter(Manga.rating_count > 0, Manga.bayesian_score >= TOP_SCORE)}
+        top = {"ranking": ranking, "top_names": top_names}
+        _cache.set("top_rated", top)
+    return top
@@ -0,0 +1,80 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Comment, CommentLike
+
+# Résultats possibles d'un vote
+VOTE_NEW = "new"
+VOTE_CHANGED = "changed"
+VOTE_UNCHANGED = "unchanged"
+
+
+def record_vote(user_id, comment_id, is_like):
+    """
+    Enregistre le vote (like/dislike) d'un utilisateur sur un commentaire et
+    met à jour les compteurs directement en base, dans une seule transaction.
+
+    Retourne (résultat, manga_id) ; manga_id vaut None si le commentaire
+    n'existe pas (la transaction est alors annulée).
+    """
+    likes_delta, dislikes_delta = (1, 0) if is_like else (0, 1)
+
+    # 1. Changement de vote : like -> dislike ou dislike -> like
+    switched = db.session.execute(
+        update(CommentLike)
+        .where(CommentLike.user_id == user_id,
+               CommentLike.comment_id == comment_id,
+               CommentLike.is_like != is_like)
+        .values(is_like=is_like)
+    ).rowcount
+    if switched:
+        result = VOTE_CHANGED
+        likes_delta, dislikes_delta = (1, -1) if is_like else (-1, 1)
+    else:
+        # 2. Nouveau vote : upsert sur la contrainte _user_comment_uc
+        inserted = db.session.execute(
+            insert(CommentLike)
+            .values(user_id=user_id, comment_id=comment_id, is_like=is_like)
+            .on_conflict_do_nothing(index_elements=['user_id', 'comment_id'])
+        ).rowcount
+        if not inserted:
+            db.session.rollback()
+            return VOTE_UNCHANGED, None
+        result = VOTE_NEW
+
+    # 3. Compteurs ajustés en SQL (likes = likes + ?) : pas de mise à jour perdue
+    manga_id = db.session.execute(
+        update(Comment)
+        .where(Comment.id == comment_id)
+        .values(
+            likes=func.max(func.coalesce(Comment.likes, 0) + likes_delta, 0),
+            dislikes=func.max(func.coalesce(Comment.dislikes, 0) + dislikes_delta, 0),
+        )
+        .returning(Comment.manga_id)
+    ).scalar()
+    if manga_id is None:
+        db.session.rollback()
+        return result, None
+    db.session.commit()
+    return result, manga_id
+
+
+def reconcile_comment_counters():
+    """
+    Recalcule en masse les compteurs likes/dislikes de tous les commentaires
+    à partir de la table CommentLike (une seule requête UPDATE).
+    Retourne le nombre de commentaires corrigés.
+    """
+    def _count(is_like):
+        return select(func.count(CommentLike.id))\
+            .where(CommentLike.comment_id == Comment.id, CommentLike.is_like == is_like)\
+            .scalar_subquery()
+
+    likes, dislikes = _count(True), _count(False)
+    fixed = db.session.execute(
+        update(Comment)
+        .where((func.coalesce(Comment.likes, -1) != likes) | (func.coalesce(Comment.dislikes, -1) != dislikes))
+        .values(likes=likes, dislikes=dislikes)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return fixed
@@ -0,0 +1,191 @@
+import re
+import zlib
+from datetime import datetime
+from sqlalchemy import func, update
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, Chapter, ReadBitmap
+from cache import TTLCache
+
+# Les bitmaps de plus de 32 octets sont compressées (longues suites de chapitres lus)
+_COMPRESS_FROM = 32
+_RAW, _ZLIB = b"\x00", b"\x01"
+
+# Chapitres existants de chaque manga : (bitmap des ordinaux, {ordinal: nom})
+_chapters_cache = TTLCache(ttl=600, maxsize=1024)
+
+
+def chapter_sort_key(name):
+    """Ordre de lecture : numéro trouvé dans le nom, sinon ordre alphabétique."""
+    numbers = re.findall(r'\d+', name)
+    return (0, int(numbers[0]), name.lower()) if numbers else (1, 0, name.lower())
+
+
+# --- Encodage ------------------------------------------------------------------
+
+def encode(bits):
+    if not bits:
+        return b""
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    if len(raw) >= _COMPRESS_FROM:
+        packed = zlib.compress(raw, 9)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _RAW + raw
+
+
+def decode(data):
+    if not data:
+        return 0
+    flag, payload = data[:1], data[1:]
+    if flag == _ZLIB:
+        payload = zlib.decompress(payload)
+    return int.from_bytes(payload, "little")
+
+
+# --- Opérations sur les bits ------------------------------------------------------
+
+def range_mask(first, last):
+    """Bits first..last inclus."""
+    if last < first:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def ordinals_mask(ordinals):
+    bits = 0
+    for ordinal in ordinals:
+        bits |= 1 << ordinal
+    return bits
+
+
+def is_read(bits, ordinal):
+    return ordinal is not None and (bits >> ordinal) & 1 == 1
+
+
+def unread_count(bits, chapters_mask):
+    return (chapters_mask & ~bits).bit_count()
+
+
+def first_unread(bits, chapters_mask):
+    """Plus petit ordinal existant non lu, ou None si tout est lu."""
+    unread = chapters_mask & ~bits
+    if not unread:
+        return None
+    return (unread & -unread).bit_length() - 1
+
+
+# --- Chapitres ------------------------------------------------------------------------
+
+def next_ordinal(manga_id):
+    """
+    Réserve l'ordinal du prochain chapitre d'un manga. Le compteur n'est jamais
+    décrémenté : un chapitre supprimé ne laisse pas son bit « lu » au suivant.
+    """
+    return db.session.execute(
+        update(Manga)
+        .where(Manga.id == manga_id)
+        .values(chapter_seq=func.coalesce(Manga.chapter_seq, 0) + 1)
+        .returning(Manga.chapter_seq - 1)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def manga_chapters(manga_id):
+    """(masque des ordinaux existants, {ordinal: nom du chapitre}) pour un manga."""
+    cached = _chapters_cache.get(manga_id)
+    if cached is None:
+        names = {ordinal: name for ordinal, name in db.session.query(Chapter.ordinal, Chapter.name)
+                 .filter(Chapter.manga_id == manga_id, Chapter.ordinal.isnot(None))}
+        cached = (ordinals_mask(names), names)
+        _chapters_cache.set(manga_id, cached)
+    return cached
+
+
+def invalidate_chapters(manga_id):
+    _chapters_cache.delete(manga_id)
+
+
+# --- Lecture / écriture des bitmaps ------------------------------------------------------
+
+def load_bits(user_id, manga_id):
+    data = db.session.query(ReadBitmap.bits).filter_by(user_id=user_id, manga_id=manga_id).scalar()
+    return decode(data)
+
+
+def load_bits_many(user_id, manga_ids):
+    """{manga_id: bits} pour plusieurs mangas en une seule requête."""
+    if not manga_ids:
+        return {}
+    rows = db.session.query(ReadBitmap.manga_id, ReadBitmap.bits)\
+        .filter(ReadBitmap.user_id == user_id, ReadBitmap.manga_id.in_(manga_ids))
+    return {manga_id: decode(data) for manga_id, data in rows}
+
+
+def update_bits(changes):
+    """
+    Applique des modifications {(user_id, manga_id): (bits à ajouter, bits à retirer)}
+    dans la transaction courante, sans la valider. Retourne {(user_id, manga_id): bits}.
+
+    L'insertion préalable des lignes manquantes pose le verrou d'écriture SQLite :
+    la lecture puis la réécriture des bitmaps ne peuvent pas perdre de mise à jour.
+    """
+    if not changes:
+        return {}
+    now = datetime.utcnow()
+    db.session.execute(
+        insert(ReadBitmap).on_conflict_do_nothing(index_elements=['user_id', 'manga_id']),
+        [{"user_id": u, "manga_id": m, "bits": b"", "read_count": 0, "updated_at": now} for (u, m) in changes]
+    )
+    result = {}
+    by_user = {}
+    for user_id, manga_id in changes:
+        by_user.setdefault(user_id, []).append(manga_id)
+    for user_id, manga_ids in by_user.items():
+        current = load_bits_many(user_id, manga_ids)
+        for manga_id in manga_ids:
+            add, remove = changes[(user_id, manga_id)]
+            result[(user_id, manga_id)] = (current.get(manga_id, 0) | add) & ~remove
+    table = ReadBitmap.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.user_id == db.bindparam("b_user"), table.c.manga_id == db.bindparam("b_manga"))
+        .values(bits=db.bindparam("b_bits"), read_count=db.bindparam("b_count"), updated_at=now),
+        [{"b_user": u, "b_manga": m, "b_bits": encode(bits), "b_count": bits.bit_count()}
+         for (u, m), bits in result.items()]
+    )
+    return result
+
+
+def mark_read(user_id, manga_id, ordinals):
+    bits = update_bits({(user_id, manga_id): (ordinals_mask(ordinals), 0)})[(user_id, manga_id)]
+    db.session.commit()
+    return bits
+
+
+def mark_range(user_id, manga_id, first, last, read=True):
+    """Marque (ou démarque) comme lus les chapitres d'ordinaux first..last."""
+    mask = range_mask(first, last)
+    if read:
+        mask &= manga_chapters(manga_id)[0]  # Pas de bit pour un ordinal sans chapitre
+    change = (mask, 0) if read else (0, mask)
+    bits = update_bits({(user_id, manga_id): change})[(user_id, manga_id)]
+    db.session.commit()
+    return bits
+
+
+def mark_chapters(user_id, manga_id, first=None, last=None, read=True):
+    """
+    Marque (ou démarque) comme lus, en une seule écriture, les chapitres existants
+    d'ordinaux first..last (None : début ou fin du manga).
+    Retourne {"read_count", "unread_count", "first_unread"} après modification.
+    """
+    invalidate_chapters(manga_id)  # Un chapitre a pu être ajouté par un autre processus
+    chapters_mask, names = manga_chapters(manga_id)
+    first = 0 if first is None else first
+    last = chapters_mask.bit_length() - 1 if last is None else last
+    bits = mark_range(user_id, manga_id, first, last, read=read) if chapters_mask else 0
+    return {
+        "read_count": (bits & chapters_mask).bit_count(),
+        "unread_count": unread_count(bits, chapters_mask),
+        "first_unread": names.get(first_unread(bits, chapters_mask)),
+    }
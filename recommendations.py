@@ -0,0 +1,273 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, Favorite, ReadingHistory, MangaSimilarity, UserRecommendation
+from cache import TTLCache
+
+READ_WEIGHT = 1.0        # L'utilisateur a lu au moins un chapitre
+FAVORITE_WEIGHT = 2.0    # L'utilisateur a mis le manga en favori
+NEIGHBOURS_K = 20        # Voisins conservés par manga
+USER_RECS_N = 20         # Recommandations conservées par utilisateur
+MAX_PAIRS_PER_BATCH = 20_000_000   # Borne mémoire du calcul des co-occurrences
+USERS_PER_CHUNK = 4096
+INSERT_BATCH = 5000
+
+_similar_cache = TTLCache(ttl=3600, maxsize=2048)
+
+
+# --- Calcul (NumPy pur, sans base de données) -------------------------------
+
+def build_matrix(user_ids, manga_ids, weights):
+    """
+    Construit la matrice creuse utilisateurs × mangas au format CSR à partir
+    de triplets (user_id, manga_id, poids) ; les doublons sont additionnés.
+    Retourne un dict avec les tableaux CSR et les correspondances d'index.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    manga_ids = np.asarray(manga_ids, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    users, user_idx = np.unique(user_ids, return_inverse=True)
+    items, item_idx = np.unique(manga_ids, return_inverse=True)
+    n_items = len(items)
+
+    keys, inverse = np.unique(user_idx * n_items + item_idx, return_inverse=True)
+    values = np.bincount(inverse, weights=weights)
+    rows, cols = keys // n_items, keys % n_items  # déjà triés par utilisateur
+    indptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(users)), out=indptr[1:])
+    return {
+        "users": users, "items": items,
+        "indptr": indptr, "rows": rows, "cols": cols, "values": values,
+    }
+
+
+def _item_batches(matrix, max_pairs):
+    """Découpe les mangas en lots dont le nombre de paires co-lues tient dans max_pairs."""
+    n_items = len(matrix["items"])
+    user_len = np.diff(matrix["indptr"])
+    cost = np.bincount(matrix["cols"], weights=user_len[matrix["rows"]], minlength=n_items)
+    start, acc = 0, 0.0
+    for item in range(n_items):
+        if acc and acc + cost[item] > max_pairs:
+            yield start, item
+            start, acc = item, 0.0
+        acc += cost[item]
+    if start < n_items:
+        yield start, n_items
+
+
+def compute_item_neighbours(matrix, k=NEIGHBOURS_K, max_pairs=MAX_PAIRS_PER_BATCH):
+    """
+    Similarité cosinus item-item calculée par lots de mangas : pour chaque lot,
+    on génère (de façon vectorisée) les paires de mangas lus par un même
+    utilisateur, puis on agrège avec bincount. Retourne (voisins, scores), deux
+    tableaux n_items × k (voisin = -1 si absent).
+    """
+    indptr, rows, cols, values = matrix["indptr"], matrix["rows"], matrix["cols"], matrix["values"]
+    n_items = len(matrix["items"])
+    k = min(k, max(n_items - 1, 0))
+    neighbours = np.full((n_items, k), -1, dtype=np.int64)
+    scores = np.zeros((n_items, k), dtype=np.float64)
+    if k == 0:
+        return neighbours, scores
+
+    norms = np.sqrt(np.bincount(cols, weights=values ** 2, minlength=n_items))
+    user_len = np.diff(indptr)
+
+    for b0, b1 in _item_batches(matrix, max_pairs):
+        entries = np.nonzero((cols >= b0) & (cols < b1))[0]
+        counts = user_len[rows[entries]]
+        total = int(counts.sum())
+        left = np.repeat(entries, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        right = np.repeat(indptr[rows[entries]], counts) + offsets
+
+        size = b1 - b0
+        gram = np.bincount(
+            (cols[left] - b0) * n_items + cols[right],
+            weights=values[left] * values[right],
+            minlength=size * n_items
+        ).reshape(size, n_items)
+        denominator = np.outer(norms[b0:b1], norms)
+        cosine = np.divide(gram, denominator, out=np.zeros_like(gram), where=denominator > 0)
+        cosine[np.arange(size), np.arange(b0, b1)] = 0.0  # pas de similarité avec soi-même
+
+        top = np.argpartition(-cosine, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(cosine, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top[top_scores <= 0] = -1
+        neighbours[b0:b1], scores[b0:b1] = top, np.maximum(top_scores, 0)
+    return neighbours, scores
+
+
+def compute_user_recommendations(matrix, neighbours, scores, n=USER_RECS_N, chunk=USERS_PER_CHUNK):
+    """
+    Recommandations par utilisateur : somme pondérée des voisins des mangas
+    déjà lus, en excluant ceux-ci. Les utilisateurs sont traités par paquets.
+    Retourne des tableaux (index utilisateur, index manga, score, rang).
+    """
+    indptr, rows, cols, values = matrix["indptr"], matrix["rows"], matrix["cols"], matrix["values"]
+    n_users, n_items = len(matrix["users"]), len(matrix["items"])
+    out_users, out_items, out_scores, out_ranks = [], [], [], []
+    if neighbours.shape[1] == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64), empty
+
+    for a in range(0, n_users, chunk):
+        b = min(a + chunk, n_users)
+        e0, e1 = indptr[a], indptr[b]
+        if e0 == e1:
+            continue
+        local_users, own_items, own_values = rows[e0:e1] - a, cols[e0:e1], values[e0:e1]
+
+        cand_items = neighbours[own_items].ravel()
+        cand_scores = (own_values[:, None] * scores[own_items]).ravel()
+        cand_users = np.repeat(local_users, neighbours.shape[1])
+        keys = cand_users * n_items + cand_items
+        valid = (cand_items >= 0) & (cand_scores > 0) & ~np.isin(keys, local_users * n_items + own_items)
+        if not valid.any():
+            continue
+
+        keys, inverse = np.unique(keys[valid], return_inverse=True)
+        summed = np.bincount(inverse, weights=cand_scores[valid])
+        users_of, items_of = keys // n_items, keys % n_items
+        order = np.lexsort((-summed, users_of))
+        users_of, items_of, summed = users_of[order], items_of[order], summed[order]
+        first = np.r_[0, np.nonzero(np.diff(users_of))[0] + 1]
+        rank = np.arange(len(users_of)) - np.repeat(first, np.diff(np.r_[first, len(users_of)]))
+        keep = rank < n
+        out_users.append(users_of[keep] + a)
+        out_items.append(items_of[keep])
+        out_scores.append(summed[keep])
+        out_ranks.append(rank[keep])
+
+    if not out_users:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64), empty
+    return (np.concatenate(out_users), np.concatenate(out_items),
+            np.concatenate(out_scores), np.concatenate(out_ranks))
+
+
+# --- Accès base de données ---------------------------------------------------
+
+def _load_interactions(user_ids=None):
+    """(user_id, manga_id, poids) depuis ReadingHistory et Favorite."""
+    history = db.session.query(ReadingHistory.user_id, ReadingHistory.manga_id).distinct()
+    favorites = db.session.query(Favorite.user_id, Favorite.manga_id)
+    if user_ids is not None:
+        history = history.filter(ReadingHistory.user_id.in_(user_ids))
+        favorites = favorites.filter(Favorite.user_id.in_(user_ids))
+    history, favorites = history.all(), favorites.all()
+    users = [u for u, _ in history] + [u for u, _ in favorites]
+    mangas = [m for _, m in history] + [m for _, m in favorites]
+    weights = [READ_WEIGHT] * len(history) + [FAVORITE_WEIGHT] * len(favorites)
+    return users, mangas, weights
+
+
+def _insert_rows(model, rows):
+    for start in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(insert(model), rows[start:start + INSERT_BATCH])
+
+
+def _store_user_recommendations(matrix, neighbours, scores, user_ids=None):
+    rec_users, rec_items, rec_scores, rec_ranks = compute_user_recommendations(matrix, neighbours, scores)
+    if user_ids is None:
+        UserRecommendation.query.delete(synchronize_session=False)
+    else:
+        UserRecommendation.query.filter(UserRecommendation.user_id.in_(user_ids)).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    users, items = matrix["users"], matrix["items"]
+    _insert_rows(UserRecommendation, [
+        {"user_id": int(users[u]), "manga_id": int(items[i]), "score": float(s), "rank": int(r), "computed_at": now}
+        for u, i, s, r in zip(rec_users, rec_items, rec_scores, rec_ranks)
+    ])
+    return len(rec_users)
+
+
+def rebuild_recommendations():
+    """Reconstruction complète : voisins de chaque manga puis recommandations de tous les utilisateurs."""
+    users, mangas, weights = _load_interactions()
+    if not users:
+        return {"mangas": 0, "users": 0}
+    matrix = build_matrix(users, mangas, weights)
+    neighbours, scores = compute_item_neighbours(matrix)
+
+    MangaSimilarity.query.delete(synchronize_session=False)
+    items = matrix["items"]
+    rows = []
+    for i in range(len(items)):
+        for rank, (j, score) in enumerate(zip(neighbours[i], scores[i])):
+            if j >= 0:
+                rows.append({"manga_id": int(items[i]), "similar_id": int(items[j]), "score": float(score), "rank": rank})
+    _insert_rows(MangaSimilarity, rows)
+    nb_recs = _store_user_recommendations(matrix, neighbours, scores)
+    db.session.commit()
+    _similar_cache.clear()
+    return {"mangas": len(items), "users": len(matrix["users"]), "similarities": len(rows), "recommendations": nb_recs}
+
+
+def _stale_user_ids():
+    """Utilisateurs ayant lu ou ajouté un favori depuis leur dernier calcul."""
+    last = select(func.max(UserRecommendation.computed_at))\
+        .where(UserRecommendation.user_id == ReadingHistory.user_id).scalar_subquery()
+    stale = {u for (u,) in db.session.query(ReadingHistory.user_id).distinct()
+             .filter(or_(last.is_(None), ReadingHistory.last_read_at > last))}
+    last_fav = select(func.max(UserRecommendation.computed_at))\
+        .where(UserRecommendation.user_id == Favorite.user_id).scalar_subquery()
+    stale |= {u for (u,) in db.session.query(Favorite.user_id).distinct()
+              .filter(or_(last_fav.is_(None), Favorite.created_at > last_fav))}
+    return sorted(stale)
+
+
+def refresh_recommendations():
+    """
+    Rafraîchissement incrémental : recalcule seulement les recommandations des
+    utilisateurs actifs depuis le dernier calcul, à partir des voisins stockés.
+    """
+    stale = _stale_user_ids()
+    if not stale:
+        return {"users": 0}
+    users, mangas, weights = _load_interactions(stale)
+    matrix = build_matrix(users, mangas, weights)
+
+    # Voisins stockés, réindexés sur les mangas de la matrice (+ mangas voisins inconnus)
+    similarities = db.session.query(MangaSimilarity.manga_id, MangaSimilarity.similar_id,
+                                    MangaSimilarity.score, MangaSimilarity.rank)\
+        .filter(MangaSimilarity.manga_id.in_(matrix["items"].tolist())).all()
+    extra = sorted({s for _, s, _, _ in similarities} - set(matrix["items"].tolist()))
+    items = np.concatenate([matrix["items"], np.asarray(extra, dtype=np.int64)])
+    position = {int(m): idx for idx, m in enumerate(items)}
+    neighbours = np.full((len(items), NEIGHBOURS_K), -1, dtype=np.int64)
+    scores = np.zeros((len(items), NEIGHBOURS_K), dtype=np.float64)
+    for manga_id, similar_id, score, rank in similarities:
+        if rank < NEIGHBOURS_K:
+            neighbours[position[manga_id], rank] = position[similar_id]
+            scores[position[manga_id], rank] = score
+    matrix = dict(matrix, items=items)
+
+    nb_recs = _store_user_recommendations(matrix, neighbours, scores, user_ids=stale)
+    db.session.commit()
+    return {"users": len(stale), "recommendations": nb_recs}
+
+
+def get_similar_mangas(manga_id, limit=6):
+    """Noms des mangas « lus aussi par les lecteurs de » manga_id (table précalculée)."""
+    names = _similar_cache.get(manga_id)
+    if names is None:
+        names = [name for (name,) in db.session.query(Manga.name)
+                 .join(MangaSimilarity, MangaSimilarity.similar_id == Manga.id)
+                 .filter(MangaSimilarity.manga_id == manga_id)
+                 .order_by(MangaSimilarity.rank).limit(NEIGHBOURS_K)]
+        _similar_cache.set(manga_id, names)
+    return names[:limit]
+
+
+def get_user_recommendations(user_id, limit=12):
+    """Noms des mangas recommandés pour l'utilisateur (table précalculée)."""
+    return [name for (name,) in db.session.query(Manga.name)
+            .join(UserRecommendation, UserRecommendation.manga_id == Manga.id)
+            .filter(UserRecommendation.user_id == user_id)
+            .order_by(UserRecommendation.rank).limit(limit)]
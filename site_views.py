@@ -0,0 +1,840 @@
+import mimetypes
+import os
+import re
+from datetime import datetime
+from flask import (Blueprint, render_template, send_from_directory, request, redirect, url_for, flash, abort,
+                   jsonify, Response, current_app)
+from flask_login import login_required, current_user
+from flask_mail import Message
+from werkzeug.wsgi import wrap_file
+from config import MANGAS_DIR
+from extensions import mail
+from models import db, Manga, Chapter, Favorite, Comment
+from blobstore import BLOB_NAME_RE, blob_path
+from cache import file_fingerprint, IMMUTABLE_MAX_AGE
+from cbz import (build_cbz, chapter_pages, chapter_names, archive_path, archive_index, is_chapter_dir, is_archived,
+                 send_media_file, send_archive)
+from catalog import (get_source, get_cover_url, compute_badges, _get_manga_details_from_fs, get_recent_chapters,
+                     media_url, page_url)
+from comments import get_comments_page, get_user_votes, invalidate_comments, comment_to_json
+from reactions import record_vote, VOTE_CHANGED, VOTE_UNCHANGED
+from ratings import submit_rating, anonymous_fingerprint, average_rating, get_top_rated
+from trending import trending
+from recommendations import get_similar_mangas, get_user_recommendations
+from progress import progress_tracker, get_continue_reading
+from feed import get_new_chapters_feed, invalidate_user_feed
+from events import event_hub, publish, HubFull, TOPIC_RE
+from ratelimit import rate_limiter
+from notifications import get_inbox_page, unread_count as unread_notifications_count, mark_all_read
+from readmarks import (manga_chapters, load_bits, mark_read, mark_chapters,
+                       is_read as is_chapter_read, unread_count, first_unread)
+
+bp = Blueprint('site', __name__)
+
+
+@bp.route("/")
+def index():
+    source = get_source()
+    search_query = request.args.get("q", "").lower()
+
+    mangas_data = []
+    if source == "db":
+        mangas_db = Manga.query.all()
+        for m in mangas_db:
+            cover_url = get_cover_url(m.name)
+
+            manga_dict = {
+                "name": m.name,
+                "cover": cover_url,
+                "syllabus": m.syllabus,
+                "date_added": (
+                    m.date_added if isinstance(m.date_added, int)
+                    else int(m.date_added) if isinstance(m.date_added, str) and m.date_added.strip() != ""
+                    else int(m.date_added.timestamp()) if hasattr(m.date_added, "timestamp")
+                    else 0
+                ),
+                "category": m.category,
+                "author": m.author,
+                "year": m.year,
+                "rating": average_rating(m),
+                "rating_count": m.rating_count or 0,
+                "nb_chapitres": len(getattr(m, "chapters", [])),
+                "cover_filename": m.cover_filename,
+                "views": m.views or 0,
+                # Badges manuels
+                "is_hot_manual": m.is_hot,
+                "is_new_manual": m.is_new,
+                "is_top_manual": m.is_top,
+            }
+            # Badges automatiques
+            auto_badges = compute_badges(manga_dict.copy())
+            manga_dict["is_hot_auto"] = auto_badges["is_hot"]
+            manga_dict["is_new_auto"] = auto_badges["is_new"]
+            manga_dict["is_top_auto"] = auto_badges["is_top"]
+
+            mangas_data.append(manga_dict)
+        now = datetime.utcnow()
+        chapters_db = Chapter.query.order_by(Chapter.date_added.desc()).limit(32).all()
+        recent_chapters = []
+        manga_ids = [chap.manga_id for chap in chapters_db]
+        mangas_dict = {m.id: m for m in Manga.query.filter(Manga.id.in_(manga_ids)).all()}
+        for chap in chapters_db:
+            manga = mangas_dict.get(chap.manga_id)
+            cover_path = os.path.join(MANGAS_DIR, manga.name, manga.cover_filename) if manga and manga.cover_filename else None
+            cover_url = media_url('site.serve_manga_file', cover_path, manga=manga.name, filename=manga.cover_filename) if manga and manga.cover_filename and cover_path and os.path.exists(cover_path) else url_for('static', filename='default-cover.jpg')
+            recent_chapters.append({
+                "manga_name": manga.name if manga else "",
+                "chapter_folder": chap.name,
+                "date_added": chap.date_added,
+                "cover": cover_url,
+                "chapter_title": chap.name,
+                "is_hot_auto": trending.is_hot(manga.name) if manga else False,
+                "is_new_auto": (now - datetime.fromtimestamp(chap.date_added)).days < 7 if chap.date_added else False,
+                # Ajoute aussi les badges manuels du manga
+                "is_hot_manual": manga.is_hot if manga else False,
+                "is_new_manual": manga.is_new if manga else False,
+                "is_top_manual": manga.is_top if manga else False,
+            })
+        recent_chapters_7j = [
+            chap for chap in recent_chapters
+            if chap.get('date_added') and (now - datetime.fromtimestamp(chap['date_added'])).days < 7
+        ]
+    else:
+        mangas_data = [
+            _get_manga_details_from_fs(manga_name_fs)
+            for manga_name_fs in os.listdir(MANGAS_DIR)
+            if os.path.isdir(os.path.join(MANGAS_DIR, manga_name_fs))
+        ]
+        mangas_data = [m for m in mangas_data if m is not None]
+        mangas_data = [compute_badges(m) for m in mangas_data]
+        # Pour le mode fichiers, les badges sont tous auto
+        for m in mangas_data:
+            m["is_hot_manual"] = False
+            m["is_new_manual"] = False
+            m["is_top_manual"] = False
+            m["is_hot_auto"] = m["is_hot"]
+            m["is_new_auto"] = m["is_new"]
+            m["is_top_auto"] = m["is_top"]
+        recent_chapters = get_recent_chapters()
+
+    # Recherche (après les badges)
+    if search_query:
+        mangas_data = [m for m in mangas_data if search_query in m["name"].lower() or search_query in m["author"].lower() or search_query in m["category"].lower()]
+
+    mangas_recents = sorted(
+        mangas_data,
+        key=lambda m: m["date_added"],
+        reverse=True
+    )[:6]
+
+    # Populaires : les plus lus sur 7 jours d'après le moteur de tendances
+    mangas_by_name = {m["name"]: m for m in mangas_data}
+    popular_mangas = [mangas_by_name[p["name"]] for p in trending.top("popular", 8) if p["name"] in mangas_by_name]
+    if not popular_mangas:
+        # Pas encore d'activité enregistrée : on retombe sur le total des vues
+        popular_mangas = sorted(mangas_data, key=lambda m: m.get("views", 0), reverse=True)[:8]
+
+    # Mieux notés : classement bayésien précalculé
+    top_mangas = []
+    # Pour vous : recommandations précalculées à partir de l'historique et des favoris
+    recommended_mangas = []
+    # Continuer la lecture : dernières positions enregistrées par le lecteur
+    continue_reading = []
+    # Nouveaux chapitres non lus des favoris
+    favorites_feed = []
+    if source == "db":
+        top_mangas = [mangas_by_name[t["name"]] for t in get_top_rated()["ranking"] if t["name"] in mangas_by_name]
+        if current_user.is_authenticated:
+            recommended_mangas = [mangas_by_name[name] for name in get_user_recommendations(current_user.id, 8) if name in mangas_by_name]
+            if progress_tracker.has_pending(current_user.id):
+                progress_tracker.flush()
+            continue_reading = [
+                dict(entry, cover=get_cover_url(entry["manga"]))
+                for entry in get_continue_reading(current_user.id, 8)
+            ]
+            favorites_feed = get_new_chapters_feed(current_user.id, 10)
+
+    return render_template(
+        "index.html",
+        mangas=mangas_data,
+        mangas_recents=mangas_recents,
+        popular_mangas=popular_mangas,
+        top_mangas=top_mangas,
+        recommended_mangas=recommended_mangas,
+        continue_reading=continue_reading,
+        favorites_feed=favorites_feed,
+        recent_chapters=recent_chapters,
+        q=search_query,
+        source=source,
+        recent_chapters_7j=recent_chapters_7j,
+        now=now
+    )
+
+@bp.route('/derniers-chapitres')
+def derniers_chapitres():
+    source = get_source()
+    if source == "db":
+        now = datetime.utcnow()
+        chapters_db = Chapter.query.order_by(Chapter.date_added.desc()).limit(32).all()
+        recent_chapters = []
+        manga_ids = [chap.manga_id for chap in chapters_db]
+        mangas_dict = {m.id: m for m in Manga.query.filter(Manga.id.in_(manga_ids)).all()}
+
+        for chap in chapters_db:
+            if chap.date_added or (now - datetime.fromtimestamp(chap.date_added)).days < 7:
+                manga = mangas_dict.get(chap.manga_id)
+                recent_chapters.append({
+                    "manga_name": manga.name if manga else "",
+                    "chapter_folder": chap.name,
+                    "date_added": chap.date_added,
+                    "cover": get_cover_url(manga.name) if manga else url_for('static', filename='default-cover.jpg'),
+                    "chapter_title": chap.name,
+                    "is_hot": trending.is_hot(manga.name) if manga else False,
+                    "is_new": (now - datetime.fromtimestamp(chap.date_added)).days < 7 if chap.date_added else False
+                })
+    else:
+        recent_chapters = get_recent_chapters()
+    return render_template('derniers_chapitres.html', recent_chapters=recent_chapters)
+
+@bp.route("/autocomplete")
+def autocomplete():
+    query = request.args.get("q", "").lower()
+    all_mangas_data = [
+        _get_manga_details_from_fs(manga_name_fs)
+        for manga_name_fs in os.listdir(MANGAS_DIR)
+        if os.path.isdir(os.path.join(MANGAS_DIR, manga_name_fs))
+    ]
+    all_mangas_data = [m for m in all_mangas_data if m is not None]
+    results = [
+        m["name"] for m in all_mangas_data
+        if query in m["name"].lower()
+    ][:8]
+    return {"results": results}
+
+@bp.route("/annuaire")
+def annuaire():
+    categorie = request.args.get("categorie")
+    lettre = request.args.get("lettre")
+    source = get_source()
+    if source == "db":
+        mangas_db = Manga.query.all()
+        all_mangas_data = []
+        for m in mangas_db:
+            manga_dict = {
+                "name": m.name,
+                "cover": get_cover_url(m.name),
+                "syllabus": m.syllabus,
+                "date_added": m.date_added,
+                "category": m.category,
+                "author": m.author,
+                "year": m.year,
+                "rating": average_rating(m),
+                "rating_count": m.rating_count or 0,
+                "nb_chapitres": len(getattr(m, "chapters", [])),
+                "is_hot_manual": m.is_hot,
+                "is_new_manual": m.is_new,
+                "is_top_manual": m.is_top,
+            }
+            auto_badges = compute_badges(manga_dict.copy())
+            manga_dict["is_hot_auto"] = auto_badges["is_hot"]
+            manga_dict["is_new_auto"] = auto_badges["is_new"]
+            manga_dict["is_top_auto"] = auto_badges["is_top"]
+            all_mangas_data.append(manga_dict)
+    else:
+        all_mangas_data = []
+        for m in os.listdir(MANGAS_DIR):
+            manga = _get_manga_details_from_fs(m)
+            if manga:
+                manga = compute_badges(manga)
+                all_mangas_data.append(manga)
+    all_mangas_data = [m for m in all_mangas_data if m is not None]
+
+    # Filtrage par catégorie
+    if categorie:
+        all_mangas_data = [m for m in all_mangas_data if m.get('category', 'Toutes') == categorie]
+
+    # Filtrage par lettre
+    if lettre:
+        all_mangas_data = [m for m in all_mangas_data if m["name"].upper().startswith(lettre.upper())]
+
+    # Indexation alphabetique
+    lettres = sorted({m["name"][0].upper() for m in all_mangas_data if m["name"]})
+
+    # Liste des catégories
+    categories = sorted({m.get('category', 'Toutes') for m in all_mangas_data})
+
+    mangas_sorted = sorted(all_mangas_data, key=lambda m: m['name'].lower())
+
+    return render_template(
+        "annuaire.html",
+        mangas=mangas_sorted,
+        categories=categories,
+        selected_category=categorie,
+        lettres=lettres,
+        selected_lettre=lettre
+    )
+
+@bp.route('/contact', methods=['GET', 'POST'])
+@rate_limiter.limit("3/hour", methods=("POST",))
+def contact():
+    if request.method == 'POST':
+        email = request.form.get('email')
+        message = request.form.get('message')
+        if not email or not message or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
+            flash("Veuillez remplir tous les champs avec un email valide.", "danger")
+            return redirect(url_for('site.contact'))
+
+        msg = Message(
+            subject="Nouveau message d'un utilisateur de Yomi-Scan",
+            sender=email,
+            reply_to=email,
+            recipients=[current_app.config['MAIL_USERNAME']],
+            body=f"Message de : {email}\n\n{message}"
+        )
+        try:
+            mail.send(msg)
+            flash("Votre message a bien été envoyé. Merci !", "success")
+        except Exception as e:
+            flash("Erreur lors de l'envoi du message. Veuillez réessayer plus tard.", "danger")
+    return render_template('contact.html')
+
+@bp.route("/manga/<manga_name>/<chapter_name>")
+def reader(manga_name, chapter_name):
+    chapter_dir = os.path.join(MANGAS_DIR, manga_name, chapter_name)
+    images = chapter_pages(chapter_dir)
+    if not images:
+        return render_template("erreur_chapitre.html", manga_name=manga_name, chapter_name=chapter_name), 404
+
+    # Compte la lecture pour les tendances (mise en tampon, pas d'écriture immédiate)
+    trending.record_read(manga_name)
+
+    # Marquer le chapitre comme "lu" et l'ajouter à l'historique (écriture différée, par lots)
+    if current_user.is_authenticated:
+        progress_tracker.record(current_user.id, manga_name, chapter_name)
+        progress_tracker.record_position(current_user.id, manga_name, chapter_name, request.args.get("page", 0, type=int))
+    # Récupère la liste des chapitres pour ce manga
+    chapters = sorted(
+        chapter_names(os.path.join(MANGAS_DIR, manga_name)),
+        key=lambda x: (0, int(re.findall(r'\d+', x)[0])) if re.findall(r'\d+', x) else (1, x.lower())
+    )
+    try:
+        idx = chapters.index(chapter_name)
+    except ValueError:
+        idx = -1
+    prev_chapter = url_for('site.reader', manga_name=manga_name, chapter_name=chapters[idx-1]) if idx > 0 else None
+    next_chapter = url_for('site.reader', manga_name=manga_name, chapter_name=chapters[idx+1]) if idx != -1 and idx < len(chapters)-1 else None
+    # Reprise à une page précise (lien « Continuer la lecture »)
+    start_page = min(max(request.args.get("page", 0, type=int), 0), len(images) - 1)
+
+    if is_chapter_dir(chapter_dir):
+        image_urls = [page_url(manga_name, chapter_name, image) for image in images]
+    else:
+        # Chapitre en archive : une seule empreinte (celle de l'archive) pour toutes les pages
+        fingerprint = file_fingerprint(archive_path(chapter_dir))
+        image_urls = [media_url('site.manga_image', manga_name=manga_name, chapter_name=chapter_name,
+                                filename=image, v=fingerprint) for image in images]
+
+    return render_template(
+        "reader.html",
+        manga_name=manga_name,
+        chapter_name=chapter_name,
+        images=images,
+        image_urls=image_urls,
+        start_page=start_page,
+        prev_chapter=prev_chapter,
+        next_chapter=next_chapter,
+        all_chapters=chapters
+    )
+
+@bp.route("/mangas/<manga_name>/<chapter_name>/<filename>")
+def manga_image(manga_name, chapter_name, filename):
+    chapter_dir = os.path.join(MANGAS_DIR, manga_name, chapter_name)
+    if is_chapter_dir(chapter_dir):
+        return _send_media(chapter_dir, filename)
+    return _send_archive_page(archive_path(chapter_dir), filename)
+
+@bp.route("/manga/<manga_name>")
+def manga(manga_name):
+    source = get_source()
+    page = int(request.args.get("page", 1))
+    per_page = 10
+
+    if source == "db":
+        manga_obj = Manga.query.filter_by(name=manga_name).first_or_404()
+
+        # Incrémenter les vues (mises en tampon et écrites par lots par le moteur de tendances)
+        trending.record_view(manga_obj.name)
+
+        # Récupérer les chapitres
+        chapters = Chapter.query.filter_by(manga_id=manga_obj.id).order_by(Chapter.date_added.desc()).all()
+        # Chapitres lus : la bitmap de l'utilisateur + les lectures encore en tampon
+        read_bits = 0
+        if current_user.is_authenticated:
+            read_bits = load_bits(current_user.id, manga_obj.id)
+            pending = progress_tracker.pending_chapters(current_user.id, manga_obj.name)
+            for chap in chapters:
+                if chap.name in pending and chap.ordinal is not None:
+                    read_bits |= 1 << chap.ordinal
+        chapters_data = []
+        for chap in chapters:
+            chapter_read = is_chapter_read(read_bits, chap.ordinal)
+
+            chapters_data.append({
+                "folder": chap.name,
+                "display": getattr(chap, 'display_name', chap.name),
+                "date_added": chap.date_added,
+                "is_new_auto": (datetime.utcnow() - datetime.fromtimestamp(chap.date_added)).days < 7 if chap.date_added else False,
+                "is_hot_auto": getattr(chap, 'nb_lectures_recent', 0) > 100,
+                "is_top_auto": False,  # Non applicable par chapitre
+                "is_read": chapter_read
+            })
+
+        # Pagination des chapitres
+        total = len(chapters_data)
+        start = (page - 1) * per_page
+        end = start + per_page
+        chapters_paginated = chapters_data[start:end]
+        total_pages = (total + per_page - 1) // per_page
+
+        manga_data = {
+            "id": manga_obj.id,
+            "name": manga_obj.name,
+            "cover": get_cover_url(manga_obj.name),
+            "syllabus": manga_obj.syllabus,
+            "category": manga_obj.category,
+            "author": manga_obj.author,
+            "year": manga_obj.year,
+            "rating": average_rating(manga_obj),
+            "rating_count": manga_obj.rating_count or 0,
+            "avg_rating": average_rating(manga_obj) if manga_obj.rating_count else "Non noté",
+            "date_added": manga_obj.date_added,
+            "views": manga_obj.views,
+            "status": manga_obj.status,
+            "is_hot_manual": manga_obj.is_hot,
+            "is_new_manual": manga_obj.is_new,
+            "is_top_manual": manga_obj.is_top
+        }
+
+        # Reprise de la lecture : chapitres restants et premier chapitre non lu
+        if current_user.is_authenticated:
+            chapters_mask, ordinal_names = manga_chapters(manga_obj.id)
+            next_ordinal_unread = first_unread(read_bits, chapters_mask)
+            manga_data["unread_count"] = unread_count(read_bits, chapters_mask)
+            manga_data["first_unread"] = ordinal_names.get(next_ordinal_unread)
+
+        # Calcul des badges automatiques
+        auto_badges = compute_badges(manga_data.copy())
+        manga_data["is_hot_auto"] = auto_badges["is_hot"]
+        manga_data["is_new_auto"] = auto_badges["is_new"]
+        manga_data["is_top_auto"] = auto_badges["is_top"]
+
+        # Vérifier si le manga est dans les favoris
+        is_fav = False
+        if current_user.is_authenticated:
+            is_fav = Favorite.query.filter_by(user_id=current_user.id, manga_id=manga_obj.id).first() is not None
+        manga_data["is_favorite"] = is_fav
+
+        # Les lecteurs ont aussi lu (voisins précalculés)
+        manga_data["similar"] = [
+            {"name": name, "cover": get_cover_url(name)}
+            for name in get_similar_mangas(manga_obj.id)
+        ]
+
+        # Récupérer la première page des commentaires (auteur chargé dans la même requête)
+        comments_page = get_comments_page(manga_obj.id)
+        manga_data["comments"] = comments_page["comments"]
+        manga_data["comments_next_cursor"] = comments_page["next_cursor"]
+        manga_data["comment_votes"] = get_user_votes(
+            current_user.id if current_user.is_authenticated else None,
+            [c["id"] for c in comments_page["comments"]]
+        )
+
+    else:
+        # Gestion pour le système de fichiers
+        manga_data = _get_manga_details_from_fs(manga_name)
+        if not manga_data:
+            abort(404)
+
+        chapters = sorted(
+            chapter_names(os.path.join(MANGAS_DIR, manga_name)),
+            key=lambda x: x.lower()
+        )
+        total = len(chapters)
+        start = (page - 1) * per_page
+        end = start + per_page
+        total_pages = (total + per_page - 1) // per_page
+
+        # Chapitres lus : même bitmap qu'en mode base, par ordinal des chapitres connus en base
+        manga_data["id"] = db.session.query(Manga.id).filter_by(name=manga_name).scalar()
+        read_bits, ordinals = 0, {}
+        if current_user.is_authenticated and manga_data["id"] is not None:
+            ordinals = {name: ordinal for ordinal, name in manga_chapters(manga_data["id"])[1].items()}
+            read_bits = load_bits(current_user.id, manga_data["id"])
+            for name in progress_tracker.pending_chapters(current_user.id, manga_name):
+                if name in ordinals:
+                    read_bits |= 1 << ordinals[name]
+
+        chapters_paginated = []
+        for chap in chapters[start:end]:
+            is_read = is_chapter_read(read_bits, ordinals.get(chap))
+
+            chapters_paginated.append({
+                'folder': chap,
+                'display': chap,
+                'date_added': None,  # Ajoute une valeur par défaut si non disponible
+                'is_new_auto': False,  # Ajoute une valeur par défaut si non disponible
+                'is_hot_auto': False,  # Ajoute une valeur par défaut si non disponible
+                'is_top_auto': False,  # Ajoute une valeur par défaut si non disponible
+                'is_read': is_read  # Ajout de la logique is_read
+            })
+
+    return render_template(
+        "manga.html",
+        manga_name=manga_data["name"],
+        manga=manga_data,
+        avg_rating=manga_data.get("avg_rating", "Non noté"),
+        chapters=chapters_paginated,
+        page=page,
+        total_pages=total_pages
+    )
+
+@bp.route('/api/trending')
+def api_trending():
+    kind = request.args.get("kind", "trending")
+    if kind not in ("trending", "popular"):
+        abort(400)
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    results = []
+    for entry in trending.top(kind, limit):
+        results.append({
+            "name": entry["name"],
+            "score": entry["score"],
+            "is_hot": trending.is_hot(entry["name"]),
+            "url": url_for('site.manga', manga_name=entry["name"]),
+        })
+    return jsonify({"kind": kind, "results": results})
+
+@bp.route('/api/recommendations')
+@login_required
+def api_recommendations():
+    limit = min(request.args.get("limit", 12, type=int), 20)
+    return jsonify({"results": [
+        {"name": name, "url": url_for('site.manga', manga_name=name)}
+        for name in get_user_recommendations(current_user.id, limit)
+    ]})
+
+@bp.route('/notifications')
+@login_required
+def notifications_inbox():
+    page = get_inbox_page(current_user.id, cursor=request.args.get("cursor"))
+    return render_template('notifications.html', notifications=page["items"], next_cursor=page["next_cursor"])
+
+@bp.route('/api/notifications')
+@login_required
+def api_notifications():
+    page = get_inbox_page(current_user.id, cursor=request.args.get("cursor"))
+    return jsonify({
+        "items": [dict(entry,
+                       updated_at=entry["updated_at"].isoformat() if entry["updated_at"] else None,
+                       url=url_for('site.reader', manga_name=entry["manga"], chapter_name=entry["first_chapter"]))
+                  for entry in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "unread": unread_notifications_count(current_user.id)
+    })
+
+@bp.route('/notifications/read', methods=['POST'])
+@login_required
+def notifications_mark_read():
+    mark_all_read(current_user.id)
+    return redirect(request.referrer or url_for('site.notifications_inbox'))
+
+@bp.route('/events')
+def events_stream():
+    """Flux SSE : topics=chapters (tous les nouveaux chapitres), manga:<id> (chapitres et commentaires)."""
+    topics = [t for t in request.args.get("topics", "chapters").split(",") if TOPIC_RE.match(t)]
+    if not topics:
+        abort(400)
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    backlog = event_hub.replay(topics, last_event_id) if last_event_id is not None else []
+    try:
+        subscription = event_hub.subscribe(topics)
+    except HubFull:
+        return Response("Trop de connexions temps réel.", status=503, headers={"Retry-After": "30"})
+    return Response(event_hub.stream(subscription, backlog), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@bp.route('/api/feed')
+@login_required
+def api_feed():
+    limit = min(request.args.get("limit", 20, type=int), 100)
+    return jsonify({"results": [{
+        "manga": entry["manga"],
+        "chapter": entry["chapter"],
+        "date_added": entry["date_added"],
+        "url": url_for('site.reader', manga_name=entry["manga"], chapter_name=entry["chapter"]),
+    } for entry in get_new_chapters_feed(current_user.id, limit)]})
+
+@bp.route('/api/continue', methods=['GET', 'POST'])
+@login_required
+def api_continue():
+    if request.method == 'POST':
+        # Balise du lecteur (navigator.sendBeacon) : position courante, écrite par lots
+        data = request.get_json(force=True, silent=True) or {}
+        manga_name, chapter_name, page = data.get("manga"), data.get("chapter"), data.get("page")
+        if not manga_name or not chapter_name or not isinstance(page, int) or page < 0:
+            abort(400)
+        progress_tracker.record_position(current_user.id, manga_name, chapter_name, page)
+        return "", 204
+    limit = min(request.args.get("limit", 8, type=int), 50)
+    if progress_tracker.has_pending(current_user.id):
+        progress_tracker.flush()
+    return jsonify({"results": [
+        dict(entry,
+             updated_at=entry["updated_at"].isoformat() if entry["updated_at"] else None,
+             url=url_for('site.reader', manga_name=entry["manga"], chapter_name=entry["chapter"], page=entry["page"]))
+        for entry in get_continue_reading(current_user.id, limit)
+    ]})
+
+@bp.route('/manga/<manga_name>/comments')
+def manga_comments(manga_name):
+    manga_obj = Manga.query.filter_by(name=manga_name).first_or_404()
+    page = get_comments_page(manga_obj.id, cursor=request.args.get("cursor"))
+    votes = get_user_votes(
+        current_user.id if current_user.is_authenticated else None,
+        [c["id"] for c in page["comments"]]
+    )
+    return jsonify({
+        "comments": [comment_to_json(c, votes.get(c["id"])) for c in page["comments"]],
+        "next_cursor": page["next_cursor"]
+    })
+
+@bp.route('/manga/<manga_name>/<chapter_name>/mark_as_read', methods=['POST'])
+@login_required
+def mark_as_read(manga_name, chapter_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    chapter = Chapter.query.filter_by(manga_id=manga.id, name=chapter_name).first_or_404()
+    mark_read(current_user.id, manga.id, [chapter.ordinal])
+    return redirect(url_for('site.manga', manga_name=manga_name))
+
+def _chapter_ordinal(manga_id, chapter_name):
+    if not chapter_name:
+        return None
+    chapter = Chapter.query.filter_by(manga_id=manga_id, name=chapter_name).first_or_404()
+    return chapter.ordinal
+
+def _bulk_mark(manga_name, read):
+    """
+    Paramètres (formulaire ou JSON) : « from » et « to » pour un intervalle de
+    chapitres, « up_to » pour tous les chapitres jusqu'à celui-ci inclus,
+    aucun pour le manga entier.
+    """
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    params = request.get_json(silent=True) or request.form
+    if params.get("up_to"):
+        first, last = None, _chapter_ordinal(manga.id, params["up_to"])
+    else:
+        first = _chapter_ordinal(manga.id, params.get("from"))
+        last = _chapter_ordinal(manga.id, params.get("to"))
+    # Les lectures en tampon ne doivent pas repasser un chapitre démarqué en « lu »
+    if progress_tracker.has_pending(current_user.id):
+        progress_tracker.flush()
+    counts = mark_chapters(current_user.id, manga.id, first, last, read=read)
+    if request.is_json or request.accept_mimetypes.best == "application/json":
+        return jsonify(counts)
+    flash("Chapitres marqués comme lus." if read else "Chapitres marqués comme non lus.", "success")
+    return redirect(request.referrer or url_for('site.manga', manga_name=manga_name))
+
+@bp.route('/manga/<manga_name>/mark_read', methods=['POST'])
+@login_required
+def bulk_mark_as_read(manga_name):
+    return _bulk_mark(manga_name, read=True)
+
+@bp.route('/manga/<manga_name>/mark_unread', methods=['POST'])
+@login_required
+def bulk_mark_as_unread(manga_name):
+    return _bulk_mark(manga_name, read=False)
+
+@bp.route("/mangas/<manga>/<filename>")
+def serve_manga_file(manga, filename):
+    return _send_media(os.path.join(MANGAS_DIR, manga), filename)
+
+@bp.route("/blobs/<name>")
+def serve_blob(name):
+    """Image partagée (stockage par contenu) : son nom est son empreinte, mise en cache sans limite."""
+    if not BLOB_NAME_RE.fullmatch(name):
+        abort(404)
+    path = blob_path(name)
+    response = send_from_directory(os.path.dirname(path), name, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+def _send_media(directory, filename):
+    """Fichier de mangas/ ; mis en cache sans limite quand l'URL porte son empreinte à jour (media_url)."""
+    file_path = os.path.join(directory, filename)
+    fingerprint = file_fingerprint(file_path)
+    if fingerprint is None:
+        return "Fichier introuvable", 404
+    if request.args.get("v") != fingerprint:
+        return send_media_file(directory, filename)
+    response = send_media_file(directory, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+def _send_archive_page(path, filename):
+    """
+    Page d'un chapitre en archive, lue à sa position dans le .cbz : sous gunicorn,
+    envoyée par sendfile depuis l'archive (Content-Length octets), sans copie.
+    """
+    index = archive_index(path)
+    page = index.open(filename) if index else None
+    if page is None:
+        return "Fichier introuvable", 404
+    response = Response(wrap_file(request.environ, page), direct_passthrough=True,
+                        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+    response.content_length = page.size
+    response.last_modified = index.mtime
+    response.set_etag(f"{index.fingerprint}-{filename}")
+    if request.args.get("v") == index.fingerprint:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@bp.route("/manga/<manga_name>/<chapter_name>/download")
+@rate_limiter.limit("10/minute")
+@rate_limiter.limit("60/hour", scope="user")
+def download_chapter(manga_name, chapter_name):
+    chapter_dir = os.path.join(MANGAS_DIR, manga_name, chapter_name)
+    if not is_chapter_dir(chapter_dir):
+        if not is_archived(chapter_dir):
+            return "Chapitre introuvable", 404
+        # Chapitre déjà archivé : le .cbz est envoyé tel quel (sendfile)
+        return send_archive(chapter_dir, f"{chapter_name}.cbz")
+
+    data = build_cbz(chapter_dir)
+    if data is None:
+        return "Aucune image à télécharger", 404
+
+    return (
+        data, 200, {
+            "Content-Type": "application/cbz",
+            "Content-Disposition": f"attachment; filename={chapter_name}.cbz"
+        }
+    )
+
+@bp.route('/manga/<manga_name>/favori', methods=['POST'])
+@login_required
+def toggle_favorite(manga_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    fav = Favorite.query.filter_by(user_id=current_user.id, manga_id=manga.id).first()
+    if fav:
+        # Supprime le favori existant
+        db.session.delete(fav)
+        db.session.commit()
+    else:
+        # Ajoute un nouveau favori
+        new_fav = Favorite(user_id=current_user.id, manga_id=manga.id)
+        db.session.add(new_fav)
+        db.session.commit()
+    invalidate_user_feed(current_user.id)
+    return redirect(url_for('site.manga', manga_name=manga_name))
+
+@bp.route('/manga/<manga_name>/comment', methods=['POST'])
+@login_required
+def add_comment(manga_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    content = request.form.get('content')
+    if not content:
+        flash("Le contenu du commentaire ne peut pas être vide.", "danger")
+        return redirect(url_for('site.manga', manga_name=manga_name))
+    
+    
+    comment = Comment(user_id=current_user.id, manga_id=manga.id, content=content)
+    db.session.add(comment)
+    db.session.flush()
+    publish([f"manga:{manga.id}"], "comment", comment_to_json({
+        "id": comment.id,
+        "content": comment.content,
+        "created_at": comment.created_at,
+        "likes": 0,
+        "dislikes": 0,
+        "reported": False,
+        "username": current_user.username,
+    }))
+    db.session.commit()
+    invalidate_comments(manga.id)
+    flash("Commentaire ajouté.", "success")
+    return redirect(url_for('site.manga', manga_name=manga_name))
+
+@bp.route('/rate_manga/<manga_name>', methods=['POST'])
+@rate_limiter.limit("10/minute")
+def rate_manga(manga_name):
+    manga = Manga.query.filter_by(name=manga_name).first_or_404()
+    # Utilise .get() pour éviter l'erreur KeyError si le champ 'rating' est absent
+    rating_value = request.form.get('rating')
+    if not rating_value:
+        flash("Veuillez fournir une note valide.", "danger")
+        return redirect(url_for('site.manga', manga_name=manga_name))
+    
+    try:
+        value = float(rating_value)
+    except ValueError:
+        flash("La note doit être un nombre valide.", "danger")
+        return redirect(url_for('site.manga', manga_name=manga_name))
+    
+    if not 0 <= value <= 5:
+        flash("La note doit être comprise entre 0 et 5.", "danger")
+        return redirect(url_for('site.manga', manga_name=manga_name))
+
+    # Une seule note par utilisateur (ou par visiteur anonyme) : la nouvelle remplace l'ancienne
+    if current_user.is_authenticated:
+        submit_rating(manga.id, value, user_id=current_user.id)
+    else:
+        fingerprint = anonymous_fingerprint(request.remote_addr, request.headers.get('User-Agent', ''), current_app.config['SECRET_KEY'])
+        submit_rating(manga.id, value, fingerprint=fingerprint)
+    flash("Merci pour votre note !", "success")
+    return redirect(url_for('site.manga', manga_name=manga_name))
+
+@bp.route('/comment/<int:comment_id>/like', methods=['POST'])
+@login_required
+def like_comment(comment_id):
+    result, manga_id = record_vote(current_user.id, comment_id, is_like=True)
+    if result == VOTE_UNCHANGED:
+        flash("Vous avez déjà liké ce commentaire.", "danger")
+    elif manga_id is None:
+        abort(404)
+    else:
+        invalidate_comments(manga_id)
+        if result == VOTE_CHANGED:
+            flash("Votre vote a été changé en like.", "success")
+        else:
+            flash("Commentaire liké.", "success")
+    return redirect(request.referrer or url_for('site.index'))
+
+@bp.route('/comment/<int:comment_id>/dislike', methods=['POST'])
+@login_required
+def dislike_comment(comment_id):
+    result, manga_id = record_vote(current_user.id, comment_id, is_like=False)
+    if result == VOTE_UNCHANGED:
+        flash("Vous avez déjà disliké ce commentaire.", "danger")
+    elif manga_id is None:
+        abort(404)
+    else:
+        invalidate_comments(manga_id)
+        if result == VOTE_CHANGED:
+            flash("Votre vote a été changé en dislike.", "success")
+        else:
+            flash("Commentaire disliké.", "success")
+    return redirect(request.referrer or url_for('site.index'))
+
+@bp.route('/comment/<int:comment_id>/report', methods=['POST'])
+@login_required
+def report_comment(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    comment.reported = True
+    db.session.commit()
+    flash("Commentaire signalé à la modération.", "info")
+    invalidate_comments(comment.manga_id)
+    return redirect(request.referrer or url_for('site.manga'))
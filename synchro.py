@@ -1,8 +1,14 @@
 import os
-from app import app, db
-from models import Manga, Chapter
+import time
+from flask import current_app as app
+from cbz import chapter_names, read_chapter_file
+from config import MANGAS_DIR
+from feed import invalidate_manga_feed
+from models import db, Manga, Chapter
+from readmarks import chapter_sort_key, next_ordinal, invalidate_chapters
+from notifications import fan_out
+from events import publish
 
-MANGAS_DIR = os.path.join(app.root_path, "mangas")
 
 def safe_read(path, default=""):
     try:
@@ -101,15 +107,25 @@ def synchronize_db_and_fs():
         db.session.commit()
 
         # Synchronisation des chapitres
+        new_chapters = {}  # manga_id -> chapitres ajoutés (pour les notifications)
+        changed = set()    # Mangas dont la liste de chapitres a changé
         for manga_name, manga_path in mangas_in_fs.items():
             chapters_in_db = {c.name: c for c in Chapter.query.filter_by(manga_id=mangas_in_db[manga_name].id).all()}
-            chapters_in_fs = {d: os.path.join(manga_path, d) for d in os.listdir(manga_path) if os.path.isdir(os.path.join(manga_path, d))}
+            chapters_in_fs = set(chapter_names(manga_path))  # Dossiers et archives .cbz
 
-            for chapter_name, chapter_path in chapters_in_fs.items():
+            # Les nouveaux chapitres reçoivent les ordinaux suivants, dans l'ordre de lecture
+            for chapter_name in sorted(chapters_in_fs, key=chapter_sort_key):
                 if chapter_name not in chapters_in_db:
-                    # Ajouter le chapitre dans la DB
-                    new_chapter = Chapter(name=chapter_name, manga_id=mangas_in_db[manga_name].id)
+                    # Ajouter le chapitre dans la DB (date du chapitre, sinon maintenant : flux des favoris)
+                    date_added = parse_date_to_timestamp(read_chapter_file(
+                        os.path.join(manga_path, chapter_name), "date_added.txt", "").strip()) or int(time.time())
+                    new_chapter = Chapter(name=chapter_name, manga_id=mangas_in_db[manga_name].id, date_added=date_added,
+                                          ordinal=next_ordinal(mangas_in_db[manga_name].id))
                     db.session.add(new_chapter)
+                    new_chapters.setdefault(mangas_in_db[manga_name].id, []).append(chapter_name)
+                    changed.add(mangas_in_db[manga_name].id)
+                    publish(["chapters", f"manga:{mangas_in_db[manga_name].id}"], "chapter",
+                            {"manga": manga_name, "chapter": chapter_name, "date_added": date_added})
                     print(f"Ajouté dans la DB : {chapter_name} (Manga : {manga_name})")
 
             for chapter_name in chapters_in_db.keys():
@@ -117,10 +133,21 @@ def synchronize_db_and_fs():
                     # Supprimer le chapitre de la DB
                     chapter_to_delete = chapters_in_db[chapter_name]
                     db.session.delete(chapter_to_delete)
+                    changed.add(mangas_in_db[manga_name].id)
                     print(f"Supprimé de la DB : {chapter_name} (Manga : {manga_name})")
 
         db.session.commit()
+        for manga_id in changed:
+            invalidate_chapters(manga_id)
+            invalidate_manga_feed(manga_id)
+
+        # Un seul envoi par manga, regroupant tous ses nouveaux chapitres
+        for manga_id, names in new_chapters.items():
+            notified = fan_out(manga_id, names)
+            print(f"Notifications envoyées : {notified} abonné(s) (manga {manga_id})")
         print("Synchronisation terminée.")
 
 if __name__ == "__main__":
-    synchronize_db_and_fs()
\ No newline at end of file
+    from cli import create_cli_app
+    with create_cli_app().app_context():
+        synchronize_db_and_fs()
@@ -0,0 +1,213 @@
+import atexit
+import math
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Manga, MangaActivity
+
+BUCKET_SECONDS = 3600          # Un seau d'activité par heure
+WINDOW_BUCKETS = 7 * 24        # On garde 7 jours d'historique
+HALF_LIFE_HOURS = 24           # Une lecture perd la moitié de son poids en 24 h
+READ_WEIGHT = 1.0
+VIEW_WEIGHT = 0.25
+HOT_THRESHOLD = 100            # Lectures récentes (pondérées) pour le badge HOT
+FLUSH_INTERVAL = 30            # Secondes entre deux écritures du tampon en base
+RECOMPUTE_INTERVAL = 300       # Secondes entre deux recalculs du classement
+RANKING_SIZE = 50
+
+_EMPTY_SNAPSHOT = {
+    "trending": [],
+    "popular": [],
+    "recent_reads": {},
+    "hot_names": frozenset(),
+    "computed_at": 0,
+}
+
+
+def current_bucket(now=None):
+    return int((now or time.time()) // BUCKET_SECONDS)
+
+
+class TrendingEngine:
+    """
+    Collecte les lectures (reader) et les vues (page manga) en mémoire, les
+    écrit par lots dans manga_activity et recalcule périodiquement, dans un
+    thread de fond, les scores avec décroissance exponentielle.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pending = defaultdict(lambda: [0, 0])  # (nom, seau) -> [lectures, vues]
+        self._lock = threading.Lock()
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self._flush_at_exit)
+
+    # --- Collecte ---------------------------------------------------------
+
+    def record_read(self, manga_name):
+        self._record(manga_name, 0)
+
+    def record_view(self, manga_name):
+        self._record(manga_name, 1)
+
+    def _record(self, manga_name, kind):
+        with self._lock:
+            self._pending[(manga_name, current_bucket())][kind] += 1
+        self._ensure_worker()
+
+    def flush(self):
+        """Écrit le tampon en base : un upsert par seau et un UPDATE groupé des vues."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+        if not pending:
+            return 0
+        names = {name for name, _ in pending}
+        ids = dict(db.session.query(Manga.name, Manga.id).filter(Manga.name.in_(names)).all())
+
+        activity, views = [], defaultdict(int)
+        for (name, bucket), (reads, nb_views) in pending.items():
+            manga_id = ids.get(name)
+            if manga_id is None:
+                continue
+            activity.append({"manga_id": manga_id, "bucket": bucket, "reads": reads, "views": nb_views})
+            views[manga_id] += nb_views
+        if activity:
+            stmt = insert(MangaActivity)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['manga_id', 'bucket'],
+                set_={
+                    "reads": MangaActivity.reads + stmt.excluded.reads,
+                    "views": MangaActivity.views + stmt.excluded.views,
+                }
+            )
+            db.session.execute(stmt, activity)
+        views = [{"b_id": manga_id, "b_views": n} for manga_id, n in views.items() if n]
+        if views:
+            manga_table = Manga.__table__
+            db.session.execute(
+                manga_table.update()
+                .where(manga_table.c.id == bindparam("b_id"))
+                .values(views=func.coalesce(manga_table.c.views, 0) + bindparam("b_views")),
+                views
+            )
+        db.session.commit()
+        return len(activity)
+
+    # --- Classement -------------------------------------------------------
+
+    def prune(self, now=None):
+        """Supprime l'activité sortie de la fenêtre (thread de fond seulement : valide la session)."""
+        oldest = current_bucket(now) - WINDOW_BUCKETS
+        MangaActivity.query.filter(MangaActivity.bucket < oldest).delete(synchronize_session=False)
+        db.session.commit()
+
+    def recompute(self, now=None):
+        """
+        Recalcule les scores de tous les mangas en une passe vectorisée NumPy.
+        Lecture seule, sur sa propre connexion : peut être appelé pendant une
+        requête sans toucher à sa session (ni valider, ni expirer ses objets).
+        """
+        now_bucket = current_bucket(now)
+        oldest = now_bucket - WINDOW_BUCKETS
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(MangaActivity.manga_id, MangaActivity.bucket, MangaActivity.reads, MangaActivity.views)
+                .where(MangaActivity.bucket >= oldest)
+            ).all()
+            ids = sorted({row[0] for row in rows})
+            names = dict(conn.execute(select(Manga.id, Manga.name).where(Manga.id.in_(ids))).all()) if ids else {}
+        if not rows:
+            self._snapshot = dict(_EMPTY_SNAPSHOT, computed_at=time.time())
+            return self._snapshot
+
+        data = np.array(rows, dtype=np.float64)
+        manga_ids, inverse = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+        age = np.maximum(now_bucket - data[:, 1], 0)
+        decay = np.exp(-math.log(2) * age / HALF_LIFE_HOURS)
+        reads, views = data[:, 2], data[:, 3]
+        activity = reads * READ_WEIGHT + views * VIEW_WEIGHT
+
+        trending_scores = np.bincount(inverse, weights=activity * decay)
+        popular_scores = np.bincount(inverse, weights=activity)
+        recent_reads = np.bincount(inverse, weights=reads * decay)
+
+        def _ranking(scores):
+            order = np.argsort(-scores)[:RANKING_SIZE]
+            return [
+                {"name": names[int(manga_ids[i])], "score": round(float(scores[i]), 2)}
+                for i in order if scores[i] > 0 and int(manga_ids[i]) in names
+            ]
+
+        recent = {
+            names[int(manga_id)]: float(value)
+            for manga_id, value in zip(manga_ids, recent_reads) if int(manga_id) in names
+        }
+        self._snapshot = {
+            "trending": _ranking(trending_scores),
+            "popular": _ranking(popular_scores),
+            "recent_reads": recent,
+            "hot_names": frozenset(name for name, value in recent.items() if value > HOT_THRESHOLD),
+            "computed_at": time.time(),
+        }
+        return self._snapshot
+
+    def snapshot(self):
+        """Dernier classement calculé (jamais de requête SQL dans le cas courant)."""
+        if not self._snapshot["computed_at"]:
+            self.recompute()
+            self._ensure_worker()
+        return self._snapshot
+
+    def recent_reads(self, manga_name):
+        return self.snapshot()["recent_reads"].get(manga_name, 0)
+
+    def is_hot(self, manga_name):
+        return manga_name in self.snapshot()["hot_names"]
+
+    def top(self, kind="trending", limit=10):
+        return self.snapshot()[kind][:limit]
+
+    # --- Thread de fond ---------------------------------------------------
+
+    def _ensure_worker(self):
+        if self.app is None or (self._worker and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="trending-worker", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        last_recompute = time.monotonic()
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            with self.app.app_context():
+                try:
+                    self.flush()
+                    if time.monotonic() - last_recompute >= RECOMPUTE_INTERVAL:
+                        self.prune()
+                        self.recompute()
+                        last_recompute = time.monotonic()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Erreur du calcul des tendances : {e}")
+
+    def _flush_at_exit(self):
+        if self.app is None or not self._pending:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            pass
+
+
+trending = TrendingEngine()
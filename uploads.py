@@ -0,0 +1,293 @@
+"""
+Envoi de chapitres par morceaux, reprenable après une coupure (API des vues
+d'administration) :
+
+  1. POST /api/uploads {manga, chapter}                    -> {id, chunk_size}
+  2. PUT /api/uploads/<id>/files/<nom>, Content-Range: bytes début-fin/total,
+     un morceau par requête ; GET sur la même URL donne la position à reprendre.
+     Une archive .zip/.cbz est extraite côté serveur, page par page.
+  3. GET /api/uploads/<id>                                 -> pages prêtes, en cours, refusées
+  4. POST /api/uploads/<id>/commit                         -> chapitre créé d'un coup
+
+Chaque fichier complet est traité dans un pool de processus (imaging.py :
+vérification, métadonnées retirées, recompression si UPLOAD_RECOMPRESS_QUALITY),
+sans occuper le worker. L'état vit sur disque, dans instance/uploads/<id>/ :
+  incoming/<nom>.part  en cours de réception
+  complete/<nom>       reçu en entier (taille)
+  received/<nom>       à traiter (archive à extraire ou page)
+  pages/<nom>          page prête          errors/<nom>  refusée (motif)
+Les morceaux d'un même envoi peuvent donc arriver sur des workers différents.
+"""
+import fcntl
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.utils import secure_filename
+from blobstore import store_file
+from cbz import IMAGE_EXTENSIONS, chapter_exists
+from config import MANGAS_DIR
+from events import publish
+from models import db, Chapter
+from readmarks import next_ordinal
+
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024     # Taille de morceau conseillée aux clients
+UPLOAD_MAX_CHUNK = 16 * 1024 * 1024     # Morceau refusé au-delà (413)
+UPLOAD_MAX_FILE = 1024 * 1024 * 1024    # Image ou archive
+UPLOAD_MAX_PAGES = 1000                 # Pages par archive
+UPLOAD_MAX_PAGE = 50 * 1024 * 1024      # Taille décompressée d'une page d'archive
+UPLOAD_WORKERS = min(4, os.cpu_count() or 1)
+UPLOAD_TTL = 2 * 86400                  # Envois abandonnés supprimés après deux jours
+PROCESS_TIMEOUT = 300                   # Fichier reçu sans résultat depuis 5 min : retraité
+COPY_CHUNK = 1024 * 1024
+ARCHIVE_EXTENSIONS = ('.zip', '.cbz')
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+STATES = ("incoming", "complete", "received", "pages", "errors")
+
+
+class UploadError(Exception):
+    """Envoi refusé : code HTTP et contenu JSON de la réponse."""
+
+    def __init__(self, message, status=400, **data):
+        super().__init__(message)
+        self.status = status
+        self.data = dict(data, error=message)
+
+
+def upload_filename(filename):
+    """Nom de fichier accepté (image ou archive), ou UploadError."""
+    name = secure_filename(filename or "")
+    if not name.lower().endswith(IMAGE_EXTENSIONS + ARCHIVE_EXTENSIONS):
+        raise UploadError("Type de fichier non accepté (images ou archive .zip/.cbz)", 415)
+    return name
+
+
+class ChapterUploads:
+
+    def __init__(self):
+        self.app = None
+        self.directory = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('UPLOAD_WORKERS', UPLOAD_WORKERS)
+        app.config.setdefault('UPLOAD_RECOMPRESS_QUALITY', None)
+        self.directory = os.path.join(app.instance_path, 'uploads')
+
+    @property
+    def pool(self):
+        # Créé au premier envoi, dans le worker ; « spawn » : pas de fork d'un processus à threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.app.config['UPLOAD_WORKERS'],
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _path(self, upload_id, *parts):
+        if not UPLOAD_ID_RE.match(upload_id):
+            raise UploadError("Envoi introuvable", 404)
+        return os.path.join(self.directory, upload_id, *parts)
+
+    def create(self, manga_name, chapter_name, manga_id=None, user_id=None):
+        self.purge_expired()
+        upload_id = uuid.uuid4().hex
+        for state in STATES:
+            os.makedirs(self._path(upload_id, state))
+        with open(self._path(upload_id, "upload.json"), "w", encoding="utf-8") as f:
+            json.dump({"manga": manga_name, "manga_id": manga_id, "chapter": chapter_name,
+                       "user_id": user_id, "created": time.time()}, f)
+        return upload_id
+
+    def get(self, upload_id):
+        try:
+            with open(self._path(upload_id, "upload.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Envoi introuvable", 404)
+
+    def offset(self, upload_id, filename):
+        """Octets déjà reçus d'un fichier : la position à laquelle reprendre."""
+        self.get(upload_id)
+        name = upload_filename(filename)
+        try:
+            with open(self._path(upload_id, "complete", name), encoding="utf-8") as f:
+                return {"offset": int(f.read()), "complete": True}
+        except FileNotFoundError:
+            pass
+        try:
+            return {"offset": os.path.getsize(self._path(upload_id, "incoming", name + ".part")), "complete": False}
+        except OSError:
+            return {"offset": 0, "complete": False}
+
+    def append(self, upload_id, filename, start, total, stream):
+        """
+        Ajoute le morceau stream (octets start à ...) au fichier filename, de
+        taille finale total. Un morceau ne reprend qu'à la position déjà
+        atteinte (409 sinon, avec cette position) ; ce qui est reçu avant une
+        coupure est gardé. Le fichier complet part au traitement.
+        """
+        self.get(upload_id)
+        name = upload_filename(filename)
+        if total > UPLOAD_MAX_FILE:
+            raise UploadError("Fichier trop volumineux", 413)
+        if os.path.exists(self._path(upload_id, "complete", name)):
+            return {"offset": total, "complete": True}
+        part = self._path(upload_id, "incoming", name + ".part")
+        os.utime(self._path(upload_id))  # Envoi actif : pas de purge (UPLOAD_TTL)
+        with open(part, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)  # Deux morceaux du même fichier sur deux workers
+            current = os.fstat(f.fileno()).st_size
+            if start != current:
+                raise UploadError("Position inattendue", 409, offset=current)
+            written = 0
+            while chunk := stream.read(COPY_CHUNK):
+                written += len(chunk)
+                if current + written > total:
+                    f.truncate(current)
+                    raise UploadError("Morceau au-delà de la taille annoncée", 416, offset=current)
+                f.write(chunk)
+            f.flush()
+            offset = current + written
+            if offset == total:
+                with open(self._path(upload_id, "complete", name), "w", encoding="utf-8") as marker:
+                    marker.write(str(total))
+                for state in ("pages", "errors"):
+                    if os.path.exists(self._path(upload_id, state, name)):
+                        os.remove(self._path(upload_id, state, name))
+                os.rename(part, self._path(upload_id, "received", name))
+                self._dispatch(upload_id, name)
+        return {"offset": offset, "complete": offset == total}
+
+    def _dispatch(self, upload_id, name):
+        from imaging import process_page, extract_archive  # Pillow : chargé au premier envoi seulement
+        src = self._path(upload_id, "received", name)
+        os.utime(src)  # Début du délai de traitement (PROCESS_TIMEOUT)
+        if name.lower().endswith(ARCHIVE_EXTENSIONS):
+            future = self.pool.submit(extract_archive, src, self._path(upload_id), IMAGE_EXTENSIONS,
+                                      UPLOAD_MAX_PAGES, UPLOAD_MAX_PAGE)
+            future.add_done_callback(lambda f: self._extracted(upload_id, f))
+        else:
+            self.pool.submit(process_page, src, self._path(upload_id, "pages", name),
+                             self._path(upload_id, "errors", name), self.app.config['UPLOAD_RECOMPRESS_QUALITY'])
+
+    def _extracted(self, upload_id, future):
+        try:
+            for name in future.result():
+                self._dispatch(upload_id, name)
+        except Exception:
+            pass  # Envoi supprimé entre-temps, ou processus perdu : status() relance le traitement
+
+    def status(self, upload_id):
+        info = self.get(upload_id)
+        now = time.time()
+        pending = []
+        for entry in os.scandir(self._path(upload_id, "received")):
+            if entry.name.endswith(".tmp"):
+                continue
+            pending.append(entry.name)
+            if now - entry.stat().st_mtime > PROCESS_TIMEOUT:
+                self._dispatch(upload_id, entry.name)
+        receiving = {}
+        for entry in os.scandir(self._path(upload_id, "incoming")):
+            name = entry.name[:-len(".part")]
+            if not os.path.exists(self._path(upload_id, "complete", name)):
+                receiving[name] = entry.stat().st_size
+        errors = {}
+        for entry in os.scandir(self._path(upload_id, "errors")):
+            with open(entry.path, encoding="utf-8") as f:
+                errors[entry.name] = f.read()
+        pages = sorted(entry.name for entry in os.scandir(self._path(upload_id, "pages"))
+                       if not entry.name.endswith(".tmp"))
+        return {"id": upload_id, "manga": info["manga"], "chapter": info["chapter"], "pages": pages,
+                "pending": sorted(pending), "receiving": receiving, "errors": errors}
+
+    def discard_file(self, upload_id, filename):
+        """Retire un fichier de l'envoi (pour le renvoyer ou l'écarter)."""
+        self.get(upload_id)
+        name = upload_filename(filename)
+        for state in STATES:
+            path = self._path(upload_id, state, name + ".part" if state == "incoming" else name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def discard(self, upload_id):
+        self.get(upload_id)
+        shutil.rmtree(self._path(upload_id), ignore_errors=True)
+
+    def commit(self, upload_id):
+        """
+        Crée le chapitre quand toutes les pages sont prêtes : dossier préparé à
+        côté puis renommé d'un coup, ligne en base validée dans la même étape
+        (le chapitre apparaît complet, ou pas du tout).
+        """
+        info = self.get(upload_id)
+        with open(self._path(upload_id, "upload.json"), encoding="utf-8") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError("Validation déjà en cours", 409)
+            state = self.status(upload_id)
+            if state["pending"] or state["receiving"]:
+                raise UploadError("Fichiers encore en cours d'envoi ou de traitement", 409,
+                                  pending=state["pending"], receiving=state["receiving"])
+            if not state["pages"]:
+                raise UploadError("Aucune page valide", 400, errors=state["errors"])
+            manga_dir = os.path.join(MANGAS_DIR, info["manga"])
+            chapter_dir = os.path.join(manga_dir, info["chapter"])
+            if chapter_exists(chapter_dir) or (info["manga_id"] is not None and Chapter.query.filter_by(
+                    manga_id=info["manga_id"], name=info["chapter"]).first()):
+                raise UploadError("Ce chapitre existe déjà", 409)
+
+            # Dossier caché (ignoré par les listes de chapitres) jusqu'au renommage
+            staging = os.path.join(manga_dir, f".upload-{upload_id}")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for name in state["pages"]:
+                store_file(self._path(upload_id, "pages", name), os.path.join(staging, name))
+            date_added = int(time.time())
+            with open(os.path.join(staging, "date_added.txt"), "w") as f:
+                f.write(str(date_added))
+
+            chapter = None
+            if info["manga_id"] is not None:
+                chapter = Chapter(name=info["chapter"], manga_id=info["manga_id"], date_added=date_added,
+                                  ordinal=next_ordinal(info["manga_id"]), images=";".join(state["pages"]))
+                db.session.add(chapter)
+                db.session.flush()
+                publish(["chapters", f"manga:{info['manga_id']}"], "chapter", {
+                    "manga": info["manga"],
+                    "chapter": info["chapter"],
+                    "date_added": date_added,
+                })
+            try:
+                os.rename(staging, chapter_dir)
+            except OSError:
+                db.session.rollback()
+                shutil.rmtree(staging, ignore_errors=True)
+                raise UploadError("Ce chapitre existe déjà", 409)
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                shutil.rmtree(chapter_dir, ignore_errors=True)
+                raise
+        shutil.rmtree(self._path(upload_id), ignore_errors=True)
+        return {"chapter": chapter, "date_added": date_added, "pages": state["pages"]}
+
+    def purge_expired(self):
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and now - entry.stat().st_mtime > UPLOAD_TTL:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+uploads = ChapterUploads()
@@ -0,0 +1,87 @@
+import os
+from flask_login import UserMixin
+from models import db, User
+from cache import TTLCache
+
+USER_TTL = 60   # Secondes : délai maximal avant qu'un changement fait hors invalidation soit vu
+
+# Instantané léger de l'utilisateur connecté (clé : user_id), pour que
+# Flask-Login n'interroge pas la base à chaque requête authentifiée.
+_user_cache = TTLCache(ttl=USER_TTL, maxsize=4096)
+
+
+class CachedUser(UserMixin):
+    """
+    Copie détachée des champs lus à chaque requête (current_user). Pour
+    modifier le compte ou vérifier le mot de passe, charger le modèle
+    avec get_model().
+    """
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.is_admin = bool(user.is_admin)
+        self.role = user.role or "user"
+        self.email_digest = bool(user.email_digest)
+
+    def get_model(self):
+        return db.session.get(User, self.id)
+
+
+class UserCache:
+    """
+    Le cache est propre à chaque processus : les invalidations passent par un
+    fichier témoin (instance/user_cache.stamp) dont la date de modification est
+    comparée à chaque lecture. Toucher ce fichier vide le cache de tous les
+    workers, y compris depuis un commande lancée à part (flask promote-admin).
+    """
+
+    def __init__(self):
+        self._stamp_path = None
+        self._stamp = None
+
+    def init_app(self, app):
+        os.makedirs(app.instance_path, exist_ok=True)
+        self._stamp_path = os.path.join(app.instance_path, "user_cache.stamp")
+        self._stamp = self._read_stamp()
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self._stamp_path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            _user_cache.clear()
+
+    def load(self, user_id):
+        self._check_stamp()
+        snapshot = _user_cache.get(user_id)
+        if snapshot is None:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            snapshot = CachedUser(user)
+            _user_cache.set(user_id, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id=None):
+        """
+        À appeler après un changement de mot de passe, de rôle ou de préférences,
+        ou une suppression de compte (user_id=None : tous les utilisateurs).
+        """
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.delete(user_id)
+        if self._stamp_path is None:
+            return
+        # Les autres workers (et celui-ci) videront leur cache à la prochaine lecture
+        with open(self._stamp_path, "a"):
+            os.utime(self._stamp_path)
+
+
+user_cache = UserCache()